@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import hashlib
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
+from rest_framework.exceptions import ParseError
+from rest_framework.templatetags.rest_framework import replace_query_param
 from rest_framework import status, permissions
 from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
 
 
 def custom_exception_handler(exc):
@@ -39,15 +43,167 @@ class ObjectPermissionsFilter(object):
     """
     perm_format = '%(app_label)s.change_%(model_name)s'
 
-    def filter_queryset(self, request, queryset, view):
-        user = request.user
-        model_cls = queryset.model
+    def get_permission(self, model_cls):
         kwargs = {
             'app_label': model_cls._meta.app_label,
             'model_name': model_cls._meta.module_name
         }
-        permission = self.perm_format % kwargs
-        filtered_queryset = model_cls.objects.filter(pk__in=[
+        return self.perm_format % kwargs
+
+    def filter_queryset(self, request, queryset, view):
+        user = request.user
+        permission = self.get_permission(queryset.model)
+        filtered_queryset = queryset.filter(pk__in=[
             obj.pk for obj in queryset.all() if user.has_perm(permission, obj=obj)
         ])
         return filtered_queryset
+
+
+class SparseFieldsMixin(object):
+
+    """
+    Serializer mixin that keeps only the fields listed on ?fields=,
+    the others are neither computed nor rendered. url and id are kept
+    so the representation still links to the object.
+    """
+    fields_param = 'fields'
+    always_included = ('url', 'id')
+
+    def get_fields(self):
+        fields = super(SparseFieldsMixin, self).get_fields()
+
+        request = self.context.get('request', None)
+        if request is None or request.method != 'GET':
+            return fields
+
+        wanted = request.QUERY_PARAMS.get(self.fields_param)
+        if not wanted:
+            return fields
+
+        wanted = set(name.strip() for name in wanted.split(','))
+        wanted.update(self.always_included)
+        for name in fields.keys():
+            if name not in wanted:
+                fields.pop(name)
+        return fields
+
+
+class CursorPaginationMixin(object):
+
+    """
+    List views paginated by the last primary key seen instead of page
+    number when ?cursor= is present, so no page is counted or skipped.
+    Use ?cursor= to get the first page and follow the next link.
+    """
+    cursor_param = 'cursor'
+    cursor_ordering = 'pk'
+
+    def get_cursor(self):
+        cursor = self.request.QUERY_PARAMS.get(self.cursor_param)
+        if not cursor:
+            return None
+        try:
+            return int(cursor)
+        except ValueError:
+            raise ParseError("Invalid cursor {}".format(cursor))
+
+    def paginate_by_cursor(self, queryset):
+        cursor = self.get_cursor()
+        descending = self.cursor_ordering.startswith('-')
+
+        queryset = queryset.order_by(self.cursor_ordering)
+        if cursor is not None:
+            if descending:
+                queryset = queryset.filter(pk__lt=cursor)
+            else:
+                queryset = queryset.filter(pk__gt=cursor)
+
+        page_size = self.get_paginate_by()
+        objects = list(queryset[:page_size + 1])
+
+        next_url = None
+        if len(objects) > page_size:
+            objects = objects[:page_size]
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_param,
+                objects[-1].pk)
+
+        serializer = self.get_serializer(objects, many=True)
+        return {
+            'count': None,
+            'next': next_url,
+            'previous': None,
+            'results': serializer.data,
+        }
+
+    def list(self, request, *args, **kwargs):
+        if self.cursor_param not in request.QUERY_PARAMS:
+            return super(CursorPaginationMixin, self).list(
+                request, *args, **kwargs)
+
+        self.object_list = self.filter_queryset(self.get_queryset())
+        return Response(self.paginate_by_cursor(self.object_list))
+
+
+class ETagMixin(object):
+
+    """
+    Answers GET with an ETag computed from a single aggregate of the
+    objects (their count and the last value of etag_fields and
+    etag_related_fields), so If-None-Match requests get a 304 without
+    reading or serializing the rows.
+    """
+    etag = None
+    etag_fields = ('updated_at',)
+    etag_related_fields = ()
+
+    def get_etag(self, request, queryset):
+        aggregates = {'count': Count('pk', distinct=True)}
+        for field in self.etag_fields + self.etag_related_fields:
+            aggregates[field] = Max(field)
+        state = sorted(queryset.order_by().aggregate(**aggregates).items())
+
+        key = "{}:{}:{}".format(
+            request.get_full_path(), request.user.pk, state)
+        return '"{}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def get_etag_queryset(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup = kwargs.get(self.lookup_field)
+        if lookup is not None:
+            queryset = queryset.filter(**{self.lookup_field: lookup})
+        return queryset
+
+    def initial(self, request, *args, **kwargs):
+        super(ETagMixin, self).initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(
+                request, self.get_etag_queryset(request, *args, **kwargs))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(ETagMixin, self).finalize_response(
+            request, response, *args, **kwargs)
+        if self.etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.etag_matches(request):
+            return self.not_modified()
+        return super(ETagMixin, self).retrieve(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if self.etag_matches(request):
+            return self.not_modified()
+        return super(ETagMixin, self).list(request, *args, **kwargs)
+
+    def etag_matches(self, request):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if not (self.etag and if_none_match):
+            return False
+        return self.etag in [etag.strip() for etag in if_none_match.split(',')]
+
+    def not_modified(self):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = self.etag
+        return response
@@ -5,6 +5,9 @@ from rest_framework.response import Response
 from logical import models
 from physical.models import Plan, Environment
 from account.models import Team
+from account.backends import DbaasBackend
+from .base import ObjectPermissionsFilter, SparseFieldsMixin
+from .base import CursorPaginationMixin, ETagMixin
 from .credential import CredentialSerializer
 from django.contrib.sites.models import Site
 from notification.tasks import create_database
@@ -14,7 +17,9 @@ import logging
 LOG = logging.getLogger(__name__)
 
 
-class DatabaseSerializer(serializers.HyperlinkedModelSerializer):
+class DatabaseSerializer(
+    SparseFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     plan = serializers.HyperlinkedRelatedField(
         source='plan', view_name='plan-detail',
         queryset=Plan.objects.filter(is_active=True)
@@ -51,17 +56,49 @@ class DatabaseSerializer(serializers.HyperlinkedModelSerializer):
         if request:
             creating = request.method == 'POST'
 
-            self.fields['plan'].read_only = not creating
-            self.fields['environment'].read_only = not creating
-            self.fields['name'].read_only = not creating
-            self.fields['credentials'].read_only = True
+            for field in ('plan', 'environment', 'name'):
+                if field in self.fields:
+                    self.fields[field].read_only = not creating
+            if 'credentials' in self.fields:
+                self.fields['credentials'].read_only = True
 
 
-class DatabaseAPI(viewsets.ModelViewSet):
+class DatabasePermissionsFilter(ObjectPermissionsFilter):
+
+    """
+    Same rules DbaasBackend.has_perm applies to each database, as a
+    single query
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        user = request.user
+        if user.is_active and user.is_superuser:
+            return queryset
+
+        permissions = user.get_all_permissions()
+        if not user.is_active or \
+                self.get_permission(queryset.model) not in permissions:
+            return queryset.none()
+
+        if DbaasBackend.perm_manage_quarantine_database in permissions:
+            return queryset
+
+        return queryset.filter(
+            is_in_quarantine=False,
+            team__in=Team.objects.filter(users=user)
+        )
+
+
+class DatabaseAPI(ETagMixin, CursorPaginationMixin, viewsets.ModelViewSet):
 
     """
     *   ### __List databases__
         __GET__ /api/database/
+
+        Use `?cursor=` to page by id and follow the next link, and
+        `?fields=name,status` to get only some fields. Responses carry an
+        ETag, send it back on If-None-Match to get a 304 when nothing
+        changed.
     *   ### __To create a new database__
         __POST__ /api/database/
             {
@@ -88,7 +125,16 @@ class DatabaseAPI(viewsets.ModelViewSet):
             }
     """
     serializer_class = DatabaseSerializer
-    queryset = models.Database.objects.all()
+    queryset = models.Database.objects.select_related(
+        'databaseinfra__engine__engine_type', 'databaseinfra__plan',
+        'databaseinfra__disk_offering'
+    ).prefetch_related('credentials')
+    filter_backends = (DatabasePermissionsFilter,)
+    etag_related_fields = (
+        'credentials__updated_at', 'databaseinfra__updated_at',
+        'databaseinfra__disk_offering__updated_at',
+        'databaseinfra__instances__updated_at'
+    )
 
     def create(self, request):
         serializer = self.get_serializer(
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from rest_framework import viewsets, serializers, filters
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from notification.models import StepExecution
+from .base import SparseFieldsMixin, CursorPaginationMixin
+
+
+class StepExecutionSerializer(SparseFieldsMixin,
+                              serializers.ModelSerializer):
+
+    class Meta:
+        model = StepExecution
+        fields = ('id', 'task', 'engine', 'step', 'step_index', 'direction',
+                  'host', 'status', 'started_at', 'finished_at', 'duration')
+
+
+class StepExecutionAPI(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
+
+    """
+    Step Execution API
+
+    One row per workflow step run, newest first. Use `?cursor=` to page
+    and `?fields=` to get only some fields.
+    """
+    serializer_class = StepExecutionSerializer
+    queryset = StepExecution.objects.all()
+    cursor_ordering = '-pk'
+    filter_backends = (filters.DjangoFilterBackend,)
+    filter_fields = ('task', 'engine', 'step', 'direction', 'status')
+
+
+class StepReportAPI(viewsets.ViewSet):
+
+    """
+    Step Report API
+
+    Duration p50/p95 of the workflow steps by engine and the critical
+    path, the steps that take most of a run. Accepts `?engine=`,
+    `?task_name=` and `?days=` (default 90).
+    """
+    queryset = StepExecution.objects.all()
+
+    def list(self, request):
+        try:
+            days = int(request.QUERY_PARAMS.get('days', 90))
+        except ValueError:
+            raise ParseError("Invalid days {}".format(
+                request.QUERY_PARAMS['days']))
+
+        return Response(StepExecution.get_report(
+            engine=request.QUERY_PARAMS.get('engine'),
+            task_name=request.QUERY_PARAMS.get('task_name'),
+            days=days))
@@ -5,9 +5,10 @@ from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import filters
 from notification.models import TaskHistory
+from .base import SparseFieldsMixin, CursorPaginationMixin, ETagMixin
 
 
-class TaskSerializer(serializers.HyperlinkedModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = TaskHistory
@@ -17,13 +18,18 @@ class TaskSerializer(serializers.HyperlinkedModelSerializer):
         return obj.task_id
 
 
-class TaskAPI(viewsets.ReadOnlyModelViewSet):
+class TaskAPI(ETagMixin, CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
 
     """
     Task API
+
+    Use `?cursor=` to page from the newest task and follow the next link,
+    `?fields=` to get only some fields and If-None-Match to poll for
+    changes.
     """
     serializer_class = TaskSerializer
     #queryset = models.Engine.objects.all()
     queryset = TaskHistory.objects.all()
+    cursor_ordering = '-pk'
     filter_backends = (filters.DjangoFilterBackend,)
     filter_fields = ('task_id', 'task_status')
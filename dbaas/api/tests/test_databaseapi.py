@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 import logging
+from datetime import datetime, timedelta
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
 from logical.models import Database
+from physical.models import DatabaseInfra, DiskOffering
 from logical.tests import factory
 from physical.tests import factory as physical_factory
 from . import DbaaSAPITestCase, BasicTestsMixin
@@ -84,3 +86,75 @@ class DatabaseAPITestCase(DbaaSAPITestCase, BasicTestsMixin):
                 is_in_quarantine=False, pk=obj.pk
             ).get
         )
+
+    def test_list_by_cursor(self):
+        databases = [self.model_create() for _ in range(3)]
+
+        response = self.client.get(self.url_list(), {
+            'cursor': '', 'page_size': 2
+        })
+        data = response.data
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [database.pk for database in databases[:2]],
+            [obj_data['id'] for obj_data in data[self.url_prefix]])
+
+        response = self.client.get(data['_links']['next'])
+        data = response.data
+        self.assertEqual(
+            [databases[2].pk],
+            [obj_data['id'] for obj_data in data[self.url_prefix]])
+        self.assertIsNone(data['_links']['next'])
+
+    def test_list_only_requested_fields(self):
+        self.model_create()
+        response = self.client.get(self.url_list(), {'fields': 'name,status'})
+        obj_data = response.data[self.url_prefix][0]
+        self.assertIn('name', obj_data)
+        self.assertIn('status', obj_data)
+        self.assertNotIn('endpoint', obj_data)
+        self.assertNotIn('credentials', obj_data)
+
+    def test_not_modified_when_etag_matches(self):
+        obj = self.model_create()
+        url = self.url_detail(obj.pk)
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        obj.status = Database.ALERT
+        obj.save(update_fields=['status', 'updated_at'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_list_etag_changes_when_databases_change(self):
+        self.model_create()
+        etag = self.client.get(self.url_list())['ETag']
+        self.assertEqual(etag, self.client.get(self.url_list())['ETag'])
+
+        self.model_create()
+        response = self.client.get(self.url_list(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_etag_changes_when_infra_changes(self):
+        obj = self.model_create()
+        url = self.url_detail(obj.pk)
+        etag = self.client.get(url)['ETag']
+
+        disk_offering = physical_factory.DiskOfferingFactory()
+        later = datetime.now() + timedelta(hours=1)
+        DatabaseInfra.objects.filter(pk=self.datainfra.pk).update(
+            disk_offering=disk_offering, updated_at=later)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
+        etag = response['ETag']
+        DiskOffering.objects.filter(pk=disk_offering.pk).update(
+            updated_at=later + timedelta(hours=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
@@ -43,6 +43,10 @@ router.register(r'extra_dns', ExtraDnsAPI)
 from .task import TaskAPI
 router.register(r'task', TaskAPI, base_name="task")
 
+from .step_execution import StepExecutionAPI, StepReportAPI
+router.register(r'step_execution', StepExecutionAPI)
+router.register(r'step_report', StepReportAPI, base_name="step_report")
+
 from django.conf import settings
 if settings.CLOUD_STACK_ENABLED:
     from .integration_type import CredentialTypeAPI
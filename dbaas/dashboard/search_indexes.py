@@ -1,3 +1,4 @@
+from django.db.models import Q
 from haystack import indexes
 from logical.models import Database
 
@@ -9,11 +10,36 @@ class DatabaseIndex(indexes.SearchIndex, indexes.Indexable):
     project = indexes.CharField(model_attr='project', default="")
     databaseinfra = indexes.CharField(model_attr='databaseinfra',)
 
+    # a database must be reindexed when any of these changes its name
+    RELATED_UPDATED_FIELDS = ('team', 'project', 'databaseinfra')
+
     def prepare_databaseinfra(self, obj):
         return "%s" % (obj.databaseinfra.name)
 
     def index_queryset(self, using=None):
-        return self.get_model().objects.all()
+        return self.get_model().objects.select_related(
+            *self.RELATED_UPDATED_FIELDS)
+
+    def build_queryset(self, using=None, start_date=None, end_date=None):
+        """ update_index --age also picks databases whose team, project or
+        databaseinfra were updated """
+        queryset = self.index_queryset(using=using)
+        updated_field = self.get_updated_field()
+        for lookup, date in (('gte', start_date), ('lte', end_date)):
+            if not date:
+                continue
+
+            updated = Q(**{'{}__{}'.format(updated_field, lookup): date})
+            for related in self.RELATED_UPDATED_FIELDS:
+                updated |= Q(**{
+                    '{}__{}__{}'.format(related, updated_field, lookup): date
+                })
+            queryset = queryset.filter(updated)
+
+        return queryset.distinct().order_by('pk')
+
+    def get_updated_field(self):
+        return 'updated_at'
 
     def get_model(self):
         return Database
@@ -0,0 +1,64 @@
+import logging
+from django.core.cache import cache
+from django.db.models import signals
+from haystack.signals import BaseSignalProcessor
+
+LOG = logging.getLogger(__name__)
+
+INDEX_UPDATE_DELAY = 10
+INDEX_PENDING_KEY = "dashboard:index:pending:%d"
+
+DATABASE_MODEL = 'logical.database'
+RELATED_MODELS = ('account.team', 'logical.project', 'physical.databaseinfra')
+
+
+def model_label(model):
+    return "%s.%s" % (model._meta.app_label, model._meta.module_name)
+
+
+def queue_index_update(database_ids):
+    """
+    Schedules one reindex of the databases after INDEX_UPDATE_DELAY
+    seconds, databases already waiting for it are not queued again
+    """
+    from .tasks import update_database_index
+
+    database_ids = [
+        database_id for database_id in database_ids
+        if cache.add(INDEX_PENDING_KEY % database_id, True,
+                     INDEX_UPDATE_DELAY * 10)
+    ]
+    if not database_ids:
+        return
+
+    LOG.debug("Queueing index update of databases %s", database_ids)
+    update_database_index.apply_async(
+        args=[database_ids], countdown=INDEX_UPDATE_DELAY)
+
+
+class DatabaseSignalProcessor(BaseSignalProcessor):
+
+    """
+    Reindexes only the databases affected by a change, in background.
+    Saving a team, project or databaseinfra reindexes all its databases.
+    """
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+
+    def handle_save(self, sender, instance, **kwargs):
+        label = model_label(sender)
+        if label == DATABASE_MODEL:
+            queue_index_update([instance.pk])
+        elif label in RELATED_MODELS:
+            queue_index_update(
+                instance.databases.values_list('pk', flat=True))
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if model_label(sender) == DATABASE_MODEL:
+            queue_index_update([instance.pk])
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from haystack import connections
+from dbaas.celery import app
+from logical.models import Database
+from .signals import INDEX_PENDING_KEY
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+@app.task
+def update_database_index(database_ids, using='default'):
+    cache.delete_many([
+        INDEX_PENDING_KEY % database_id for database_id in database_ids
+    ])
+
+    backend = connections[using].get_backend()
+    index = connections[using].get_unified_index().get_index(Database)
+
+    databases = list(index.index_queryset(using=using).filter(
+        pk__in=database_ids))
+    if databases:
+        backend.update(index, databases)
+
+    removed = set(database_ids) - set(database.pk for database in databases)
+    for database_id in removed:
+        backend.remove("logical.database.%d" % database_id)
+
+    LOG.info("Index updated for %d databases and removed for %d",
+             len(databases), len(removed))
+
+
+@app.task
+def update_index_catch_up(hours=1):
+    """ Reindexes databases updated in the last hours, including changes
+    in their team, project or databaseinfra """
+    from django.core.management import call_command
+    call_command('update_index', 'logical.database', age=hours)
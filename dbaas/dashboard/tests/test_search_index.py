@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from datetime import datetime, timedelta
+import mock
+from django.core.cache import cache
+from django.test import TestCase
+from haystack import connections, connection_router
+from account.models import Team
+from logical.models import Database, Project
+from logical.tests import factory
+from physical.models import DatabaseInfra
+from ..search_indexes import DatabaseIndex
+from ..signals import DatabaseSignalProcessor
+
+
+@mock.patch('dashboard.tasks.update_database_index')
+class DatabaseSignalProcessorTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.processor = DatabaseSignalProcessor(
+            connections, connection_router)
+        self.addCleanup(self.processor.teardown)
+
+    def test_save_queues_database_index_update(self, update_database_index):
+        database = factory.DatabaseFactory()
+        update_database_index.apply_async.assert_called_with(
+            args=[[database.pk]], countdown=mock.ANY)
+
+    def test_delete_queues_database_index_update(self, update_database_index):
+        database = factory.DatabaseFactory(is_in_quarantine=True)
+        cache.clear()
+        update_database_index.reset_mock()
+
+        database.delete()
+
+        update_database_index.apply_async.assert_called_once_with(
+            args=[[database.pk]], countdown=mock.ANY)
+
+    def test_pending_update_is_not_queued_again(self, update_database_index):
+        database = factory.DatabaseFactory()
+        update_database_index.reset_mock()
+
+        database.save()
+        self.assertFalse(update_database_index.apply_async.called)
+
+
+class DatabaseIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.database = factory.DatabaseFactory()
+        long_ago = datetime.now() - timedelta(days=10)
+        for model, pk in ((Database, self.database.pk),
+                          (Team, self.database.team_id),
+                          (Project, self.database.project_id),
+                          (DatabaseInfra, self.database.databaseinfra_id)):
+            model.objects.filter(pk=pk).update(updated_at=long_ago)
+
+        self.start_date = datetime.now() - timedelta(hours=1)
+
+    def test_build_queryset_filters_by_updated_field(self):
+        self.assertFalse(DatabaseIndex().build_queryset(
+            start_date=self.start_date).exists())
+
+    def test_build_queryset_honors_get_updated_field(self):
+        with mock.patch.object(DatabaseIndex, 'get_updated_field',
+                               return_value='created_at'):
+            queryset = DatabaseIndex().build_queryset(
+                start_date=self.start_date)
+        self.assertEqual([self.database], list(queryset))
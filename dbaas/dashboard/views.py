@@ -13,7 +13,8 @@ LOG = logging.getLogger(__name__)
 def dashboard(request):
     env_id = request.GET.get('env_id')
     engine_type = request.GET.get('engine_type')
-    dbinfra_list = DatabaseInfra.objects.all().order_by('name')
+    dbinfra_list = DatabaseInfra.objects.select_related(
+        'engine__engine_type', 'environment', 'plan').order_by('name')
     url_par = "?"
     if env_id or engine_type:
         if env_id:
@@ -35,11 +36,19 @@ def dashboard(request):
 
     except(EmptyPage, InvalidPage):
         dbinfra = paginator.page(paginator.num_pages)
+    dbinfra.object_list = DatabaseInfra.get_summaries(dbinfra.object_list)
     return render_to_response("dashboard/dashboard.html", {'dbinfra': dbinfra, 'url_par': url_par}, context_instance=RequestContext(request))
 
 
 @login_required
 def databaseinfra(request, infra_id):
-    dbinfra = DatabaseInfra.objects.get(pk=infra_id)
-    databases = Database.objects.filter(databaseinfra=dbinfra)
-    return render_to_response("dashboard/databaseinfra.html", {'infra': dbinfra, 'databases': databases}, context_instance=RequestContext(request))
+    dbinfra = DatabaseInfra.objects.select_related(
+        'engine__engine_type', 'environment', 'plan', 'disk_offering'
+    ).get(pk=infra_id)
+    DatabaseInfra.get_summaries([dbinfra])
+    instances = dbinfra.instances.select_related('hostname')
+    databases = Database.objects.filter(
+        databaseinfra=dbinfra).select_related('team', 'project')
+    for database in databases:
+        database.databaseinfra = dbinfra
+    return render_to_response("dashboard/databaseinfra.html", {'infra': dbinfra, 'instances': instances, 'databases': databases}, context_instance=RequestContext(request))
@@ -13,6 +13,7 @@ from logging.handlers import SysLogHandler
 from celery.log import redirect_stdouts_to_logger
 
 from celery.signals import after_setup_task_logger, after_setup_logger
+from celery.signals import worker_init
 
 
 def setup_log(**args):
@@ -46,6 +47,13 @@ app.config_from_object(celeryconfig)
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
 
+@worker_init.connect
+def load_workflow_registry(**kwargs):
+    # typos in step or topology paths stop the worker instead of a deploy
+    from workflow.registry import load_registry
+    load_registry()
+
+
 @app.task(bind=True)
 def debug_task(self):
     LOG.debug('Request: {0!r}'.format(self.request))
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 REDIS_PORT = os.getenv('DBAAS_NOTIFICATION_BROKER_PORT', '6379')
 BROKER_URL = os.getenv(
@@ -14,3 +15,13 @@ CELERYD_LOG_FORMAT = "[%(asctime)s: %(processName)s %(name)s %(levelname)s] %(me
 CELERY_ALWAYS_EAGER = False
 CELERYD_LOG_COLOR = False
 CELERYD_PREFETCH_MULTIPLIER = 1
+
+# catches up search index changes the realtime signal processor missed,
+# or all of them when DBAAS_SEARCH_REALTIME_INDEX is off
+CELERYBEAT_SCHEDULE = {
+    'dashboard-update-index-catch-up': {
+        'task': 'dashboard.tasks.update_index_catch_up',
+        'schedule': timedelta(minutes=30),
+        'kwargs': {'hours': 1},
+    },
+}
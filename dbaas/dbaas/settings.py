@@ -263,6 +263,9 @@ HAYSTACK_CONNECTIONS = {
         'PATH': HAYSTACK_PATH,
     },
 }
+# reindex changed databases in background instead of rebuilding the index
+if os.getenv('DBAAS_SEARCH_REALTIME_INDEX', '0') == '1':
+    HAYSTACK_SIGNAL_PROCESSOR = 'dashboard.signals.DatabaseSignalProcessor'
 
 if not DB_ENGINE.endswith('sqlite3'):
     # support migrations
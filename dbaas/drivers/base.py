@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from time import sleep, time
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 from django_services.service.exceptions import InternalException
 
@@ -8,7 +12,25 @@ LOG = logging.getLogger(__name__)
 
 __all__ = ['GenericDriverError', 'ConnectionError',
            'AuthenticationError', 'DatabaseAlreadyExists', 'CredentialAlreadyExists', 'InvalidCredential',
-           'BaseDriver', 'DatabaseStatus', 'DatabaseInfraStatus', 'DatabaseDoesNotExist']
+           'BaseDriver', 'DatabaseStatus', 'DatabaseInfraStatus', 'DatabaseDoesNotExist',
+           'REPLICATION_LAG_UNKNOWN', 'format_replication_lags']
+
+# Lag reported for members that are not replicating at all
+REPLICATION_LAG_UNKNOWN = 100000
+
+# Seconds the instance roles of an infra are kept in cache
+ROLES_CACHE_TIMEOUT = 30
+
+
+def format_replication_lags(series):
+    """ Formats a wait_replication_lag series to be shown on task logs """
+    return "\n".join(
+        "{}s: {}".format(elapsed, ", ".join(
+            "{} {}s behind".format(instance, lag)
+            for instance, lag in lags.items()
+        ) or "no replicas")
+        for elapsed, lags in series
+    )
 
 
 class GenericDriverError(InternalException):
@@ -40,6 +62,12 @@ class AuthenticationError(ConnectionError):
     pass
 
 
+class ReplicationLagTimeout(GenericDriverError):
+
+    """ Raised when replicas do not catch up with the primary in time """
+    pass
+
+
 class DatabaseAlreadyExists(InternalException):
 
     """ Raised when database already exists in datainfra """
@@ -77,6 +105,12 @@ class BaseDriver(object):
     # must be overwritten by subclasses
     default_port = 0
 
+    # Seconds behind primary still considered in sync
+    replication_max_lag = 0
+
+    MASTER = 'master'
+    SLAVE = 'slave'
+
     def __init__(self, *args, **kwargs):
 
         if 'databaseinfra' in kwargs:
@@ -128,9 +162,25 @@ class BaseDriver(object):
     def update_user(self, credential):
         raise NotImplementedError()
 
+    def update_users(self, credentials):
+        """
+        Updates the password of every credential, drivers should override
+        it to reuse a single connection
+        """
+        for credential in credentials:
+            self.update_user(credential)
+
     def remove_user(self, credential):
         raise NotImplementedError()
 
+    def remove_users(self, credentials):
+        """
+        Removes every credential, drivers should override it to
+        reuse a single connection
+        """
+        for credential in credentials:
+            self.remove_user(credential)
+
     def list_users(self, instance=None):
         """
         this method should return a list of the users in the instance
@@ -204,39 +254,157 @@ class BaseDriver(object):
             driver_name) else None for instance in self.databaseinfra.instances.all()]
         return filter(None, instances)
 
+    def discover_roles(self, instances):
+        """
+        Returns a mapping of instance to MASTER or SLAVE.
+        Drivers should override it to use a single topology query
+        """
+        from util import run_in_parallel
+
+        roles = {}
+        for instance, is_master, error in run_in_parallel(
+            self.check_instance_is_master, instances, len(instances)
+        ):
+            if error:
+                raise error
+            roles[instance] = self.MASTER if is_master else self.SLAVE
+
+        return roles
+
+    @property
+    def roles_cache_key(self):
+        """ Versioned by updated_at of the databaseinfra, which
+        clear_roles_cache bumps: the default cache is per process, so a
+        switch made by a worker must change the key the others use """
+        updated_at = self.databaseinfra.__class__.objects.filter(
+            pk=self.databaseinfra.pk
+        ).values_list('updated_at', flat=True).first()
+        return 'driver.roles.%d.%s' % (
+            self.databaseinfra.pk, updated_at and updated_at.isoformat())
+
+    def get_roles(self, instances=None):
+        """
+        Same as discover_roles for every database instance. Use cache,
+        only for topologies with exactly one master, as during an election
+        there may be none. Failover code should call discover_roles
+        """
+        if instances is None:
+            instances = self.get_database_instances()
+
+        if not self.databaseinfra.pk:
+            # no cache when database infra is not persisted
+            return self.discover_roles(instances)
+
+        roles = cache.get(self.roles_cache_key, None)
+        if roles is None or set(roles) != set(instance.pk for instance in instances):
+            roles = dict(
+                (instance.pk, role)
+                for instance, role in self.discover_roles(instances).items()
+            )
+            if roles.values().count(self.MASTER) == 1:
+                cache.set(self.roles_cache_key, roles, ROLES_CACHE_TIMEOUT)
+
+        return dict((instance, roles[instance.pk]) for instance in instances)
+
+    def clear_roles_cache(self):
+        if not self.databaseinfra.pk:
+            return
+
+        infras = self.databaseinfra.__class__.objects.filter(
+            pk=self.databaseinfra.pk)
+        previous = infras.values_list('updated_at', flat=True).first()
+        # always a later second, some databases drop the microseconds
+        updated_at = datetime.now().replace(microsecond=0)
+        if previous and updated_at <= previous:
+            updated_at = previous.replace(microsecond=0) + timedelta(seconds=1)
+        infras.update(updated_at=updated_at)
+
     def get_master_instance(self, ):
         instances = self.get_database_instances()
+        roles = self.get_roles(instances)
 
         for instance in instances:
-            if self.check_instance_is_master(instance):
+            if roles[instance] == self.MASTER:
                 return instance
 
         return None
 
     def get_slave_instances(self, ):
         instances = self.get_database_instances()
-        master = self.get_master_instance()
+        roles = self.get_roles(instances)
 
-        try:
-            instances.remove(master)
-        except ValueError:
+        slaves = [instance for instance in instances
+                  if roles[instance] != self.MASTER]
+        if len(slaves) == len(instances):
             raise Exception("Master could not be detected")
 
-        return instances
+        return slaves
 
     def start_slave(self, instance):
         pass
 
+    @contextmanager
+    def replication_lag_client(self):
+        """ Connection reused by get_replication_lags while waiting """
+        yield None
+
+    def get_replication_lags(self, client, instances):
+        """
+        Returns a mapping of instance to seconds behind primary.
+        Drivers should override it to compute every member at once
+        """
+        return dict(
+            (instance, self.get_replication_info(instance=instance))
+            for instance in instances
+        )
+
+    def wait_replication_lag(self, instances=None, timeout=1000, max_interval=10):
+        """
+        Waits until instances (all database instances by default) are at
+        most replication_max_lag seconds behind primary. Polls faster as the
+        lag approaches zero and returns the (elapsed, lags) series
+        """
+        if instances is None:
+            instances = self.get_database_instances()
+
+        series = []
+        started_at = time()
+        with self.replication_lag_client() as client:
+            while True:
+                lags = self.get_replication_lags(client, instances)
+                elapsed = int(time() - started_at)
+                series.append((elapsed, lags))
+
+                worst_lag = max(lags.values() or [0])
+                if worst_lag <= self.replication_max_lag:
+                    return series
+
+                if elapsed >= timeout:
+                    LOG.warning(format_replication_lags(series))
+                    raise ReplicationLagTimeout(
+                        "Replication is still {}s behind after {}s".format(
+                            worst_lag, elapsed)
+                    )
+
+                interval = min(max(worst_lag / 2, 1), max_interval)
+                LOG.info("Replication is {}s behind, waiting {}s...".format(
+                    worst_lag, interval))
+                sleep(interval)
+
     def check_replication_and_switch(self, instance, attempts=100):
-        from time import sleep
-        for attempt in range(0, attempts):
-            if self.is_replication_ok(instance):
-                self.switch_master()
-                LOG.info("Switch master ok...")
-                return
-            LOG.info("Waiting 10s to check replication...")
-            sleep(10)
-        raise Exception("Could not switch master because of replication's delay")
+        try:
+            series = self.wait_replication_lag(
+                instances=[instance], timeout=attempts * 10
+            )
+        except ReplicationLagTimeout as e:
+            LOG.warning(e)
+            raise Exception(
+                "Could not switch master because of replication's delay")
+
+        LOG.info(format_replication_lags(series))
+        self.switch_master()
+        LOG.info("Switch master ok...")
+        return series
 
     def get_database_agents(self):
         """ Returns database agents list"""
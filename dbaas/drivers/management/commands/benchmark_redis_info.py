@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from optparse import make_option
+from time import time
+import redis
+
+
+class Command(BaseCommand):
+
+    '''
+        compare full INFO against the sections used by the redis driver
+        assumed you are running: redis-server on 127.0.0.1:6379
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--host', dest='host', default='127.0.0.1'),
+        make_option('--port', dest='port', type='int', default=6379),
+        make_option('--password', dest='password', default=None),
+        make_option('--iterations', dest='iterations', type='int',
+                    default=1000),
+    )
+
+    def handle(self, *args, **options):
+        client = redis.Redis(
+            host=options['host'], port=options['port'],
+            password=options['password']
+        )
+        iterations = options['iterations']
+
+        self.stdout.write("{} iterations against {}:{}".format(
+            iterations, options['host'], options['port']))
+
+        for section in (None, 'replication', 'memory', 'keyspace'):
+            elapsed = self._measure(lambda: client.info(section), iterations)
+            self.stdout.write("INFO {:<12} {:>10.1f} us/call {:>8} bytes".format(
+                section or '', elapsed, self._payload_size(client, section)))
+
+        # is_master + is_eligible_for_backup + get_replication_info on a slave
+        before = self._measure(
+            lambda: [client.info() for _ in range(3)], iterations)
+        after = self._measure(lambda: client.info('replication'), iterations)
+        self.stdout.write(
+            "replication checks  {:>10.1f} us before, {:.1f} us with "
+            "sections and snapshot".format(before, after))
+
+    def _measure(self, command, iterations):
+        started_at = time()
+        for _ in range(iterations):
+            command()
+        return (time() - started_at) * 1000000 / iterations
+
+    def _payload_size(self, client, section):
+        args = ('INFO', section) if section else ('INFO',)
+        connection = client.connection_pool.get_connection('INFO')
+        try:
+            connection.send_command(*args)
+            return len(connection.read_response())
+        finally:
+            client.connection_pool.release(connection)
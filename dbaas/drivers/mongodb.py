@@ -9,9 +9,9 @@ from . import DatabaseInfraStatus
 from . import DatabaseStatus
 from . import AuthenticationError
 from . import ConnectionError
+from . import REPLICATION_LAG_UNKNOWN
 from util import make_db_random_password
 from system.models import Configuration
-from dateutil import tz
 
 LOG = logging.getLogger(__name__)
 
@@ -22,6 +22,7 @@ MONGO_CONNECTION_DEFAULT_TIMEOUT = 5
 class MongoDB(BaseDriver):
 
     default_port = 27017
+    replication_max_lag = 2
 
     RESERVED_DATABASES_NAME = ['admin', 'config', 'local']
 
@@ -226,10 +227,30 @@ class MongoDB(BaseDriver):
     def update_user(self, credential):
         self.create_user(credential)
 
+    def update_users(self, credentials, roles=["readWrite", "dbAdmin"]):
+        credentials = list(credentials)
+        if not credentials:
+            return
+
+        with self.pymongo() as client:
+            for credential in credentials:
+                client[credential.database.name].add_user(
+                    credential.user, password=credential.password,
+                    roles=roles)
+
     def remove_user(self, credential):
         with self.pymongo(database=credential.database) as mongo_database:
             mongo_database.remove_user(credential.user)
 
+    def remove_users(self, credentials):
+        credentials = list(credentials)
+        if not credentials:
+            return
+
+        with self.pymongo() as client:
+            for credential in credentials:
+                client[credential.database.name].remove_user(credential.user)
+
     def create_database(self, database):
         LOG.info("creating database %s" % database.name)
         with self.pymongo(database=database) as mongo_database:
@@ -269,6 +290,26 @@ class MongoDB(BaseDriver):
                 raise ConnectionError(
                     'Error connection to databaseinfra %s: %s' % (self.databaseinfra, e.message))
 
+    def discover_roles(self, instances):
+        if self.databaseinfra.instances.count() == 1:
+            return dict((instance, self.MASTER) for instance in instances)
+
+        with self.pymongo() as client:
+            replSetGetStatus = client.admin.command('replSetGetStatus')
+
+        primaries = [member['name'] for member in replSetGetStatus['members']
+                     if member['stateStr'] == 'PRIMARY']
+
+        roles = {}
+        for instance in instances:
+            address = "{}:{}".format(instance.address, instance.port)
+            if address in primaries and not instance.is_arbiter:
+                roles[instance] = self.MASTER
+            else:
+                roles[instance] = self.SLAVE
+
+        return roles
+
     def check_instance_is_master(self, instance):
         if instance.is_arbiter:
             return False
@@ -288,45 +329,78 @@ class MongoDB(BaseDriver):
                 raise ConnectionError(
                     'Error connection to databaseinfra %s: %s' % (self.databaseinfra, e.message))
 
-    def get_replication_info(self, instance):
-        if self.check_instance_is_master(instance=instance):
-            return 0
-
+    @contextmanager
+    def replication_lag_client(self):
         with self.pymongo() as client:
+            yield client
 
-            replSetGetStatus = client.admin.command('replSetGetStatus')
-            primary_opttime = None
-            for member in replSetGetStatus['members']:
-                if member['stateStr'] == 'PRIMARY':
-                    primary_opttime = member['optimeDate'].replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal())
+    def get_replication_lags(self, client, instances):
+        lags = dict((instance, 0) for instance in instances
+                    if instance.is_arbiter)
+        instances = [instance for instance in instances
+                     if not instance.is_arbiter]
+        if not instances:
+            return lags
+
+        if self.databaseinfra.instances.count() == 1:
+            lags.update((instance, 0) for instance in instances)
+            return lags
 
-            if primary_opttime is None:
-                raise Exception("There is not any Primary in the Replica Set")
+        replSetGetStatus = client.admin.command('replSetGetStatus')
+        members = dict((member['name'], member)
+                       for member in replSetGetStatus['members'])
 
-            instance_opttime = None
-            for member in replSetGetStatus['members']:
-                if member["name"] == "{}:{}".format(instance.address, instance.port):
-                    instance_opttime = member['optimeDate'].replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal())
-                    instance_member = member
+        primary_opttime = None
+        for member in members.values():
+            if member['stateStr'] == 'PRIMARY':
+                primary_opttime = member['optimeDate']
 
-            if instance_opttime is None:
+        if primary_opttime is None:
+            raise Exception("There is not any Primary in the Replica Set")
+
+        for instance in instances:
+            member = members.get("{}:{}".format(instance.address, instance.port))
+            if member is None:
                 raise Exception("Could not find the instance in the Replica Set")
 
-        delay = primary_opttime - instance_opttime
-        seconds_delay = delay.days * 24 * 3600 + delay.seconds
-        LOG.info("The instance {} is {} seconds behind Primary".format(instance, seconds_delay))
+            delay = primary_opttime - member['optimeDate']
+            seconds_delay = delay.days * 24 * 3600 + delay.seconds
 
-        if seconds_delay == 0 and instance_member["stateStr"] not in ["PRIMARY", "SECONDARY"]:
-            LOG.info("The instance {} is 0 seconds behind Primary, but it is not Secondary. It is {}".format(instance, instance_member["stateStr"]))
-            return 100000
+            if seconds_delay == 0 and member["stateStr"] not in ["PRIMARY", "SECONDARY"]:
+                LOG.info("The instance {} is 0 seconds behind Primary, but it is not Secondary. It is {}".format(instance, member["stateStr"]))
+                seconds_delay = REPLICATION_LAG_UNKNOWN
 
+            lags[instance] = seconds_delay
+
+        return lags
+
+    def get_members_state(self, client, instances):
+        """
+        Returns a mapping of instance to its (health, stateStr) on the
+        replica set, as seen by the member client is connected to
+        """
+        replSetGetStatus = client.admin.command('replSetGetStatus')
+        members = dict((member['name'], member)
+                       for member in replSetGetStatus['members'])
+
+        states = {}
+        for instance in instances:
+            member = members.get("{}:{}".format(instance.address, instance.port))
+            if member is None:
+                raise Exception("Could not find the instance in the Replica Set")
+            states[instance] = (member['health'], member['stateStr'])
+
+        return states
+
+    def get_replication_info(self, instance):
+        with self.replication_lag_client() as client:
+            seconds_delay = self.get_replication_lags(client, [instance])[instance]
+
+        LOG.info("The instance {} is {} seconds behind Primary".format(instance, seconds_delay))
         return seconds_delay
 
     def is_replication_ok(self, instance):
-        if self.check_instance_is_master(instance=instance):
-            return True
-
-        if self.get_replication_info(instance=instance) <= 2:
+        if self.get_replication_info(instance=instance) <= self.replication_max_lag:
             return True
 
         return False
@@ -347,6 +421,8 @@ class MongoDB(BaseDriver):
             client.admin.command('replSetStepDown', 10)
         except pymongo.errors.PyMongoError, e:
             pass
+        finally:
+            self.clear_roles_cache()
 
     def get_database_agents(self):
         return ['td-agent', 'monit']
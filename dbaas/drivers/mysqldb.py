@@ -15,6 +15,7 @@ from . import InvalidCredential
 from . import DatabaseStatus
 from . import DatabaseDoesNotExist
 from . import CredentialAlreadyExists
+from . import REPLICATION_LAG_UNKNOWN
 from util import make_db_random_password
 from system.models import Configuration
 from util import exec_remote_command
@@ -98,7 +99,8 @@ class MySQL(BaseDriver):
     def mysqldb(self, instance=None, database=None):
         client = None
         try:
-            yield self.__mysql_client__(instance)
+            client = self.__mysql_client__(instance)
+            yield client
         except _mysql_exceptions.OperationalError as e:
             if e.args[0] == ER_ACCESS_DENIED_ERROR:
                 raise AuthenticationError(e.args[1])
@@ -118,32 +120,35 @@ class MySQL(BaseDriver):
                 LOG.warn('Error disconnecting from databaseinfra %s. Ignoring...',
                          self.databaseinfra, exc_info=True)
 
-    def __query(self, query_string, instance=None):
-        with self.mysqldb(instance=instance) as client:
-            try:
-                LOG.debug("query_string: %s" % query_string)
-                client.query(query_string)
-                r = client.store_result()
-                if r is not None:
-                    return r.fetch_row(maxrows=0, how=1)
-            except _mysql_exceptions.ProgrammingError as e:
-                LOG.error("__query ProgrammingError: %s" % e)
-                if e.args[0] == ER_DB_CREATE_EXISTS:
-                    raise DatabaseAlreadyExists(e.args[1])
-                else:
-                    raise GenericDriverError(e.args)
-            except _mysql_exceptions.OperationalError as e:
-                LOG.error("__query OperationalError: %s" % e)
-                if e.args[0] == ER_DB_DROP_EXISTS:
-                    raise DatabaseDoesNotExist(e.args[1])
-                elif e.args[0] == ER_CANNOT_USER:
-                    raise InvalidCredential(e.args[1])
-                elif e.args[0] == ER_WRONG_STRING_LENGTH:
-                    raise InvalidCredential(e.args[1])
-                else:
-                    raise GenericDriverError(e.args)
-            except Exception as e:
-                GenericDriverError(e.args)
+    def __query(self, query_string, instance=None, client=None):
+        if client is None:
+            with self.mysqldb(instance=instance) as client:
+                return self.__query(query_string, client=client)
+
+        try:
+            LOG.debug("query_string: %s" % query_string)
+            client.query(query_string)
+            r = client.store_result()
+            if r is not None:
+                return r.fetch_row(maxrows=0, how=1)
+        except _mysql_exceptions.ProgrammingError as e:
+            LOG.error("__query ProgrammingError: %s" % e)
+            if e.args[0] == ER_DB_CREATE_EXISTS:
+                raise DatabaseAlreadyExists(e.args[1])
+            else:
+                raise GenericDriverError(e.args)
+        except _mysql_exceptions.OperationalError as e:
+            LOG.error("__query OperationalError: %s" % e)
+            if e.args[0] == ER_DB_DROP_EXISTS:
+                raise DatabaseDoesNotExist(e.args[1])
+            elif e.args[0] == ER_CANNOT_USER:
+                raise InvalidCredential(e.args[1])
+            elif e.args[0] == ER_WRONG_STRING_LENGTH:
+                raise InvalidCredential(e.args[1])
+            else:
+                raise GenericDriverError(e.args)
+        except Exception as e:
+            GenericDriverError(e.args)
 
     def query(self, query_string, instance=None):
         return self.__query(query_string, instance)
@@ -235,14 +240,14 @@ class MySQL(BaseDriver):
         results = self.__query("SHOW databases", instance=instance)
         return [result["Database"] for result in results]
 
-    def disconnect_user(self, credential):
+    def disconnect_user(self, credential, client=None):
         # It works only in mysql >= 5.5
         r = self.__query("SELECT id FROM information_schema.processlist WHERE user='%s' AND db='%s'" %
-                         (credential.user, credential.database))
+                         (credential.user, credential.database), client=client)
         for session in r:
             LOG.info("disconnecting user %s from database %s id_session %s" %
                      (credential.user, credential.database, session['id']))
-            self.__query("KILL CONNECTION %s" % session['id'])
+            self.__query("KILL CONNECTION %s" % session['id'], client=client)
 
     def remove_user(self, credential):
         LOG.info("removing user %s from %s" %
@@ -250,10 +255,42 @@ class MySQL(BaseDriver):
         self.disconnect_user(credential)
         self.__query("DROP USER '%s'@'%%'" % credential.user)
 
+    def remove_users(self, credentials):
+        credentials = list(credentials)
+        if not credentials:
+            return
+
+        with self.mysqldb() as client:
+            for credential in credentials:
+                LOG.info("removing user %s from %s" %
+                         (credential.user, credential.database))
+                self.disconnect_user(credential, client=client)
+                self.__query(
+                    "DROP USER '%s'@'%%'" % credential.user, client=client)
+
     def update_user(self, credential):
         self.remove_user(credential)
         self.create_user(credential)
 
+    def update_users(self, credentials, roles=["ALL PRIVILEGES"]):
+        credentials = list(credentials)
+        if not credentials:
+            return
+
+        with self.mysqldb() as client:
+            for credential in credentials:
+                LOG.info("updating user %s to %s" %
+                         (credential.user, credential.database))
+                self.disconnect_user(credential, client=client)
+                self.__query(
+                    "DROP USER '%s'@'%%'" % credential.user, client=client)
+                self.__query("CREATE USER '%s'@'%%' IDENTIFIED BY '%s'" %
+                             (credential.user, credential.password),
+                             client=client)
+                self.__query("GRANT %s ON %s.* TO '%s'@'%%'" %
+                             (','.join(roles), credential.database,
+                              credential.user), client=client)
+
     def list_users(self, instance=None):
         LOG.info("listing users in %s" % (self.databaseinfra))
         results = self.__query(
@@ -294,6 +331,39 @@ class MySQL(BaseDriver):
             driver=self, instance=instance
         )
 
+    @contextmanager
+    def replication_lag_client(self):
+        clients = {}
+        try:
+            yield clients
+        finally:
+            for client in clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    LOG.warn('Error disconnecting from databaseinfra %s. Ignoring...',
+                             self.databaseinfra, exc_info=True)
+
+    def get_replication_lags(self, client, instances):
+        lags = {}
+        for instance in instances:
+            if instance not in client:
+                client[instance] = self.get_client(instance)
+
+            client[instance].query("show slave status")
+            results = client[instance].store_result().fetch_row(maxrows=0, how=1)
+            if not results:
+                lags[instance] = 0
+                continue
+
+            seconds_behind_master = results[0]['Seconds_Behind_Master']
+            if seconds_behind_master is None:
+                lags[instance] = REPLICATION_LAG_UNKNOWN
+            else:
+                lags[instance] = int(seconds_behind_master)
+
+        return lags
+
     def get_replication_info(self, instance):
         results = self.__query(
             query_string="show slave status", instance=instance)
@@ -318,7 +388,10 @@ class MySQL(BaseDriver):
         return '/data/data/'
 
     def switch_master(self):
-        return self.replication_topology_driver.switch_master(driver=self)
+        try:
+            return self.replication_topology_driver.switch_master(driver=self)
+        finally:
+            self.clear_roles_cache()
 
     def start_slave(self, instance):
         client = self.get_client(instance)
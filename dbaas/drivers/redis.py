@@ -8,6 +8,7 @@ from . import BaseDriver
 from . import DatabaseInfraStatus
 from . import DatabaseStatus
 from . import ConnectionError
+from . import REPLICATION_LAG_UNKNOWN
 from system.models import Configuration
 from physical.models import Instance
 from util import exec_remote_command
@@ -24,6 +25,9 @@ class Redis(BaseDriver):
 
     default_port = 6379
 
+    # Replicas acknowledge the master once per second
+    replication_max_lag = 1
+
     def __concatenate_instances(self):
         if self.databaseinfra.plan.is_ha:
             return ",".join(["%s:%s" % (instance.address, instance.port)
@@ -198,23 +202,23 @@ class Redis(BaseDriver):
             databaseinfra_model=self.databaseinfra)
 
         with self.redis() as client:
-            json_server_info = client.info()
+            server_info = client.info('server')
+            memory_info = client.info('memory')
 
-            databaseinfra_status.version = json_server_info.get(
+            databaseinfra_status.version = server_info.get(
                 'redis_version', None)
-            databaseinfra_status.used_size_in_bytes = json_server_info.get(
+            databaseinfra_status.used_size_in_bytes = memory_info.get(
                 'used_memory', 0)
 
-            list_databases = self.list_databases()
+            try:
+                is_alive = bool(client.ping())
+            except Exception:
+                is_alive = False
+
             for database in self.databaseinfra.databases.all():
                 database_name = database.name
                 db_status = DatabaseStatus(database)
-                try:
-                    if self.check_status():
-                        db_status.is_alive = True
-                except:
-                    pass
-
+                db_status.is_alive = is_alive
                 db_status.total_size_in_bytes = 0
                 db_status.used_size_in_bytes = databaseinfra_status.used_size_in_bytes
 
@@ -223,14 +227,53 @@ class Redis(BaseDriver):
 
         return databaseinfra_status
 
+    @contextmanager
+    def replication_lag_client(self):
+        with self.redis() as client:
+            yield client
+
+    def __get_master_address(self, client):
+        connection_pool = client.connection_pool
+        if hasattr(connection_pool, 'get_master_address'):
+            return "%s:%s" % connection_pool.get_master_address()
+
+        kwargs = connection_pool.connection_kwargs
+        return "%s:%s" % (kwargs['host'], kwargs['port'])
+
+    def get_replication_lags(self, client, instances):
+        instances = [instance for instance in instances
+                     if instance.instance_type == Instance.REDIS]
+        if not instances:
+            return {}
+
+        master_address = self.__get_master_address(client)
+        replication_info = client.info('replication')
+        slaves = {}
+        for index in range(int(replication_info.get('connected_slaves', 0))):
+            slave = replication_info['slave%d' % index]
+            slaves["%s:%s" % (slave['ip'], slave['port'])] = slave
+
+        lags = {}
+        for instance in instances:
+            address = "%s:%s" % (instance.address, instance.port)
+            slave = slaves.get(address)
+            if address == master_address:
+                lags[instance] = 0
+            elif slave and slave.get('state') == 'online':
+                lags[instance] = int(slave.get('lag', 0))
+            else:
+                lags[instance] = REPLICATION_LAG_UNKNOWN
+
+        return lags
+
     def get_replication_info(self, instance):
         if self.check_instance_is_master(instance=instance):
             return 0
 
         with self.redis(instance=instance) as client:
-            server_info = client.info()
+            replication_info = client.info('replication')
 
-            return int(server_info['master_last_io_seconds_ago'])
+            return int(replication_info['master_last_io_seconds_ago'])
 
     def is_replication_ok(self, instance):
         replication_info = int(self.get_replication_info(instance=instance))
@@ -270,7 +313,7 @@ class Redis(BaseDriver):
 
         with self.redis(instance=instance) as client:
             try:
-                info = client.info()
+                info = client.info('replication')
                 if info['role'] == 'slave':
                     return True
                 else:
@@ -279,6 +322,26 @@ class Redis(BaseDriver):
                 raise ConnectionError(
                     'Error connection to databaseinfra %s: %s' % (self.databaseinfra, str(e)))
 
+    def discover_roles(self, instances):
+        if not self.databaseinfra.plan.is_ha:
+            return super(Redis, self).discover_roles(instances)
+
+        try:
+            master_address = "%s:%s" % self.get_sentinel_client().discover_master(
+                self.databaseinfra.name)
+        except Exception as e:
+            raise ConnectionError(
+                'Error connection to databaseinfra %s: %s' % (self.databaseinfra, str(e)))
+
+        roles = {}
+        for instance in instances:
+            if "%s:%s" % (instance.address, instance.port) == master_address:
+                roles[instance] = self.MASTER
+            else:
+                roles[instance] = self.SLAVE
+
+        return roles
+
     def check_instance_is_master(self, instance):
         if instance.instance_type == Instance.REDIS_SENTINEL:
             return False
@@ -288,7 +351,7 @@ class Redis(BaseDriver):
 
         with self.redis(instance=instance) as client:
             try:
-                info = client.info()
+                info = client.info('replication')
                 if info['role'] == 'slave':
                     return False
                 else:
@@ -342,6 +405,7 @@ class Redis(BaseDriver):
                                           password=host_attr.vm_password,
                                           command=script,
                                           output=output)
+        self.clear_roles_cache()
         LOG.info(output)
         if return_code != 0:
             raise Exception(str(output))
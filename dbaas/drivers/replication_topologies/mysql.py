@@ -98,8 +98,15 @@ class MySQLFlipper(BaseMysql):
         )
 
     def switch_master(self, driver):
-        master = driver.get_master_instance()
-        slave = driver.get_slave_instances()[0]
+        # roles may have changed since cached, by FoxHA for instance
+        roles = driver.discover_roles(driver.get_database_instances())
+        masters = [instance for instance, role in roles.items()
+                   if role == driver.MASTER]
+        slaves = [instance for instance, role in roles.items()
+                  if role != driver.MASTER]
+        if len(masters) != 1 or not slaves:
+            raise Exception("Master could not be detected")
+        master, slave = masters[0], slaves[0]
         host = master.hostname
 
         host_attr = HostAttr.objects.get(host=host)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from physical.models import DatabaseInfra
+from physical.tests import factory as factory_physical
+from ..base import ConnectionError, ReplicationLagTimeout
+from ..fake import FakeDriver
+
+
+class ReplicationLagTestCase(TestCase):
+
+    def setUp(self):
+        self.databaseinfra = factory_physical.DatabaseInfraFactory()
+        self.instance = factory_physical.InstanceFactory(
+            databaseinfra=self.databaseinfra)
+        self.driver = FakeDriver(databaseinfra=self.databaseinfra)
+
+    @mock.patch('drivers.base.sleep')
+    def test_wait_until_replica_caught_up(self, sleep):
+        lags = [{self.instance: 20}, {self.instance: 4}, {self.instance: 0}]
+        with mock.patch.object(
+            FakeDriver, 'get_replication_lags', side_effect=lags
+        ):
+            series = self.driver.wait_replication_lag(instances=[self.instance])
+
+        self.assertEqual([lag for _, lag in series], lags)
+        self.assertEqual(
+            sleep.call_args_list, [mock.call(10), mock.call(2)]
+        )
+
+    @mock.patch('drivers.base.sleep')
+    def test_wait_timeout(self, sleep):
+        with mock.patch.object(
+            FakeDriver, 'get_replication_lags',
+            return_value={self.instance: 30}
+        ):
+            self.assertRaises(
+                ReplicationLagTimeout, self.driver.wait_replication_lag,
+                instances=[self.instance], timeout=0
+            )
+
+    @mock.patch('drivers.base.sleep')
+    def test_switch_after_replication_ok(self, sleep):
+        with mock.patch.object(
+            FakeDriver, 'get_replication_lags',
+            return_value={self.instance: 0}
+        ), mock.patch.object(FakeDriver, 'switch_master') as switch_master:
+            series = self.driver.check_replication_and_switch(self.instance)
+
+        self.assertTrue(switch_master.called)
+        self.assertEqual(series, [(0, {self.instance: 0})])
+        self.assertFalse(sleep.called)
+
+    def test_switch_keeps_errors_other_than_lag(self):
+        with mock.patch.object(
+            FakeDriver, 'get_replication_lags',
+            side_effect=ConnectionError('replica unreachable')
+        ), mock.patch.object(FakeDriver, 'switch_master') as switch_master:
+            self.assertRaises(
+                ConnectionError, self.driver.check_replication_and_switch,
+                self.instance
+            )
+
+        self.assertFalse(switch_master.called)
+
+
+class RolesTestCase(TestCase):
+
+    def setUp(self):
+        self.databaseinfra = factory_physical.DatabaseInfraFactory()
+        self.master = factory_physical.InstanceFactory(
+            databaseinfra=self.databaseinfra, port=1000)
+        self.slave = factory_physical.InstanceFactory(
+            databaseinfra=self.databaseinfra, port=1001)
+        self.driver = FakeDriver(databaseinfra=self.databaseinfra)
+        self.driver.clear_roles_cache()
+
+        patcher = mock.patch.object(
+            FakeDriver, 'get_database_instances',
+            return_value=[self.master, self.slave]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(
+            FakeDriver, 'check_instance_is_master',
+            side_effect=lambda instance: instance == self.master
+        )
+        self.check_instance_is_master = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_roles(self):
+        self.assertEqual(
+            self.driver.get_roles(),
+            {self.master: FakeDriver.MASTER, self.slave: FakeDriver.SLAVE}
+        )
+
+    def test_master_and_slaves(self):
+        self.assertEqual(self.driver.get_master_instance(), self.master)
+        self.assertEqual(self.driver.get_slave_instances(), [self.slave])
+
+    def test_roles_are_cached(self):
+        self.driver.get_master_instance()
+        self.driver.get_slave_instances()
+        self.assertEqual(self.check_instance_is_master.call_count, 2)
+
+    def test_clear_roles_cache(self):
+        self.driver.get_roles()
+        self.driver.clear_roles_cache()
+        self.driver.get_roles()
+        self.assertEqual(self.check_instance_is_master.call_count, 4)
+
+    def test_clear_roles_cache_from_another_driver(self):
+        self.driver.get_roles()
+        FakeDriver(databaseinfra=DatabaseInfra.objects.get(
+            pk=self.databaseinfra.pk)).clear_roles_cache()
+        self.driver.get_roles()
+        self.assertEqual(self.check_instance_is_master.call_count, 4)
+
+    def test_no_master(self):
+        self.check_instance_is_master.side_effect = lambda instance: False
+        self.assertIsNone(self.driver.get_master_instance())
+        self.assertRaises(Exception, self.driver.get_slave_instances)
+
+    def test_roles_without_master_are_not_cached(self):
+        self.check_instance_is_master.side_effect = lambda instance: False
+        self.assertIsNone(self.driver.get_master_instance())
+
+        self.check_instance_is_master.side_effect = (
+            lambda instance: instance == self.master)
+        self.assertEqual(self.driver.get_master_instance(), self.master)
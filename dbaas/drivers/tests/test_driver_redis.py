@@ -7,6 +7,7 @@ from drivers import DriverFactory
 from physical.tests import factory as factory_physical
 from logical.tests import factory as factory_logical
 from logical.models import Database
+from physical.models import Instance
 from ..redis import Redis
 
 LOG = logging.getLogger(__name__)
@@ -83,3 +84,37 @@ class ManageDatabaseRedisTestCase(AbstractTestDriverRedis):
         if not Database.objects.filter(databaseinfra_id=self.databaseinfra.id):
             self.database.delete()
         super(ManageDatabaseRedisTestCase, self).tearDown()
+
+
+class InfoSectionsRedisTestCase(AbstractTestDriverRedis):
+
+    """ Test case to reading only the needed INFO sections """
+
+    def setUp(self):
+        super(InfoSectionsRedisTestCase, self).setUp()
+        self.client = mock.Mock()
+        self.client.info.return_value = {'role': 'slave'}
+
+    @mock.patch.object(Redis, 'redis')
+    def test_info_reads_server_and_memory(self, redis):
+        redis.return_value.__enter__.return_value = self.client
+        self.client.info.side_effect = [
+            {'redis_version': '2.8.17'}, {'used_memory': 1024}]
+
+        status = self.driver.info()
+        self.assertEqual('2.8.17', status.version)
+        self.assertEqual(1024, status.used_size_in_bytes)
+        self.assertEqual(
+            self.client.info.call_args_list,
+            [mock.call('server'), mock.call('memory')]
+        )
+
+    @mock.patch.object(Redis, 'redis')
+    def test_check_instance_is_master_reads_replication(self, redis):
+        redis.return_value.__enter__.return_value = self.client
+        factory_physical.InstanceFactory(
+            databaseinfra=self.databaseinfra, port=6380,
+            instance_type=Instance.REDIS)
+
+        self.assertFalse(self.driver.check_instance_is_master(self.instance))
+        self.client.info.assert_called_once_with('replication')
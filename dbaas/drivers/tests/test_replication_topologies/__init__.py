@@ -50,6 +50,7 @@ class AbstractReplicationTopologySettingsTestCase(TestCase):
         return (
             'workflow.steps.util.volume_migration.create_volume.CreateVolume',
             'workflow.steps.util.volume_migration.mount_volume.MountVolume',
+            'workflow.steps.util.volume_migration.sync_data.SyncData',
             'workflow.steps.util.volume_migration.stop_database.StopDatabase',
             'workflow.steps.util.volume_migration.copy_data.CopyData',
             'workflow.steps.util.volume_migration.umount_volumes.UmountVolumes',
@@ -492,26 +492,30 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
                 'quarantine_retention_days')
         return super(DatabaseAdmin, self).delete_view(request, object_id, extra_context=extra_context)
 
-    def delete_model(modeladmin, request, obj):
-
-        LOG.debug("Deleting {}".format(obj))
-        database = obj
-
+    def can_be_deleted(modeladmin, request, database):
         if database.status != Database.ALIVE or not database.database_status.is_alive:
             modeladmin.message_user(
                 request, "Database {} is not alive and cannot be deleted".format(database.name), level=messages.ERROR)
-            url = reverse('admin:logical_database_changelist')
-            return HttpResponseRedirect(url)
+            return False
 
         if database.is_beeing_used_elsewhere():
             modeladmin.message_user(
                 request, "Database {} cannot be deleted because it is in use by another task.".format(database.name), level=messages.ERROR)
-            url = reverse('admin:logical_database_changelist')
-            return HttpResponseRedirect(url)
+            return False
 
         if database.has_migration_started():
             modeladmin.message_user(
                 request, "Database {} cannot be deleted because it is beeing migrated.".format(database.name), level=messages.ERROR)
+            return False
+
+        return True
+
+    def delete_model(modeladmin, request, obj):
+
+        LOG.debug("Deleting {}".format(obj))
+        database = obj
+
+        if not modeladmin.can_be_deleted(request, database):
             url = reverse('admin:logical_database_changelist')
             return HttpResponseRedirect(url)
 
@@ -1088,11 +1092,18 @@ class DatabaseAdmin(admin.DjangoServicesAdmin):
             )
 
             if n:
+                to_quarantine = []
                 for obj in queryset:
                     obj_display = force_text(obj)
                     self.log_deletion(request, obj, obj_display)
-                    # remove the object
-                    self.delete_model(request, obj)
+                    if obj.is_in_quarantine:
+                        # remove the object
+                        self.delete_model(request, obj)
+                    elif self.can_be_deleted(request, obj):
+                        # passwords are reset all at once below
+                        to_quarantine.append(obj)
+
+                Database.put_in_quarantine(to_quarantine)
 
                 self.message_user(request, _("Successfully deleted %(count)d %(items)s.") % {
                     "count": n, "items": model_ngettext(self.opts, n)
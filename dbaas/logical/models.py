@@ -3,16 +3,18 @@ from __future__ import absolute_import, unicode_literals
 import simple_audit
 import logging
 import datetime
-from django.db import models
+from django.db import connection, models, transaction
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from django_extensions.db.fields.encrypted import EncryptedCharField
 from django.utils.functional import cached_property
 from util import slugify, make_db_random_password
 from util.models import BaseModel
-from physical.models import DatabaseInfra, Environment, Plan
+from physical.models import DatabaseInfra, DiskOffering, EngineType
+from physical.models import Environment, Plan
 from drivers import factory_for
 from system.models import Configuration
 from datetime import date, timedelta
@@ -114,6 +116,8 @@ class Database(BaseModel):
 
     objects = models.Manager()
     alive = DatabaseAliveManager()
+    # when False the save and delete signals leave the engine alone
+    signals_manage_engine = True
     quarantine_time = Configuration.get_by_name_as_int(
         'quarantine_retention_days'
     )
@@ -156,24 +160,26 @@ class Database(BaseModel):
                     self.name
                 )
             )
-            for credential in self.credentials.all():
-                instance = factory_for(self.databaseinfra)
-                instance.remove_user(credential)
+            engine = factory_for(self.databaseinfra)
+            engine.remove_users(self.credentials.all())
             super(Database, self).delete(*args, **kwargs)
 
         else:
-            LOG.warning("Putting database {} in quarantine".format(self.name))
-            self.is_in_quarantine = True
-            self.save()
-            if self.credentials.exists():
-                for credential in self.credentials.all():
-                    new_password = make_db_random_password()
-                    new_credential = Credential.objects.get(pk=credential.id)
-                    new_credential.password = new_password
-                    new_credential.save()
-
-                    instance = factory_for(self.databaseinfra)
-                    instance.update_user(new_credential)
+            Database.put_in_quarantine([self])
+
+    @classmethod
+    def put_in_quarantine(cls, databases):
+        """ Moves databases to quarantine and resets all their passwords,
+        using one driver connection per databaseinfra """
+        for database in databases:
+            LOG.warning(
+                "Putting database {} in quarantine".format(database.name))
+            database.is_in_quarantine = True
+            database.save()
+
+        Credential.reset_passwords(
+            Credential.objects.filter(database__in=databases)
+        )
 
     def clean(self):
         if not self.pk:
@@ -186,6 +192,33 @@ class Database(BaseModel):
                 ))
             )
 
+    def create_in_engine(self):
+        """ Creates the database and its first credential in the engine """
+        if self.engine_type == 'redis':
+            return
+
+        LOG.info("a new database (%s) were created... provision it in the engine" % (
+            self.name))
+        engine = factory_for(self.databaseinfra)
+        engine.create_database(self)
+        self.automatic_create_first_credential()
+
+    def discard_provision(self):
+        """ Removes a database whose create_in_engine failed, along with
+        whatever the engine already created for it """
+        engine = factory_for(self.databaseinfra)
+        try:
+            engine.remove_users(self.credentials.all())
+        except Exception as e:
+            LOG.warning("Could not remove users of {}: {}".format(self.name, e))
+        try:
+            engine.remove_database(self)
+        except Exception as e:
+            LOG.warning("Could not remove database {}: {}".format(self.name, e))
+
+        self.signals_manage_engine = False
+        super(Database, self).delete()
+
     def automatic_create_first_credential(self):
         LOG.info("creating new credential for database {}".format(self.name))
         user = Credential.USER_PATTERN % self.name
@@ -193,7 +226,9 @@ class Database(BaseModel):
         return credential
 
     @classmethod
-    def provision(cls, name, databaseinfra):
+    def provision(cls, name, databaseinfra, create_in_engine=True):
+        """ Creates the database on databaseinfra. Without create_in_engine
+        only the row is saved and the caller must call create_in_engine """
         if not isinstance(databaseinfra, DatabaseInfra):
             raise ValidationError(
                 'Invalid databaseinfra type {} - {}'.format(
@@ -205,6 +240,7 @@ class Database(BaseModel):
         database.databaseinfra = databaseinfra
         database.environment = databaseinfra.environment
         database.name = name
+        database.signals_manage_engine = create_in_engine
         database.full_clean()
         database.save()
         database = Database.objects.get(pk=database.pk)
@@ -327,18 +363,69 @@ class Database(BaseModel):
             return round((1.0 * self.used_size_in_bytes / self.total_size) if self.total_size else 0, 2)
 
     @classmethod
-    def purge_quarantine(self):
-        quarantine_time = Configuration.get_by_name_as_int(
-            'quarantine_retention_days')
-        quarantine_time_dt = date.today() - timedelta(days=quarantine_time)
-        databases = Database.objects.filter(
-            is_in_quarantine=True, quarantine_dt__lte=quarantine_time_dt
+    def get_usage(cls, threshold=None):
+        """ Size usage of every alive database subscribed to email events,
+        computed by the database in a single query. Same rules as
+        total_size, returns dicts with id, name, team, environment__name,
+        used_size_in_bytes, total_size_in_bytes and percent_usage.
+        With a threshold only databases using at least threshold percent
+        are returned.
+        """
+        qn = connection.ops.quote_name
+        infra = qn(DatabaseInfra._meta.db_table)
+        disk_offering = qn(DiskOffering._meta.db_table)
+        engine_type = qn(EngineType._meta.db_table)
+        database = qn(cls._meta.db_table)
+
+        total_size = (
+            'CASE WHEN {infra}.{disk_offering_id} IS NOT NULL '
+            "AND {engine_type}.{name} <> 'redis' "
+            'THEN COALESCE({disk_offering}.{available_size_kb}, 0) * 1024.0 '
+            'ELSE {infra}.{per_database_size_mbytes} * 1048576.0 END'
+        ).format(
+            infra=infra, disk_offering=disk_offering, engine_type=engine_type,
+            disk_offering_id=qn('disk_offering_id'), name=qn('name'),
+            available_size_kb=qn('available_size_kb'),
+            per_database_size_mbytes=qn('per_database_size_mbytes'),
         )
-        for database in databases:
-            database.delete()
-            LOG.info("The database %s was deleted, because it was set to quarentine %d days ago" % (
-                database.name, quarantine_time)
-            )
+        percent_usage = (
+            'CASE WHEN ({total}) > 0 '
+            'THEN {database}.{used} * 100.0 / ({total}) ELSE 0 END'
+        ).format(
+            total=total_size, database=database, used=qn('used_size_in_bytes')
+        )
+
+        where, params = [], []
+        if threshold is not None:
+            where = ['({}) >= %s'.format(percent_usage)]
+            params = [threshold]
+
+        # the related values force the joins the raw sql relies on
+        return cls.objects.filter(
+            is_in_quarantine=False, subscribe_to_email_events=True
+        ).extra(
+            select={
+                'total_size_in_bytes': total_size,
+                'percent_usage': percent_usage,
+            },
+            where=where, params=params,
+        ).values(
+            'id', 'name', 'team', 'environment__name', 'used_size_in_bytes',
+            'databaseinfra__disk_offering__available_size_kb',
+            'databaseinfra__engine__engine_type__name',
+            'total_size_in_bytes', 'percent_usage',
+        ).order_by('team', '-percent_usage')
+
+    @classmethod
+    def purge_quarantine(self):
+        """ Removes the databases whose quarantine expired, leaving their
+        infras in place. The purge_quarantine task also destroys the
+        infras of cloudstack plans """
+        from logical.quarantine import QuarantinePurge
+
+        purge = QuarantinePurge(destroy_cloudstack=False)
+        purge.run()
+        return purge.summary
 
     @classmethod
     def clone(cls, database, clone_name, plan, environment, user):
@@ -535,6 +622,27 @@ class Credential(BaseModel):
         self.driver.update_user(self)
         self.save()
 
+    @classmethod
+    def reset_passwords(cls, credentials):
+        """ Reset every credential password to a new random password,
+        updating each databaseinfra in a single driver call """
+        infras = {}
+        for credential in credentials.select_related(
+            'database__databaseinfra'
+        ):
+            infras.setdefault(
+                credential.database.databaseinfra_id, []
+            ).append(credential)
+
+        for infra_credentials in infras.values():
+            with transaction.atomic():
+                for credential in infra_credentials:
+                    credential.password = make_db_random_password()
+                    credential.save()
+
+                driver = infra_credentials[0].database.databaseinfra.get_driver()
+                driver.update_users(infra_credentials)
+
     @classmethod
     def create_new_credential(cls, user, database):
         credential = Credential()
@@ -563,6 +671,8 @@ database pre delete signal. Removes database from the engine
 """
     database = kwargs.get("instance")
     LOG.debug("database pre-delete triggered")
+    if not database.signals_manage_engine:
+        return
     engine = factory_for(database.databaseinfra)
     engine.remove_database(database)
 
@@ -575,12 +685,20 @@ database post save signal. Creates the database in the driver and creates a new
     database = kwargs.get("instance")
     is_new = kwargs.get("created")
     LOG.debug("database post-save triggered")
-    if is_new and database.engine_type != 'redis':
-        LOG.info("a new database (%s) were created... provision it in the engine" % (
-            database.name))
-        engine = factory_for(database.databaseinfra)
-        engine.create_database(database)
-        database.automatic_create_first_credential()
+    if is_new and database.signals_manage_engine:
+        database.create_in_engine()
+    if is_new:
+        DatabaseInfra.refresh_summaries(
+            infra_ids=[database.databaseinfra_id])
+
+
+@receiver(post_delete, sender=Database)
+def database_post_delete(sender, **kwargs):
+    """
+database post delete signal. Refreshes the summary of its infra.
+"""
+    database = kwargs.get("instance")
+    DatabaseInfra.refresh_summaries(infra_ids=[database.databaseinfra_id])
 
 
 @receiver(pre_save, sender=Database)
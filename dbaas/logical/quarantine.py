@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from time import time
+from system.models import Configuration
+from physical.models import Plan
+from util import run_in_parallel
+from .models import Database, Credential
+
+LOG = logging.getLogger(__name__)
+
+PURGE_MAX_PARALLEL_DEFAULT = 4
+PURGE_CHUNK_SIZE_DEFAULT = 50
+
+
+class QuarantinePurge(object):
+
+    """
+    Removes every database whose quarantine expired.
+    Databases are grouped by databaseinfra and purged in chunks, the users
+    of a chunk are removed over a single driver connection. Infras are
+    purged concurrently, up to purge_quarantine_max_parallel_infras.
+    Progress is stored in the task after every chunk.
+    Infras of cloudstack plans are destroyed with destroy_infra, unless
+    destroy_cloudstack is False: then their databases are only removed,
+    like any other.
+    """
+
+    def __init__(self, task=None, max_parallel=None, chunk_size=None,
+                 destroy_cloudstack=True):
+        self.task = task
+        self.destroy_cloudstack = destroy_cloudstack
+        # purge_infra logs from the run_in_parallel threads
+        self.log_lock = threading.Lock()
+
+        if max_parallel is None:
+            max_parallel = Configuration.get_by_name_as_int(
+                'purge_quarantine_max_parallel_infras',
+                default=PURGE_MAX_PARALLEL_DEFAULT)
+        self.max_parallel = max_parallel
+
+        if chunk_size is None:
+            chunk_size = Configuration.get_by_name_as_int(
+                'purge_quarantine_chunk_size',
+                default=PURGE_CHUNK_SIZE_DEFAULT)
+        self.chunk_size = max(chunk_size, 1)
+
+        self.quarantine_time = Configuration.get_by_name_as_int(
+            'quarantine_retention_days')
+
+        self.expired = []
+        self.purged = []
+        self.errors = []
+        self.elapsed = 0
+
+    def log(self, msg):
+        LOG.info(msg)
+        if self.task:
+            with self.log_lock:
+                self.task.update_details(persist=True, details=msg)
+
+    def get_expired(self):
+        quarantine_time_dt = date.today() - timedelta(
+            days=self.quarantine_time)
+        return Database.objects.filter(
+            is_in_quarantine=True, quarantine_dt__lte=quarantine_time_dt
+        ).select_related(
+            'databaseinfra', 'databaseinfra__plan'
+        ).order_by('databaseinfra', 'pk')
+
+    def group_by_infra(self, databases):
+        infras = OrderedDict()
+        for database in databases:
+            infras.setdefault(database.databaseinfra_id, []).append(database)
+        return infras.values()
+
+    def chunks(self, databases):
+        for i in range(0, len(databases), self.chunk_size):
+            yield databases[i:i + self.chunk_size]
+
+    def purge_cloudstack(self, databaseinfra, databases):
+        from util.providers import destroy_infra
+
+        for database in databases:
+            destroy_infra(databaseinfra=databaseinfra, task=self.task)
+            self.purged.append(database)
+
+    def purge_chunk(self, driver, databases):
+        credentials = Credential.objects.filter(database__in=databases)
+        driver.remove_users(credentials.select_related('database'))
+        # users are gone from the engine, Database.delete must not try again
+        credentials.delete()
+
+        for database in databases:
+            database.delete()
+            self.purged.append(database)
+
+    def purge_infra(self, databases):
+        databaseinfra = databases[0].databaseinfra
+        if (self.destroy_cloudstack and
+                databaseinfra.plan.provider == Plan.CLOUDSTACK):
+            return self.purge_cloudstack(databaseinfra, databases)
+
+        driver = databaseinfra.get_driver()
+        done = 0
+        for chunk in self.chunks(databases):
+            self.purge_chunk(driver, chunk)
+            done += len(chunk)
+            self.log("\n{}: {} of {} databases purged".format(
+                databaseinfra, done, len(databases)))
+
+    def run(self):
+        started_at = time()
+        self.expired = list(self.get_expired())
+        infras = self.group_by_infra(self.expired)
+        self.log("\nPurging {} databases from {} infras, {} at a time".format(
+            len(self.expired), len(infras), self.max_parallel))
+
+        for databases, _, error in run_in_parallel(
+            self.purge_infra, infras, self.max_parallel
+        ):
+            if error:
+                self.errors.append((databases[0].databaseinfra, error))
+
+        self.elapsed = int(time() - started_at)
+        self.log("\n" + self.summary)
+        return not self.errors
+
+    @property
+    def summary(self):
+        summary = ("Purged {} of {} databases in quarantine for more than "
+                   "{} days in {}s").format(
+            len(self.purged), len(self.expired), self.quarantine_time,
+            self.elapsed)
+        for databaseinfra, error in self.errors:
+            summary += "\n{}: {}".format(databaseinfra, error)
+        return summary
@@ -1,9 +1,6 @@
-from logical.models import Database
-from system.models import Configuration
-from datetime import date, timedelta
+from logical.quarantine import QuarantinePurge
 from dbaas.celery import app
 from util.decorators import only_one
-from util.providers import destroy_infra
 from simple_audit.models import AuditRequest
 from notification.models import TaskHistory
 from account.models import AccountUser
@@ -23,23 +20,11 @@ def purge_quarantine(self,):
 
         LOG.info("id: %s | task: %s | kwargs: %s | args: %s" % (
             self.request.id, self.request.task, self.request.kwargs, str(self.request.args)))
-        quarantine_time = Configuration.get_by_name_as_int(
-            'quarantine_retention_days')
-        quarantine_time_dt = date.today() - timedelta(days=quarantine_time)
-
-        databases = Database.objects.filter(is_in_quarantine=True,
-                                            quarantine_dt__lte=quarantine_time_dt)
-
-        for database in databases:
-            if database.plan.provider == database.plan.CLOUDSTACK:
-                databaseinfra = database.databaseinfra
-
-                destroy_infra(databaseinfra=databaseinfra, task=task_history)
-            else:
-                database.delete()
-
-            LOG.info("The database %s was deleted, because it was set to quarentine %d days ago" % (
-                database.name, quarantine_time))
+        purge = QuarantinePurge(task=task_history)
+        if not purge.run():
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR, details=purge.summary)
+            return
 
         task_history.update_status_for(
             TaskHistory.STATUS_SUCCESS, details='Databases destroyed successfully')
@@ -68,3 +68,18 @@ class CredentialTestCase(TestCase):
         credential = factory_logical.CredentialFactory()
         credential.delete()
         remove_user.assert_called_once_with(credential)
+
+    @mock.patch.object(FakeDriver, 'update_users')
+    def test_reset_passwords_updates_driver_once_per_infra(self, update_users):
+        credential1 = factory_logical.CredentialFactory(database=self.database)
+        credential2 = factory_logical.CredentialFactory(database=self.database)
+        other_credential = factory_logical.CredentialFactory()
+
+        Credential.reset_passwords(Credential.objects.filter(
+            pk__in=[credential1.pk, credential2.pk, other_credential.pk]))
+
+        self.assertEqual(2, update_users.call_count)
+        for credential in (credential1, credential2, other_credential):
+            self.assertNotEqual(
+                credential.password,
+                Credential.objects.get(pk=credential.pk).password)
@@ -153,3 +153,39 @@ class DatabaseTestCase(TestCase):
         self.assertEqual(credential.user, "u_trinity_clone")
 
     '''
+
+
+@mock.patch('logical.models.factory_for')
+class ProvisionDatabaseTestCase(TestCase):
+
+    def setUp(self):
+        self.plan = physical_factory.PlanFactory()
+        self.environment = self.plan.environments.all()[0]
+        self.databaseinfra = physical_factory.DatabaseInfraFactory(
+            plan=self.plan, environment=self.environment, capacity=1)
+        physical_factory.InstanceFactory(databaseinfra=self.databaseinfra)
+
+    def provision(self):
+        from util.providers import provision_database
+        return provision_database(
+            plan=self.plan, environment=self.environment, name='provisioned')
+
+    def test_creates_database_in_engine(self, factory_for):
+        database = self.provision()
+
+        self.assertEqual(self.databaseinfra, database.databaseinfra)
+        factory_for.return_value.create_database.assert_called_once_with(
+            database)
+
+    def test_engine_error_releases_reservation(self, factory_for):
+        engine = factory_for.return_value
+        engine.create_database.side_effect = Exception('engine is down')
+        engine.remove_database.side_effect = Exception('not found')
+
+        self.assertRaises(Exception, self.provision)
+
+        self.assertFalse(Database.objects.filter(name='provisioned').exists())
+        self.assertTrue(engine.remove_database.called)
+
+        engine.create_database.side_effect = None
+        self.assertEqual(self.databaseinfra, self.provision().databaseinfra)
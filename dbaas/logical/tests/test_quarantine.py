@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from datetime import date, timedelta
+from django.test import TestCase
+from drivers.fake import FakeDriver
+from physical.models import Plan
+from physical.tests import factory as physical_factory
+from system.models import Configuration
+from ..models import Database
+from ..quarantine import QuarantinePurge
+from . import factory
+
+
+class QuarantinePurgeTestCase(TestCase):
+
+    def setUp(self):
+        Configuration(
+            name='quarantine_retention_days', value=7,
+            description='Quarantine retention days'
+        ).save()
+        self.databaseinfra = physical_factory.DatabaseInfraFactory()
+        self.other_databaseinfra = physical_factory.DatabaseInfraFactory()
+
+        self.expired = [
+            factory.DatabaseFactory(databaseinfra=self.databaseinfra),
+            factory.DatabaseFactory(databaseinfra=self.databaseinfra),
+            factory.DatabaseFactory(databaseinfra=self.databaseinfra),
+            factory.DatabaseFactory(databaseinfra=self.other_databaseinfra),
+        ]
+        self.recent = factory.DatabaseFactory(
+            databaseinfra=self.databaseinfra)
+
+        Database.objects.filter(
+            pk__in=[database.pk for database in self.expired]
+        ).update(
+            is_in_quarantine=True,
+            quarantine_dt=date.today() - timedelta(days=10)
+        )
+        Database.objects.filter(pk=self.recent.pk).update(
+            is_in_quarantine=True, quarantine_dt=date.today()
+        )
+
+    @mock.patch.object(FakeDriver, 'remove_users')
+    def test_purge_expired_databases(self, remove_users):
+        purge = QuarantinePurge(max_parallel=1, chunk_size=2)
+        self.assertTrue(purge.run())
+
+        self.assertEqual(4, len(purge.purged))
+        self.assertEqual(
+            [self.recent.pk],
+            list(Database.objects.values_list('pk', flat=True).filter(
+                is_in_quarantine=True))
+        )
+        # one call per chunk, 2 chunks for the first infra
+        self.assertEqual(3, remove_users.call_count)
+
+    @mock.patch.object(FakeDriver, 'remove_users')
+    def test_purge_keeps_going_when_an_infra_fails(self, remove_users):
+        remove_users.side_effect = [Exception('unreachable'), None]
+
+        purge = QuarantinePurge(max_parallel=1, chunk_size=10)
+        self.assertFalse(purge.run())
+
+        self.assertEqual(1, len(purge.purged))
+        self.assertEqual(1, len(purge.errors))
+        self.assertIn('unreachable', purge.summary)
+
+    @mock.patch('util.providers.destroy_infra')
+    @mock.patch.object(FakeDriver, 'remove_users')
+    def test_purge_destroys_cloudstack_infras(self, _, destroy_infra):
+        Plan.objects.filter(pk=self.databaseinfra.plan_id).update(
+            provider=Plan.CLOUDSTACK)
+
+        purge = QuarantinePurge(max_parallel=1)
+        self.assertTrue(purge.run())
+        self.assertTrue(destroy_infra.called)
+
+    @mock.patch('util.providers.destroy_infra')
+    @mock.patch.object(FakeDriver, 'remove_users')
+    def test_database_purge_keeps_cloudstack_infras(self, _, destroy_infra):
+        Plan.objects.filter(pk=self.databaseinfra.plan_id).update(
+            provider=Plan.CLOUDSTACK)
+
+        Database.purge_quarantine()
+        self.assertFalse(destroy_infra.called)
+        self.assertEqual(
+            [self.recent.pk],
+            list(Database.objects.values_list('pk', flat=True).filter(
+                is_in_quarantine=True))
+        )
+
+    def test_task_is_updated_under_lock(self):
+        task = mock.Mock()
+        purge = QuarantinePurge(task=task, max_parallel=2)
+        purge.log_lock = mock.MagicMock()
+
+        purge.log("purged")
+        self.assertTrue(purge.log_lock.__enter__.called)
+        task.update_details.assert_called_once_with(
+            persist=True, details="purged")
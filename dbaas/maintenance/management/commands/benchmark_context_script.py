@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from optparse import make_option
+from time import time
+from util import build_context_script, get_missing_script_variables
+from workflow.steps.util import test_bash_script_error
+from workflow.steps.util import build_mount_disk_script
+from workflow.steps.util import td_agent_script
+from workflow.steps.util import monit_script
+from maintenance.models import Maintenance
+
+
+class Command(BaseCommand):
+
+    '''
+        per host cost of rendering a script compiling it every time
+        against the compiled template cache of build_context_script
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--maintenance', dest='maintenance', type='int',
+                    default=None),
+        make_option('--hosts', dest='hosts', type='int', default=500),
+    )
+
+    def handle(self, *args, **options):
+        if options['maintenance']:
+            script = Maintenance.objects.get(
+                pk=options['maintenance']).main_script
+        else:
+            script = test_bash_script_error() + build_mount_disk_script() + \
+                td_agent_script() + monit_script()
+
+        hosts = options['hosts']
+        contexts = [
+            {'EXPORTPATH': '10.0.0.{}:/export/{}'.format(i % 255, i)}
+            for i in range(hosts)
+        ]
+        self.stdout.write("{} hosts, {} bytes script, missing variables: {}".format(
+            hosts, len(script),
+            get_missing_script_variables(script, contexts[0].keys())))
+
+        for label, render in (
+            ('compile per host', self._render_compiling),
+            ('cached template', build_context_script),
+        ):
+            started_at = time()
+            for context in contexts:
+                render(context, script)
+            elapsed = (time() - started_at) * 1000000 / hosts
+            self.stdout.write("{:<18} {:>10.1f} us/host".format(label, elapsed))
+
+    def _render_compiling(self, contextdict, script):
+        return Template(script.replace('\r', '')).render(Context(contextdict))
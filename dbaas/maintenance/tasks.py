@@ -6,6 +6,7 @@ import logging
 from notification.models import TaskHistory
 from util import get_worker_name
 from util import build_context_script
+from util import get_missing_script_variables
 from util import get_dict_lines
 from django.core.exceptions import ObjectDoesNotExist
 from registered_functions.functools import _get_function
@@ -32,6 +33,32 @@ def execute_scheduled_maintenance(self, maintenance_id):
     task_history.update_details(persist=True,
                                 details="Executing Maintenance: {}".format(maintenance))
 
+    parameters = [
+        (param.parameter_name, _get_function(param.function_name))
+        for param in models.MaintenanceParameters.objects.filter(
+            maintenance=maintenance)
+    ]
+
+    missing = get_missing_script_variables(
+        maintenance.main_script, [name for name, _ in parameters])
+    if maintenance.rollback_script:
+        missing += [
+            name for name in get_missing_script_variables(
+                maintenance.rollback_script,
+                [name for name, _ in parameters])
+            if name not in missing
+        ]
+    if missing:
+        models.Maintenance.objects.filter(id=maintenance_id,
+                                          ).update(status=maintenance.REJECTED, finished_at=datetime.now())
+        task_history.update_status_for(
+            TaskHistory.STATUS_ERROR,
+            details="No parameter for script variables: {}".format(
+                ", ".join(missing)))
+        LOG.warn("Maintenance {} rejected, missing parameters {}".format(
+            maintenance, missing))
+        return
+
     for hm in models.HostMaintenance.objects.filter(maintenance=maintenance):
         main_output = {}
         hm.status = hm.RUNNING
@@ -58,9 +85,8 @@ def execute_scheduled_maintenance(self, maintenance_id):
             continue
 
         param_dict = {}
-        for param in models.MaintenanceParameters.objects.filter(maintenance=maintenance):
-            param_function = _get_function(param.function_name)
-            param_dict[param.parameter_name] = param_function(host.id)
+        for parameter_name, param_function in parameters:
+            param_dict[parameter_name] = param_function(host.id)
 
         main_script = build_context_script(param_dict, maintenance.main_script)
         exit_status = exec_remote_command(server=host.address,
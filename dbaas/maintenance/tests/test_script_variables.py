@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from datetime import datetime
+import mock
+from django.test import TestCase
+from notification.models import TaskHistory
+from physical.tests import factory as factory_physical
+from util import get_script_template, get_missing_script_variables
+from ..models import Maintenance, HostMaintenance
+from ..tasks import execute_scheduled_maintenance
+
+
+@mock.patch('util.SCRIPT_TEMPLATE_CACHE_SIZE', 2)
+@mock.patch.dict('util._script_templates', clear=True)
+class ScriptTemplateCacheTestCase(TestCase):
+
+    def test_same_script_is_compiled_once(self):
+        template = get_script_template('echo {{ NAME }}')
+        self.assertIs(template, get_script_template('echo {{ NAME }}'))
+
+    def test_carriage_returns_share_template(self):
+        template = get_script_template('echo a\r\necho b')
+        self.assertIs(template, get_script_template('echo a\necho b'))
+
+    def test_least_recently_used_is_evicted(self):
+        first = get_script_template('echo 1')
+        second = get_script_template('echo 2')
+        get_script_template('echo 1')
+        get_script_template('echo 3')
+
+        self.assertIs(first, get_script_template('echo 1'))
+        self.assertIsNot(second, get_script_template('echo 2'))
+
+
+class MissingScriptVariablesTestCase(TestCase):
+
+    def test_unmapped_variable_is_missing(self):
+        self.assertEqual(
+            ['PORT'],
+            get_missing_script_variables(
+                'mongo {{ HOST }}:{{ PORT }} {{ HOST }}', ['HOST']))
+
+    def test_loop_and_with_variables_are_defined(self):
+        script = """
+            {% for instance in INSTANCES %}
+                echo {{ forloop.counter }} {{ instance.address }}
+            {% endfor %}
+            {% with path=DATA_PATH %}ls {{ path }}{% endwith %}
+        """
+        self.assertEqual(
+            [], get_missing_script_variables(script, ['INSTANCES']))
+
+    def test_if_flags_are_optional(self):
+        script = "{% if IS_HA %}echo {{ REPLICA_NAME }}{% endif %}"
+        self.assertEqual(
+            ['REPLICA_NAME'], get_missing_script_variables(script, []))
+
+
+@mock.patch('maintenance.tasks.get_worker_name', return_value='worker')
+@mock.patch('maintenance.tasks.exec_remote_command')
+class MaintenanceScriptVariablesTestCase(TestCase):
+
+    @mock.patch('maintenance.models.execute_scheduled_maintenance')
+    def setUp(self, scheduled_task):
+        scheduled_task.apply_async.return_value.task_id = 'maintenance-task'
+        self.host = factory_physical.HostFactory()
+        self.maintenance = Maintenance.objects.create(
+            description='Unmapped variable',
+            scheduled_for=datetime.now(),
+            main_script='echo {{ VAR }}',
+            maximum_workers=1,
+            hostsid=str(self.host.pk),
+        )
+
+    def test_unmapped_variable_rejects_maintenance(
+        self, exec_remote_command, _
+    ):
+        execute_scheduled_maintenance.apply(args=[self.maintenance.pk])
+
+        maintenance = Maintenance.objects.get(pk=self.maintenance.pk)
+        self.assertEqual(Maintenance.REJECTED, maintenance.status)
+        self.assertFalse(exec_remote_command.called)
+        self.assertEqual(
+            [HostMaintenance.WAITING],
+            list(HostMaintenance.objects.filter(
+                maintenance=maintenance).values_list('status', flat=True)))
+
+        task_history = TaskHistory.objects.latest('pk')
+        self.assertEqual(TaskHistory.STATUS_ERROR, task_history.task_status)
+        self.assertIn('VAR', task_history.details)
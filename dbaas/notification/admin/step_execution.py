@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from django.contrib import admin
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+class StepExecutionAdmin(admin.ModelAdmin):
+    actions = None
+    list_display = ("step", "engine", "direction", "status", "host",
+                    "started_at", "duration", "task")
+    list_filter = ("engine", "direction", "status")
+    search_fields = ("step", "host", "task__task_id")
+    readonly_fields = ("task", "engine", "step", "step_index", "direction",
+                       "host", "status", "started_at", "finished_at",
+                       "duration")
+    list_select_related = True
+    change_list_template = \
+        "admin/notification/stepexecution/change_list.html"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['report'] = self.model.get_report(
+            engine=request.GET.get('engine__exact'))
+        return super(StepExecutionAdmin, self).changelist_view(
+            request, extra_context=extra_context)
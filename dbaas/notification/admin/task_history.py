@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.translation import ugettext_lazy as _
 import logging
 
@@ -12,7 +12,7 @@ LOG = logging.getLogger(__name__)
 
 class TaskHistoryAdmin(admin.ModelAdmin):
     perm_add_database_infra = constants.PERM_ADD_DATABASE_INFRA
-    actions = None
+    actions = ['resume_workflows']
     list_display_basic = ["task_id", "friendly_task_name", "task_status", "arguments", "friendly_details", "created_at",
                           "ended_at"]
     list_display_advanced = list_display_basic + ["user"]
@@ -46,6 +46,33 @@ class TaskHistoryAdmin(admin.ModelAdmin):
 
     friendly_details_read.short_description = "Details"
 
+    def get_actions(self, request):
+        if not request.user.has_perm(self.perm_add_database_infra):
+            return {}
+        actions = super(TaskHistoryAdmin, self).get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def resume_workflows(self, request, queryset):
+        from workflow.workflow import claim_workflow_resume
+        from workflow.workflow import WorkflowNotResumable
+        from ..tasks import resume_workflow
+
+        for task_history in queryset:
+            try:
+                claim_workflow_resume(task_history)
+            except WorkflowNotResumable as e:
+                self.message_user(request, "{}: {}".format(
+                    task_history.task_id, e), level=messages.ERROR)
+                continue
+
+            resume_workflow.delay(
+                task_history_id=task_history.pk, user=request.user)
+            self.message_user(request, "{}: resume started".format(
+                task_history.task_id), level=messages.SUCCESS)
+
+    resume_workflows.short_description = _("Resume unfinished workflows")
+
     def has_delete_permission(self, request, obj=None):  # note the obj=None
         return False
 
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 import logging
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from django.utils import simplejson
 from logical.models import Database
+from workflow.checkpoint import dump_workflow_dict, load_workflow_dict
 
 from util.models import BaseModel
 
@@ -35,7 +37,8 @@ class TaskHistory(BaseModel):
     ended_at = models.DateTimeField(
         verbose_name=_("Ended at"), null=True, blank=True, editable=False)
     task_status = models.CharField(
-        _('Task Status'), max_length=100, default=STATUS_PENDING)
+        _('Task Status'), max_length=100, default=STATUS_PENDING,
+        db_index=True)
     context = models.TextField(null=True, blank=True)
     details = models.TextField(
         verbose_name=_("Details"), null=True, blank=True)
@@ -171,3 +174,226 @@ class TaskHistory(BaseModel):
         task_history.save()
 
         return task_history
+
+
+class StepExecution(BaseModel):
+
+    """
+    One step of a workflow run, written by the workflow engine.
+    Workflow steps run one after the other, so the report lists per engine
+    the steps that take most of a run, the candidates to parallelize.
+    """
+
+    DO = 'do'
+    UNDO = 'undo'
+    DIRECTIONS = ((DO, 'Do'), (UNDO, 'Undo'))
+
+    RUNNING = 'RUNNING'
+    SUCCESS = 'SUCCESS'
+    ERROR = 'ERROR'
+    STATUS = ((RUNNING, 'Running'), (SUCCESS, 'Success'), (ERROR, 'Error'))
+
+    CRITICAL_PATH_SHARE = 0.8
+
+    task = models.ForeignKey(
+        TaskHistory, related_name="step_executions", null=True, blank=True,
+        on_delete=models.SET_NULL)
+    engine = models.CharField(
+        _('Engine'), max_length=100, null=True, blank=True, db_index=True)
+    step = models.CharField(_('Step'), max_length=255, db_index=True)
+    step_index = models.PositiveSmallIntegerField(_('Step index'))
+    direction = models.CharField(
+        _('Direction'), max_length=10, choices=DIRECTIONS, default=DO)
+    host = models.CharField(
+        _('Host'), max_length=255, null=True, blank=True)
+    status = models.CharField(
+        _('Status'), max_length=10, choices=STATUS, default=RUNNING)
+    started_at = models.DateTimeField(_('Started at'))
+    finished_at = models.DateTimeField(_('Finished at'), null=True, blank=True)
+    duration = models.FloatField(_('Duration (s)'), null=True, blank=True)
+
+    class Meta:
+        ordering = ('-started_at', )
+
+    def __unicode__(self):
+        return "{} {} of {}".format(self.direction, self.step, self.task_id)
+
+    @classmethod
+    def start(cls, step, step_index, direction, task=None, engine=None,
+              host=None):
+        return cls.objects.create(
+            task=task, engine=engine, step=step, step_index=step_index,
+            direction=direction, host=host, started_at=datetime.now())
+
+    def finish(self, status):
+        self.finished_at = datetime.now()
+        self.duration = (self.finished_at - self.started_at).total_seconds()
+        self.status = status
+        self.save(update_fields=[
+            'finished_at', 'duration', 'status', 'updated_at'])
+
+    @staticmethod
+    def percentile(values, percent):
+        # nearest rank
+        values = sorted(values)
+        index = int(math.ceil(percent / 100.0 * len(values))) - 1
+        return values[max(index, 0)]
+
+    @classmethod
+    def get_report(cls, engine=None, task_name=None, days=90):
+        """
+        Duration p50/p95 of every successful step by engine and the
+        critical path, the steps that add up to CRITICAL_PATH_SHARE of
+        the median run
+        """
+        executions = cls.objects.filter(
+            direction=cls.DO, status=cls.SUCCESS,
+            started_at__gte=datetime.now() - timedelta(days=days))
+        if engine:
+            executions = executions.filter(engine=engine)
+        if task_name:
+            executions = executions.filter(task__task_name=task_name)
+
+        durations = {}
+        for step_engine, step, duration in executions.values_list(
+            'engine', 'step', 'duration'
+        ).iterator():
+            durations.setdefault(step_engine, {}).setdefault(
+                step, []).append(duration)
+
+        report = []
+        for step_engine, steps in sorted(durations.items()):
+            step_report = sorted([{
+                'step': step,
+                'executions': len(values),
+                'p50': cls.percentile(values, 50),
+                'p95': cls.percentile(values, 95),
+            } for step, values in steps.items()],
+                key=lambda step: step['p50'], reverse=True)
+
+            total = sum(step['p50'] for step in step_report)
+            critical_path, elapsed = [], 0
+            for step in step_report:
+                step['share'] = int(round(100 * step['p50'] / total)) \
+                    if total else 0
+                if elapsed < total * cls.CRITICAL_PATH_SHARE:
+                    elapsed += step['p50']
+                    critical_path.append(step['step'])
+
+            report.append({
+                'engine': step_engine,
+                'total_p50': total,
+                'steps': step_report,
+                'critical_path': critical_path,
+            })
+        return report
+
+
+def get_active_task_ids():
+    """ Ids of the tasks celery workers are running now """
+    from celery.task import control
+    active = control.inspect().active() or {}
+    return set(task['id'] for tasks in active.values() for task in tasks)
+
+
+class WorkflowCheckpoint(BaseModel):
+
+    """
+    State of a workflow run saved after every step it completes, so the
+    run can go on from the first unfinished step on another worker.
+    A resume claims the checkpoint as RESUMING, so a run is resumed once.
+    """
+
+    RUNNING = 'RUNNING'
+    RESUMING = 'RESUMING'
+    SUCCESS = 'SUCCESS'
+    ROLLBACK = 'ROLLBACK'
+    STATUS = (
+        (RUNNING, 'Running'), (RESUMING, 'Resuming'), (SUCCESS, 'Success'),
+        (ROLLBACK, 'Rollback'))
+    UNFINISHED = (RUNNING, RESUMING)
+
+    RESUME_LEASE_DEFAULT = 600
+
+    task = models.ForeignKey(
+        TaskHistory, related_name="checkpoints", null=True, blank=True,
+        on_delete=models.SET_NULL)
+    step_counter = models.PositiveSmallIntegerField(
+        _('Steps completed'), default=0)
+    state = models.TextField(_('State'), blank=True)
+    skipped_keys = models.TextField(_('Keys not saved'), blank=True)
+    status = models.CharField(
+        _('Status'), max_length=10, choices=STATUS, default=RUNNING,
+        db_index=True)
+    on_finish = models.CharField(
+        _('Completion hook'), max_length=200, blank=True,
+        help_text=_('Function the task that started the workflow runs '
+                    'after it, called with workflow_dict and task'))
+
+    def __unicode__(self):
+        return "Checkpoint of {} at step {}".format(
+            self.task_id, self.step_counter)
+
+    @classmethod
+    def last_running_for(cls, task):
+        checkpoints = cls.objects.filter(
+            task=task, status__in=cls.UNFINISHED).order_by('-pk')
+        return checkpoints[0] if checkpoints else None
+
+    @classmethod
+    def start(cls, task, workflow_dict, on_finish=None):
+        checkpoint = cls(task=task, on_finish=on_finish or '')
+        checkpoint.update(workflow_dict)
+        return checkpoint
+
+    def update(self, workflow_dict):
+        self.step_counter = workflow_dict['step_counter']
+        self.state, skipped = dump_workflow_dict(workflow_dict)
+        self.skipped_keys = ','.join(skipped)
+        self.save()
+
+    def finish(self, status):
+        # finished runs are never resumed, their state is not needed
+        self.status = status
+        self.state = ''
+        self.save(update_fields=['status', 'state', 'updated_at'])
+
+    @property
+    def resume_error(self):
+        """ Why the workflow can not be resumed, None when it can """
+        if self.status not in self.UNFINISHED:
+            return "Workflow is not running"
+        if not self.on_finish:
+            return "Task of the workflow can not be finished by a resume"
+        if self.skipped_keys:
+            return "Keys not saved: {}".format(self.skipped_keys)
+
+    def is_running(self):
+        """ Whether a worker may still be running the workflow: it saved
+        this checkpoint less than workflow_resume_lease seconds ago or
+        celery reports a task of it as active """
+        from system.models import Configuration
+
+        lease = Configuration.get_by_name_as_int(
+            'workflow_resume_lease', default=self.RESUME_LEASE_DEFAULT)
+        if self.updated_at > datetime.now() - timedelta(seconds=lease):
+            return True
+
+        if not (self.task and self.task.task_id):
+            return False
+        return bool(
+            set(self.task.task_id.split(';')) & get_active_task_ids())
+
+    def claim(self):
+        """ Atomically marks the checkpoint as RESUMING. Only one of
+        concurrent callers gets it, returns whether this one did """
+        now = datetime.now()
+        claimed = WorkflowCheckpoint.objects.filter(
+            pk=self.pk, status=self.status, updated_at=self.updated_at
+        ).update(status=self.RESUMING, updated_at=now)
+        if claimed:
+            self.status, self.updated_at = self.RESUMING, now
+        return bool(claimed)
+
+    def load(self):
+        return load_workflow_dict(self.state)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from time import time
+from celery.utils.log import get_task_logger
+from system.models import Configuration
+from drivers import format_replication_lags
+from util import run_in_parallel
+
+LOG = get_task_logger(__name__)
+
+ROLLOUT_MAX_PARALLEL_DEFAULT = 1
+ROLLOUT_REPLICATION_TIMEOUT_DEFAULT = 1800
+
+
+class InstanceRollout(object):
+
+    """
+    Runs action(instance) over every database instance of an infra.
+    Secondaries go first, concurrently up to rollout_max_parallel_instances.
+    The primary is only touched after the secondaries caught up: it is
+    switched to secondary, processed and switched back to primary.
+    action must raise an Exception when it fails.
+    """
+
+    def __init__(self, databaseinfra, action, task=None, max_parallel=None):
+        self.databaseinfra = databaseinfra
+        self.driver = databaseinfra.get_driver()
+        self.action = action
+        self.task = task
+        self.is_ha = databaseinfra.plan.is_ha
+
+        if max_parallel is None:
+            max_parallel = Configuration.get_by_name_as_int(
+                'rollout_max_parallel_instances',
+                default=ROLLOUT_MAX_PARALLEL_DEFAULT)
+        self.max_parallel = max_parallel
+        self.replication_timeout = Configuration.get_by_name_as_int(
+            'rollout_replication_timeout',
+            default=ROLLOUT_REPLICATION_TIMEOUT_DEFAULT)
+
+        self.timings = []
+        self.errors = []
+
+    def log(self, msg):
+        LOG.info(msg)
+        if self.task:
+            self.task.update_details(persist=True, details=msg)
+
+    def run_instance(self, instance):
+        """ Runs on the run_in_parallel threads, so it only returns the
+        seconds action took and the error it raised, run_instances logs
+        them from the calling thread """
+        started_at = time()
+        try:
+            self.action(instance)
+            error = None
+        except Exception as e:
+            error = e
+        return int(time() - started_at), error
+
+    def run_instances(self, instances):
+        for instance, result, error in run_in_parallel(
+            self.run_instance, instances, self.max_parallel
+        ):
+            if not error:
+                elapsed, error = result
+                self.timings.append((instance, elapsed))
+                self.log("\nInstance {} finished in {}s".format(
+                    instance, elapsed))
+            if error:
+                self.errors.append((instance, error))
+
+        return not self.errors
+
+    def wait_replication(self, instances):
+        series = self.driver.wait_replication_lag(
+            instances=instances, timeout=self.replication_timeout
+        )
+        self.log("\nReplication lag:\n{}".format(
+            format_replication_lags(series)))
+
+    def switch_master(self, instance):
+        series = self.driver.check_replication_and_switch(instance)
+        self.log("\nReplication lag before switch:\n{}".format(
+            format_replication_lags(series or [])))
+
+    def run(self):
+        primary = self.driver.get_master_instance()
+        secondaries = self.driver.get_slave_instances()
+        self.log("\nRolling out {} secondaries, {} at a time".format(
+            len(secondaries), self.max_parallel))
+
+        if not self.run_instances(secondaries):
+            return False
+
+        if self.is_ha and secondaries:
+            self.wait_replication(secondaries)
+            self.switch_master(secondaries[0])
+            self.log("\nPrimary {} switched to secondary".format(primary))
+
+        if not self.run_instances([primary]):
+            return False
+
+        if self.is_ha and secondaries:
+            self.wait_replication([primary])
+            self.switch_master(primary)
+            self.log("\nPrimary {} restored".format(primary))
+
+        return True
+
+    @property
+    def error(self):
+        return "\n".join(
+            "{}: {}".format(instance, error) for instance, error in self.errors
+        )
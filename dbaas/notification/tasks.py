@@ -10,17 +10,19 @@ from util.providers import clone_infra
 from util.providers import destroy_infra
 from util import get_worker_name
 from util import full_stack
-from django.db.models import Sum, Count
 from physical.models import Plan
 from physical.models import DatabaseInfra
 from physical.models import Instance
 from logical.models import Database
+from logical.models import MB_FACTOR
 from account.models import Team
 from system.models import Configuration
 from simple_audit.models import AuditRequest
 from .models import TaskHistory
+from .rollout import InstanceRollout
 import datetime
-from time import sleep
+from itertools import groupby
+from operator import itemgetter
 
 LOG = get_task_logger(__name__)
 
@@ -39,6 +41,30 @@ def rollback_database(dest_database):
     dest_database.delete()
 
 
+def finish_create_database(result, task_history):
+    if result['created'] is False:
+        if 'exceptions' in result:
+            error = "\n".join(
+                ": ".join(err) for err in result['exceptions']['error_codes']
+            )
+            traceback = "\nException Traceback\n".join(
+                result['exceptions']['traceback']
+            )
+            error = "{}\n{}\n{}".format(error, traceback, error)
+        else:
+            error = "There is not any infra-structure to allocate this database."
+
+        task_history.update_status_for(
+            TaskHistory.STATUS_ERROR, details=error
+        )
+        return
+
+    task_history.update_dbid(db=result['database'])
+    task_history.update_status_for(
+        TaskHistory.STATUS_SUCCESS, details='Database created successfully'
+    )
+
+
 @app.task(bind=True)
 def create_database(
     self, name, plan, environment, team, project, description, contacts,
@@ -66,30 +92,9 @@ def create_database(
             plan=plan, environment=environment, name=name, team=team,
             project=project, description=description,
             subscribe_to_email_events=subscribe_to_email_events, task=task_history,
-            contacts=contacts
-        )
-
-        if result['created'] is False:
-            if 'exceptions' in result:
-                error = "\n".join(
-                    ": ".join(err) for err in result['exceptions']['error_codes']
-                )
-                traceback = "\nException Traceback\n".join(
-                    result['exceptions']['traceback']
-                )
-                error = "{}\n{}\n{}".format(error, traceback, error)
-            else:
-                error = "There is not any infra-structure to allocate this database."
-
-            task_history.update_status_for(
-                TaskHistory.STATUS_ERROR, details=error
-            )
-            return
-
-        task_history.update_dbid(db=result['database'])
-        task_history.update_status_for(
-            TaskHistory.STATUS_SUCCESS, details='Database created successfully'
+            contacts=contacts, on_finish='notification.tasks.finish_create_database'
         )
+        finish_create_database(result, task_history)
 
         return
 
@@ -215,49 +220,70 @@ def databaseinfra_notification(self, user=None):
         LOG.warning("database infra notification is disabled")
         return
 
-    # Sum capacity per databseinfra with parameter plan, environment and engine
-    infras = DatabaseInfra.objects.values(
-        'plan__name', 'environment__name', 'engine__engine_type__name',
-        'plan__provider'
-    ).annotate(capacity=Sum('capacity'))
-    for infra in infras:
-        try:
-            database = infra.databases.get()
-        except Database.MultipleObjectsReturned:
-            pass
-        else:
-            if database.is_in_quarantine:
-                continue
-            if not database.subscribe_to_email_events:
-                continue
+    capacity_summary = DatabaseInfra.get_capacity_summary(force_refresh=True)
+    for group in capacity_summary:
+        if group['provider'] == Plan.CLOUDSTACK:
+            continue
+        if group['percent'] < threshold_infra_notification:
+            continue
+
+        LOG.info('Plan %s in environment %s with %s%% occupied' % (
+            group['plan'], group['environment'], group['percent']))
+        LOG.info("Sending database infra notification...")
+        context = {}
+        context['plan'] = group['plan']
+        context['environment'] = group['environment']
+        context['used'] = group['used']
+        context['capacity'] = group['capacity']
+        context['percent'] = group['percent']
+        email_notifications.databaseinfra_ending(context=context)
+
+    task_history.update_status_for(
+        TaskHistory.STATUS_SUCCESS,
+        details='Databaseinfra Notification successfully sent to dbaas admins!'
+    )
+    return
 
-        used = DatabaseInfra.objects.filter(
-            plan__name=infra['plan__name'], environment__name=infra['environment__name'],
-            engine__engine_type__name=infra['engine__engine_type__name']
-        ).aggregate(used=Count('databases'))
-        # calculate the percentage
-
-        percent = int(used['used'] * 100 / infra['capacity'])
-        if percent >= threshold_infra_notification and infra['plan__provider'] != Plan.CLOUDSTACK:
-            LOG.info('Plan %s in environment %s with %s%% occupied' % (
-                infra['plan__name'], infra['environment__name'], percent))
-            LOG.info("Sending database infra notification...")
-            context = {}
-            context['plan'] = infra['plan__name']
-            context['environment'] = infra['environment__name']
-            context['used'] = used['used']
-            context['capacity'] = infra['capacity']
-            context['percent'] = percent
-            email_notifications.databaseinfra_ending(context=context)
 
-        task_history.update_status_for(
-            TaskHistory.STATUS_SUCCESS,
-            details='Databaseinfra Notification successfully sent to dbaas admins!'
-        )
-    return
+def database_usage_digest(team, databases, threshold, dry_run=False):
+    """
+    Sends one email to team listing every database over the threshold.
+    databases are rows returned by Database.get_usage.
+    """
+    msgs = []
+    for database in databases:
+        msg = "database %s => usage: %.2f | threshold: %.2f" % (
+            database['name'], database['percent_usage'], threshold)
+        LOG.info(msg)
+        msgs.append(msg)
+
+    if not databases:
+        return msgs
+
+    if not team.email:
+        msgs.append(
+            "team %s has no email set and therefore no database usage notification will been sent" % team)
+    elif dry_run:
+        msgs.append(
+            "dry run, database usage notification not sent to team %s" % team)
+    else:
+        LOG.info("Sending database notification...")
+        context = {}
+        context['team'] = team
+        context['measure_unity'] = "MB"
+        context['databases'] = [{
+            'name': database['name'],
+            'environment': database['environment__name'],
+            'used': database['used_size_in_bytes'] * MB_FACTOR,
+            'capacity': round(database['total_size_in_bytes'] * MB_FACTOR, 2),
+            'percent': "%.2f" % database['percent_usage'],
+        } for database in databases]
+        email_notifications.database_usage_digest(context=context)
+
+    return msgs
 
 
-def database_notification_for_team(team=None):
+def database_notification_for_team(team=None, dry_run=False):
     """
     Notifies teams of database usage.
     if threshold_database_notification <= 0, the notification is disabled.
@@ -270,69 +296,56 @@ def database_notification_for_team(team=None):
         LOG.warning("database notification is disabled")
         return
 
-    databases = Database.objects.filter(
-        team=team, is_in_quarantine=False, subscribe_to_email_events=True
+    databases = Database.get_usage(
+        threshold=threshold_database_notification
+    ).filter(team=team)
+    return database_usage_digest(
+        team, list(databases), threshold_database_notification, dry_run
     )
-    msgs = []
-    for database in databases:
-        used = database.used_size_in_mb
-        capacity = database.total_size_in_mb
-        try:
-            percent_usage = (used / capacity) * 100
-        except ZeroDivisionError:
-            # database has no total size
-            percent_usage = 0.0
-        msg = "database %s => usage: %.2f | threshold: %.2f" % (
-            database, percent_usage, threshold_database_notification)
-        LOG.info(msg)
-        msgs.append(msg)
-
-        if not team.email:
-            msgs.append(
-                "team %s has no email set and therefore no database usage notification will been sent" % team)
-        else:
-            if percent_usage >= threshold_database_notification:
-                LOG.info("Sending database notification...")
-                context = {}
-                context['database'] = database.name
-                context['team'] = team
-                context['measure_unity'] = "MB"
-                context['used'] = used
-                context['capacity'] = capacity
-                context['percent'] = "%.2f" % percent_usage
-                context['environment'] = database.environment.name
-                email_notifications.database_usage(context=context)
-
-    return msgs
 
 
 @app.task(bind=True)
 @only_one(key="db_notification_key", timeout=180)
-def database_notification(self):
+def database_notification(self, dry_run=False):
     """
-    Create tasks for database notification by team
+    Notifies teams of database usage, one email per team
     if threshold_database_notification <= 0, the notification is disabled.
+    with dry_run the report is only stored in the task history.
     """
-    # get all teams and for each one create a new task
-    LOG.info("retrieving all teams and sendind database notification")
-    teams = Team.objects.all()
-    msgs = {}
-
-    for team in teams:
-        ###############################################
-        # create task
-        ###############################################
+    LOG.info("retrieving databases over threshold and sending database notification")
+    worker_name = get_worker_name()
+    task_history = TaskHistory.register(
+        request=self.request, user=None, worker_name=worker_name)
 
-        msgs[team] = database_notification_for_team(team=team)
-        ###############################################
+    threshold_database_notification = Configuration.get_by_name_as_int(
+        "threshold_database_notification", default=0)
+    if threshold_database_notification <= 0:
+        LOG.warning("database notification is disabled")
+        task_history.update_status_for(
+            TaskHistory.STATUS_SUCCESS,
+            details="Database notification is disabled")
+        return
 
+    msgs = {}
     try:
+        databases = list(Database.get_usage(
+            threshold=threshold_database_notification
+        ).exclude(team=None))
+        teams = Team.objects.in_bulk(
+            set(database['team'] for database in databases))
+
+        for team_id, team_databases in groupby(
+            databases, key=itemgetter('team')
+        ):
+            team = teams[team_id]
+            msgs[team] = database_usage_digest(
+                team, list(team_databases), threshold_database_notification,
+                dry_run
+            )
+
         LOG.info("Messages: ")
         LOG.info(msgs)
 
-        worker_name = get_worker_name()
-        task_history = TaskHistory.register(
-            request=self.request, user=None, worker_name=worker_name)
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             str(key) + ': ' + ', '.join(value) for key, value in msgs.items()))
     except Exception as e:
@@ -362,12 +375,13 @@ def update_database_status(self):
             else:
                 database.status = Database.DEAD
 
-            database.save(update_fields=['status'])
+            database.save(update_fields=['status', 'updated_at'])
             msg = "\nUpdating status for database: {}, status: {}".format(
                 database, database.status)
             msgs.append(msg)
             LOG.info(msg)
 
+        DatabaseInfra.refresh_summaries()
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
     except Exception as e:
@@ -393,12 +407,13 @@ def update_database_used_size(self):
             else:
                 database.used_size_in_bytes = 0.0
 
-            database.save(update_fields=['used_size_in_bytes'])
+            database.save(update_fields=['used_size_in_bytes', 'updated_at'])
             msg = "\nUpdating used size in bytes for database: {}, used size: {}".format(
                 database, database.used_size_in_bytes)
             msgs.append(msg)
             LOG.info(msg)
 
+        DatabaseInfra.refresh_summaries()
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
     except Exception as e:
@@ -427,13 +442,14 @@ def update_instances_status(self):
                 else:
                     instance.status = Instance.DEAD
 
-                instance.save(update_fields=['status'])
+                instance.save(update_fields=['status', 'updated_at'])
 
                 msg = "\nUpdating instance status, instance: {}, status: {}".format(
                     instance, instance.status)
                 msgs.append(msg)
                 LOG.info(msg)
 
+        DatabaseInfra.refresh_summaries()
         task_history.update_status_for(TaskHistory.STATUS_SUCCESS, details="\n".join(
             value for value in msgs))
     except Exception as e:
@@ -489,15 +505,10 @@ def resize_database(self, database, cloudstackpack, task_history=None, user=None
         cs_provider = CloudStackProvider(credentials=cs_credentials)
 
         databaseinfra = database.databaseinfra
-        driver = databaseinfra.get_driver()
-        instances = driver.get_slave_instances()
-        instances.append(driver.get_master_instance())
-        resized_instances = []
-        result = {'created': False}
 
         disable_zabbix_alarms(database)
 
-        for instance in instances:
+        def resize_instance(instance):
             host = instance.hostname
             host_attr = host.cs_host_attributes.get()
             offering_id = cs_provider.get_vm_offering_id(vm_id=host_attr.vm_id,
@@ -505,15 +516,7 @@ def resize_database(self, database, cloudstackpack, task_history=None, user=None
 
             if offering_id == cloudstackpack.offering.serviceofferingid:
                 LOG.info("Instance offering: {}".format(offering_id))
-                resized_instances.append(instance)
-                continue
-
-            if databaseinfra.plan.is_ha and driver.check_instance_is_master(instance):
-                LOG.info("Waiting 60s to check continue...")
-                sleep(60)
-                driver.check_replication_and_switch(instance)
-                LOG.info("Waiting 60s to check continue...")
-                sleep(60)
+                return
 
             result = resize_database_instance(database=database,
                                               cloudstackpack=cloudstackpack,
@@ -529,18 +532,13 @@ def resize_database(self, database, cloudstackpack, task_history=None, user=None
                 else:
                     error = "Something went wrong."
 
-                break
+                raise Exception(error)
 
-            else:
-                resized_instances.append(instance)
+        rollout = InstanceRollout(databaseinfra=databaseinfra,
+                                  action=resize_instance,
+                                  task=task_history)
 
-        if databaseinfra.plan.is_ha:
-            LOG.info("Waiting 60s to check continue...")
-            sleep(60)
-            instance = driver.get_slave_instances()[0]
-            driver.check_replication_and_switch(instance)
-
-        if len(instances) == len(resized_instances):
+        if rollout.run():
             from dbaas_cloudstack.models import DatabaseInfraOffering
             LOG.info('Updating offering DatabaseInfra.')
 
@@ -563,7 +561,8 @@ def resize_database(self, database, cloudstackpack, task_history=None, user=None
                                            details='Resize successfully done.')
             return
 
-        task_history.update_status_for(TaskHistory.STATUS_ERROR, details=error)
+        task_history.update_status_for(TaskHistory.STATUS_ERROR,
+                                       details=rollout.error)
         return
 
     except Exception as e:
@@ -582,7 +581,6 @@ def volume_migration(self, database, user, task_history=None):
     from util import build_dict
     from util.providers import get_volume_migration_settings
     from workflow.workflow import start_workflow
-    from time import sleep
 
     worker_name = get_worker_name()
     task_history = TaskHistory.register(request=self.request, task_history=task_history,
@@ -636,57 +634,56 @@ def volume_migration(self, database, user, task_history=None):
         LOG.info("Migration finished")
         return
 
-    try:
-        disable_zabbix_alarms(database)
-        for index, instance in enumerate(instances):
-            if not driver.check_instance_is_eligible_for_backup(instance=instance):
-                LOG.info(
-                    'Instance is not eligible for backup {}'.format(str(instance)))
-                continue
+    def migrate_instance(instance):
+        if not driver.check_instance_is_eligible_for_backup(instance=instance):
+            LOG.info(
+                'Instance is not eligible for backup {}'.format(str(instance)))
+            return
 
-            LOG.info('Volume migration for instance {}'.format(str(instance)))
-            host = instance.hostname
-            old_volume = HostAttr.objects.get(host=host, is_active=True)
+        LOG.info('Volume migration for instance {}'.format(str(instance)))
+        host = instance.hostname
+        old_volume = HostAttr.objects.get(host=host, is_active=True)
 
-            same_volume = old_volume.nfsaas_size_id == default_plan_size
-            same_environment = old_volume.nfsaas_environment_id == default_nfsaas_environment
-            if same_volume and same_environment:
-                if databaseinfra.plan.is_ha:
-                    driver.check_replication_and_switch(instance)
-                continue
+        same_volume = old_volume.nfsaas_size_id == default_plan_size
+        same_environment = old_volume.nfsaas_environment_id == default_nfsaas_environment
+        if same_volume and same_environment:
+            return
 
-            workflow_dict = build_dict(
-                databaseinfra=databaseinfra,
-                database=database,
-                environment=environment,
-                plan=plan,
-                host=host,
-                instance=instance,
-                old_volume=old_volume,
-                steps=get_volume_migration_settings(
-                    database.plan.replication_topology.class_path,
-                )
+        workflow_dict = build_dict(
+            databaseinfra=databaseinfra,
+            database=database,
+            environment=environment,
+            plan=plan,
+            host=host,
+            instance=instance,
+            old_volume=old_volume,
+            task_history=task_history,
+            steps=get_volume_migration_settings(
+                database.plan.replication_topology.class_path,
             )
+        )
 
-            start_workflow(workflow_dict=workflow_dict, task=task_history)
-
-            if workflow_dict['exceptions']['traceback']:
-                error = "\n".join(": ".join(err)
-                                  for err in workflow_dict['exceptions']['error_codes'])
-                traceback = "\nException Traceback\n".join(
-                    workflow_dict['exceptions']['traceback'])
-                error = "{}\n{}\n{}".format(error, traceback, error)
-                task_history.update_status_for(
-                    TaskHistory.STATUS_ERROR, details=error)
-                LOG.info("Migration finished with errors")
-                return
+        start_workflow(workflow_dict=workflow_dict, task=task_history)
 
-            if databaseinfra.plan.is_ha:
-                LOG.info("Waiting 60s to check continue...")
-                sleep(60)
-                driver.check_replication_and_switch(instance)
-                LOG.info("Waiting 60s to check continue...")
-                sleep(60)
+        if workflow_dict['exceptions']['traceback']:
+            error = "\n".join(": ".join(err)
+                              for err in workflow_dict['exceptions']['error_codes'])
+            traceback = "\nException Traceback\n".join(
+                workflow_dict['exceptions']['traceback'])
+            error = "{}\n{}\n{}".format(error, traceback, error)
+            raise Exception(error)
+
+    try:
+        disable_zabbix_alarms(database)
+
+        rollout = InstanceRollout(databaseinfra=databaseinfra,
+                                  action=migrate_instance,
+                                  task=task_history)
+        if not rollout.run():
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR, details=rollout.error)
+            LOG.info("Migration finished with errors")
+            return
 
         task_history.update_status_for(
             TaskHistory.STATUS_SUCCESS, details='Volumes sucessfully migrated!')
@@ -894,3 +891,36 @@ def database_disk_resize(self, database, disk_offering, task_history, user):
         task_history.update_status_for(TaskHistory.STATUS_ERROR, details=error)
     finally:
         AuditRequest.cleanup_request()
+
+
+@app.task(bind=True)
+def resume_workflow(self, task_history_id, user=None):
+    from workflow import workflow
+
+    AuditRequest.new_request("resume_workflow", user, "localhost")
+    try:
+        task_history = TaskHistory.register(
+            request=self.request,
+            task_history=TaskHistory.objects.get(pk=task_history_id),
+            user=user, worker_name=get_worker_name())
+
+        try:
+            workflow_dict = workflow.resume_workflow(task_history)
+        except workflow.WorkflowNotResumable as e:
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR,
+                details="Workflow can not be resumed: {}".format(e))
+            return
+        except Exception:
+            traceback = full_stack()
+            LOG.error(traceback)
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR, details=traceback)
+            return
+
+        if workflow_dict is None:
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR,
+                details="There is no unfinished workflow to resume")
+    finally:
+        AuditRequest.cleanup_request()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import mock
+import threading
+from django.test import TestCase
+from notification.rollout import InstanceRollout
+
+
+class InstanceRolloutTestCase(TestCase):
+
+    def setUp(self):
+        self.primary = 'primary'
+        self.secondaries = ['secondary1', 'secondary2']
+        self.driver = mock.Mock()
+        self.driver.get_master_instance.return_value = self.primary
+        self.driver.get_slave_instances.return_value = list(self.secondaries)
+        self.driver.wait_replication_lag.return_value = [(0, {})]
+        self.driver.check_replication_and_switch.return_value = [(0, {})]
+        self.databaseinfra = mock.Mock()
+        self.databaseinfra.get_driver.return_value = self.driver
+        self.databaseinfra.plan.is_ha = True
+        self.processed = []
+
+    def _rollout(self, action=None, max_parallel=2, task=None):
+        return InstanceRollout(
+            databaseinfra=self.databaseinfra,
+            action=action or self.processed.append,
+            task=task,
+            max_parallel=max_parallel
+        )
+
+    def test_secondaries_before_primary(self):
+        rollout = self._rollout()
+        self.assertTrue(rollout.run())
+        self.assertEqual(sorted(self.processed[:2]), self.secondaries)
+        self.assertEqual(self.processed[2], self.primary)
+        self.assertEqual(len(rollout.timings), 3)
+
+    def test_primary_is_switched_and_restored(self):
+        self._rollout().run()
+        self.assertEqual(
+            self.driver.check_replication_and_switch.call_args_list,
+            [mock.call(self.secondaries[0]), mock.call(self.primary)]
+        )
+
+    def test_primary_untouched_when_secondary_fails(self):
+        def action(instance):
+            if instance == 'secondary2':
+                raise Exception('resize failed')
+            self.processed.append(instance)
+
+        rollout = self._rollout(action=action)
+        self.assertFalse(rollout.run())
+        self.assertNotIn(self.primary, self.processed)
+        self.assertFalse(self.driver.check_replication_and_switch.called)
+        self.assertIn('resize failed', rollout.error)
+
+    def test_single_instance_has_no_switch(self):
+        self.databaseinfra.plan.is_ha = False
+        self.driver.get_slave_instances.return_value = []
+        self.assertTrue(self._rollout().run())
+        self.assertEqual(self.processed, [self.primary])
+        self.assertFalse(self.driver.check_replication_and_switch.called)
+
+    def test_task_is_only_updated_from_calling_thread(self):
+        task = mock.Mock()
+        threads = []
+        task.update_details.side_effect = (
+            lambda **kwargs: threads.append(threading.current_thread()))
+
+        rollout = self._rollout(task=task)
+        self.assertTrue(rollout.run())
+        self.assertEqual(
+            set(threads), set([threading.current_thread()]))
+        finished = [
+            call[1]['details'] for call in task.update_details.call_args_list
+            if 'finished in' in call[1]['details']
+        ]
+        self.assertEqual(len(finished), 3)
+
+    def test_failed_instance_timing_is_kept(self):
+        def action(instance):
+            raise Exception('resize failed')
+
+        rollout = self._rollout(action=action)
+        self.assertFalse(rollout.run())
+        self.assertEqual(
+            sorted(instance for instance, _ in rollout.timings),
+            self.secondaries)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from datetime import datetime, timedelta
+from django.test import TestCase
+from ..models import StepExecution
+
+
+class StepExecutionReportTestCase(TestCase):
+
+    def create_execution(self, step, duration, engine='mysql',
+                         status=StepExecution.SUCCESS):
+        return StepExecution.objects.create(
+            step=step, step_index=1, engine=engine, status=status,
+            started_at=datetime.now() - timedelta(seconds=duration),
+            finished_at=datetime.now(), duration=duration)
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(StepExecution.percentile(values, 50), 50)
+        self.assertEqual(StepExecution.percentile(values, 95), 95)
+        self.assertEqual(StepExecution.percentile([7], 95), 7)
+
+    def test_report_by_engine(self):
+        for duration in (10, 20, 30, 40):
+            self.create_execution('CreateVirtualMachine', duration)
+        self.create_execution('CheckReplication', 5)
+        self.create_execution('CheckReplication', 500,
+                              status=StepExecution.ERROR)
+        self.create_execution('CreateVirtualMachine', 1, engine='redis')
+
+        report = StepExecution.get_report(engine='mysql')
+
+        self.assertEqual(len(report), 1)
+        steps = report[0]['steps']
+        self.assertEqual(
+            [(step['step'], step['executions'], step['p50'], step['p95'])
+             for step in steps],
+            [('CreateVirtualMachine', 4, 20, 40),
+             ('CheckReplication', 1, 5, 5)])
+        self.assertEqual(report[0]['total_p50'], 25)
+        self.assertEqual(report[0]['critical_path'], ['CreateVirtualMachine'])
+        self.assertEqual(steps[0]['share'], 80)
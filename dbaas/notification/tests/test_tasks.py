@@ -5,6 +5,7 @@ from django.core import mail
 from account.tests.factory import TeamFactory
 from logical.tests.factory import DatabaseFactory
 from system.models import Configuration
+from logical.models import Database
 from notification.tasks import database_notification_for_team
 
 
@@ -51,3 +52,30 @@ class TasksTestCase(TestCase):
 
         database_notification_for_team(team=self.team)
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_team_receive_one_notification_for_all_databases(self):
+        other_database_big = DatabaseFactory(
+            databaseinfra=self.infra_big, team=self.team)
+        other_database_big.used_size_in_bytes = 8 * 1024 * 1024
+        other_database_big.save()
+        outbox = len(mail.outbox)
+
+        msgs = database_notification_for_team(team=self.team)
+        self.assertEqual(len(mail.outbox), outbox + 1)
+        self.assertEqual(len(msgs), 2)
+
+    def test_dry_run_do_not_send_notification(self):
+        outbox = len(mail.outbox)
+
+        msgs = database_notification_for_team(team=self.team, dry_run=True)
+        self.assertEqual(len(mail.outbox), outbox)
+        self.assertIn("dry run", msgs[-1])
+
+    def test_database_usage_is_computed_by_query(self):
+        usage = Database.get_usage().get(id=self.database_big.id)
+        self.assertEqual(usage['total_size_in_bytes'], 10 * 1024 * 1024)
+        self.assertEqual(usage['percent_usage'], 90)
+
+        databases = Database.get_usage(threshold=70).filter(team=self.team)
+        self.assertEqual(
+            [self.database_big.id], [database['id'] for database in databases])
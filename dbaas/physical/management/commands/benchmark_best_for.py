@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from optparse import make_option
+from random import randint
+from time import time
+from logical.models import Database
+from physical.models import DatabaseInfra, Instance, Host, Plan
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    '''
+        compare the old in-memory best_for against the single query one
+        fake infras are created inside a transaction which is rolled back
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--plan', dest='plan', type='int', default=None),
+        make_option('--infras', dest='infras', type='int', default=2000),
+        make_option('--iterations', dest='iterations', type='int',
+                    default=10),
+    )
+
+    def handle(self, *args, **options):
+        plans = Plan.objects.all()
+        if options['plan']:
+            plans = plans.filter(pk=options['plan'])
+        plan = plans.first()
+        if not plan:
+            raise CommandError("No plan to benchmark")
+        environment = plan.environments.first()
+
+        try:
+            with transaction.atomic():
+                self._populate(plan, environment, options['infras'])
+                self._run(plan, environment, options['iterations'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def _populate(self, plan, environment, quantity):
+        host = Host.objects.create(
+            hostname='benchmark-best-for', address='10.255.255.255')
+        prefix = 'benchmark-best-for-{}'.format(int(time()))
+
+        DatabaseInfra.objects.bulk_create([
+            DatabaseInfra(
+                name='{}-{}'.format(prefix, i), user='admin',
+                password='admin', engine=plan.engine, plan=plan,
+                environment=environment, capacity=randint(1, 20)
+            ) for i in range(quantity)
+        ])
+        infras = list(DatabaseInfra.objects.filter(name__startswith=prefix))
+
+        Instance.objects.bulk_create([
+            Instance(
+                address=host.address, port=i, databaseinfra=infra,
+                hostname=host, dns=host.address
+            ) for i, infra in enumerate(infras, start=1)
+        ])
+
+        databases = []
+        for infra in infras:
+            for i in range(randint(0, infra.capacity)):
+                databases.append(Database(
+                    name='{}-{}'.format(infra.name, i), databaseinfra=infra,
+                    environment=environment
+                ))
+        Database.objects.bulk_create(databases, batch_size=1000)
+
+        self.stdout.write("{} infras and {} databases for {} in {}".format(
+            len(infras), len(databases), plan, environment))
+
+    def _run(self, plan, environment, iterations):
+        for label, best_for in (
+            ('in memory', self._best_for_in_memory),
+            ('single query', DatabaseInfra.best_for),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                started_at = time()
+                for _ in range(iterations):
+                    chosen = best_for(
+                        plan=plan, environment=environment, name='benchmark')
+                elapsed = (time() - started_at) * 1000 / iterations
+
+            self.stdout.write(
+                "{:<14} {:>10.1f} ms/call {:>8} queries/call -> {}".format(
+                    label, elapsed, len(queries) / iterations, chosen))
+
+    def _best_for_in_memory(self, plan, environment, name):
+        datainfras = list(
+            DatabaseInfra.get_active_for(plan=plan, environment=environment))
+        if not datainfras:
+            return None
+        datainfras.sort(key=lambda di: -di.available)
+        best_datainfra = datainfras[0]
+        if best_datainfra.available <= 0:
+            return None
+        return best_datainfra
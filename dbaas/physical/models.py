@@ -6,7 +6,8 @@ from django.db.models.signals import pre_save, post_save, pre_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.core.cache import cache
-from django.db import models, transaction
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
 from django.utils.translation import ugettext_lazy as _
 from django_extensions.db.fields.encrypted import EncryptedCharField
 from util.models import BaseModel
@@ -243,6 +244,9 @@ class DatabaseInfra(BaseModel):
         (DEAD, "Dead"),
         (ALERT, "Alert"))
 
+    CAPACITY_SUMMARY_CACHE_KEY = 'datainfra:capacity_summary'
+    CAPACITY_SUMMARY_CACHE_TIMEOUT = 300
+
     name = models.CharField(verbose_name=_("DatabaseInfra Name"),
                             max_length=100,
                             unique=True,
@@ -345,35 +349,210 @@ class DatabaseInfra(BaseModel):
         """Return active databaseinfras for selected plan and environment"""
         datainfras = DatabaseInfra.objects.filter(
             plan=plan, environment=environment, instances__is_active=True).distinct()
-        LOG.debug('Total of datainfra with filter plan %s and environment %s: %s',
-                  plan, environment, len(datainfras))
+        LOG.debug('Filtering datainfra with plan %s and environment %s',
+                  plan, environment)
         return datainfras
 
+    @classmethod
+    def get_available_for(cls, plan=None, environment=None):
+        """Return active databaseinfras for selected plan and environment
+        which still support more databases, the one with most free slots
+        first. Capacity is computed by the database in a single query."""
+        from logical.models import Database
+
+        qn = connection.ops.quote_name
+        infra_table = qn(cls._meta.db_table)
+        database_table = qn(Database._meta.db_table)
+        used_capacity = (
+            'SELECT COUNT(*) FROM {database} '
+            'WHERE {database}.{infra_id} = {infra}.{pk}'
+        ).format(
+            database=database_table, infra=infra_table,
+            infra_id=qn(Database._meta.get_field('databaseinfra').column),
+            pk=qn(cls._meta.pk.column)
+        )
+        capacity = '{}.{}'.format(
+            infra_table, qn(cls._meta.get_field('capacity').column))
+
+        # capacity is unsigned on MySQL, so only subtract after filtering
+        # out full infras
+        return cls.get_active_for(plan=plan, environment=environment).extra(
+            select={
+                'used_capacity': used_capacity,
+                'free_capacity': '{} - ({})'.format(capacity, used_capacity),
+            },
+            where=['({}) < {}'.format(used_capacity, capacity)],
+            order_by=['-free_capacity', 'id'],
+        )
+
     @classmethod
     def best_for(cls, plan, environment, name):
-        """ Choose the best DatabaseInfra for another database """
-        datainfras = list(
-            DatabaseInfra.get_active_for(plan=plan, environment=environment))
-        if not datainfras:
-            return None
-        datainfras.sort(key=lambda di: -di.available)
-        best_datainfra = datainfras[0]
-        if best_datainfra.available <= 0:
-            return None
-        return best_datainfra
+        """ Choose the best DatabaseInfra for another database.
+        Every databaseinfra of the plan and environment is locked, so when
+        this is called inside a transaction that also creates the database
+        concurrent callers wait for it and never overcommit an infra.
+        """
+        with transaction.atomic():
+            list(cls.objects.select_for_update().filter(
+                plan=plan, environment=environment
+            ).values_list('pk', flat=True))
 
-    def check_instances_status(self):
-        alive_instances = self.instances.filter(status=Instance.ALIVE).count()
-        dead_instances = self.instances.filter(status=Instance.DEAD).count()
+            datainfras = cls.get_available_for(
+                plan=plan, environment=environment)[:1]
+            if not datainfras:
+                return None
+            return datainfras[0]
 
+    @classmethod
+    def get_capacity_summary(cls, force_refresh=False):
+        """ Capacity of every plan, environment and engine.
+        Returns a list of dicts with plan, environment, engine, provider,
+        capacity, used and percent keys, most used first.
+        """
+        summary = None
+        if not force_refresh:
+            summary = cache.get(cls.CAPACITY_SUMMARY_CACHE_KEY)
+        if summary is not None:
+            return summary
+
+        from logical.models import Database
+
+        # capacity and used can not share a query, the join with databases
+        # would sum the capacity of an infra once per database
+        group_by = (
+            'plan__name', 'environment__name', 'engine__engine_type__name',
+            'plan__provider'
+        )
+        capacities = cls.objects.values(*group_by).annotate(
+            capacity=Sum('capacity'))
+        used = Database.objects.values(
+            *['databaseinfra__' + field for field in group_by]
+        ).annotate(used=Count('id'))
+        used = dict(
+            (tuple(row['databaseinfra__' + field] for field in group_by),
+             row['used'])
+            for row in used
+        )
+
+        summary = []
+        for row in capacities:
+            key = tuple(row[field] for field in group_by)
+            plan, environment, engine, provider = key
+            group = {
+                'plan': plan,
+                'environment': environment,
+                'engine': engine,
+                'provider': provider,
+                'capacity': row['capacity'] or 0,
+                'used': used.get(key, 0),
+            }
+            group['percent'] = 0
+            if group['capacity']:
+                group['percent'] = int(
+                    group['used'] * 100 / group['capacity'])
+            summary.append(group)
+        summary.sort(key=lambda group: -group['percent'])
+
+        cache.set(
+            cls.CAPACITY_SUMMARY_CACHE_KEY, summary,
+            cls.CAPACITY_SUMMARY_CACHE_TIMEOUT
+        )
+        return summary
+
+    @classmethod
+    def build_summaries(cls, infra_ids=None):
+        """ Databases, instance health and size of each infra, computed
+        with two queries. Returns a dict of summaries by infra id """
+        infras = cls.objects.all()
+        instances = Instance.objects.all()
+        if infra_ids is not None:
+            infras = infras.filter(pk__in=infra_ids)
+            instances = instances.filter(databaseinfra__in=infra_ids)
+
+        summaries = {}
+        for row in infras.values('pk', 'capacity').annotate(
+            used=Count('databases'),
+            used_size_in_bytes=Sum('databases__used_size_in_bytes')
+        ):
+            summaries[row['pk']] = {
+                'used': row['used'],
+                'capacity': row['capacity'],
+                'used_size_in_bytes': row['used_size_in_bytes'] or 0,
+                'alive_instances': 0,
+                'dead_instances': 0,
+            }
+
+        for row in instances.filter(
+            status__in=[Instance.ALIVE, Instance.DEAD]
+        ).values('databaseinfra', 'status').annotate(total=Count('id')):
+            summary = summaries.get(row['databaseinfra'])
+            if summary is None:
+                continue
+            if row['status'] == Instance.ALIVE:
+                summary['alive_instances'] = row['total']
+            else:
+                summary['dead_instances'] = row['total']
+
+        for summary in summaries.values():
+            summary['status'] = cls.status_for(
+                summary['alive_instances'], summary['dead_instances'])
+        return summaries
+
+    @classmethod
+    def refresh_summaries(cls, infra_ids=None):
+        """ Builds the summaries of the infras, all by default, and stores
+        them in DatabaseInfraSummary, shared by every process """
+        summaries = cls.build_summaries(infra_ids=infra_ids)
+
+        stored = DatabaseInfraSummary.objects.filter(
+            databaseinfra__in=summaries.keys())
+        stored = dict((summary.databaseinfra_id, summary)
+                      for summary in stored)
+        new = []
+        for infra_id, summary in summaries.items():
+            infra_summary = stored.get(infra_id)
+            if infra_summary is None:
+                new.append(DatabaseInfraSummary(
+                    databaseinfra_id=infra_id, **summary))
+            elif infra_summary.as_dict() != summary:
+                for field, value in summary.items():
+                    setattr(infra_summary, field, value)
+                infra_summary.save()
+        DatabaseInfraSummary.objects.bulk_create(new)
+        return summaries
+
+    @classmethod
+    def get_summaries(cls, infras):
+        """ Sets summary on every infra, from the values stored by the
+        last status and size sweeps. Infras not summarized yet are
+        summarized at once """
+        infras = list(infras)
+        summaries = dict(
+            (summary.databaseinfra_id, summary.as_dict())
+            for summary in DatabaseInfraSummary.objects.filter(
+                databaseinfra__in=[infra.pk for infra in infras])
+        )
+
+        missing = [infra.pk for infra in infras if infra.pk not in summaries]
+        if missing:
+            summaries.update(cls.refresh_summaries(infra_ids=missing))
+
+        for infra in infras:
+            infra.summary = summaries.get(infra.pk)
+        return infras
+
+    @classmethod
+    def status_for(cls, alive_instances, dead_instances):
         if dead_instances == 0:
-            status = self.ALIVE
+            return cls.ALIVE
         elif alive_instances == 0:
-            status = self.DEAD
-        else:
-            status = self.ALERT
+            return cls.DEAD
+        return cls.ALERT
 
-        return status
+    def check_instances_status(self):
+        alive_instances = self.instances.filter(status=Instance.ALIVE).count()
+        dead_instances = self.instances.filter(status=Instance.DEAD).count()
+        return self.status_for(alive_instances, dead_instances)
 
     def get_driver(self):
         import drivers
@@ -406,6 +585,31 @@ class DatabaseInfra(BaseModel):
         return info
 
 
+class DatabaseInfraSummary(BaseModel):
+
+    """ Databases, instance health and size of an infra, as computed by
+    DatabaseInfra.build_summaries on the last sweep """
+
+    FIELDS = ('used', 'capacity', 'used_size_in_bytes', 'alive_instances',
+              'dead_instances', 'status')
+
+    databaseinfra = models.OneToOneField(
+        DatabaseInfra, related_name="stored_summary",
+        on_delete=models.CASCADE)
+    used = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+    used_size_in_bytes = models.FloatField(default=0.0)
+    alive_instances = models.PositiveIntegerField(default=0)
+    dead_instances = models.PositiveIntegerField(default=0)
+    status = models.IntegerField(default=DatabaseInfra.DEAD)
+
+    def __unicode__(self):
+        return "Summary of {}".format(self.databaseinfra_id)
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+
 class Host(BaseModel):
     hostname = models.CharField(
         verbose_name=_("Hostname"), max_length=255, unique=True)
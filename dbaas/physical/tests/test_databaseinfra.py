@@ -5,7 +5,7 @@ from django.test import TestCase
 from django.contrib.admin.sites import AdminSite
 from logical.tests import factory as factory_logical
 from ..admin.databaseinfra import DatabaseInfraAdmin
-from ..models import DatabaseInfra, Plan
+from ..models import DatabaseInfra, DatabaseInfraSummary, Instance, Plan
 from . import factory
 from drivers.fake import FakeDriver
 from django.core.cache import cache
@@ -113,6 +113,122 @@ class DatabaseInfraTestCase(TestCase):
         self.assertIsNone(
             DatabaseInfra.best_for(plan=plan, environment=environment, name="test"))
 
+    def test_get_available_for_orders_by_free_capacity(self):
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        datainfra1 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=2)
+        factory.InstanceFactory(databaseinfra=datainfra1)
+        datainfra2 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=5)
+        factory.InstanceFactory(databaseinfra=datainfra2)
+        factory_logical.DatabaseFactory(databaseinfra=datainfra2)
+
+        datainfras = list(DatabaseInfra.get_available_for(
+            plan=plan, environment=environment))
+        self.assertEqual([datainfra2, datainfra1], datainfras)
+        self.assertEqual(4, datainfras[0].free_capacity)
+        self.assertEqual(1, datainfras[0].used_capacity)
+
+    def test_get_available_for_ignores_full_and_inactive_datainfras(self):
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        full = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=1)
+        factory.InstanceFactory(databaseinfra=full)
+        factory_logical.DatabaseFactory(databaseinfra=full)
+        inactive = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=10)
+        factory.InstanceFactory(databaseinfra=inactive, is_active=False)
+
+        self.assertFalse(DatabaseInfra.get_available_for(
+            plan=plan, environment=environment).exists())
+
+    def test_get_capacity_summary_groups_plan_and_environment(self):
+        plan = factory.PlanFactory()
+        environment = plan.environments.all()[0]
+        datainfra1 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=3)
+        datainfra2 = factory.DatabaseInfraFactory(
+            plan=plan, environment=environment, capacity=1)
+        factory_logical.DatabaseFactory(databaseinfra=datainfra1)
+        factory_logical.DatabaseFactory(databaseinfra=datainfra1)
+        factory_logical.DatabaseFactory(databaseinfra=datainfra2)
+
+        summary = [
+            group for group in DatabaseInfra.get_capacity_summary()
+            if group['plan'] == plan.name
+        ]
+        self.assertEqual(1, len(summary))
+        self.assertEqual(4, summary[0]['capacity'])
+        self.assertEqual(3, summary[0]['used'])
+        self.assertEqual(75, summary[0]['percent'])
+
+    def test_get_capacity_summary_use_caching(self):
+        summary = DatabaseInfra.get_capacity_summary()
+        factory.DatabaseInfraFactory()
+        self.assertEqual(summary, DatabaseInfra.get_capacity_summary())
+        self.assertNotEqual(
+            summary, DatabaseInfra.get_capacity_summary(force_refresh=True))
+
+    def test_build_summaries(self):
+        datainfra = factory.DatabaseInfraFactory(capacity=4)
+        factory.InstanceFactory(databaseinfra=datainfra, port=27017)
+        factory.InstanceFactory(
+            databaseinfra=datainfra, port=27018, status=Instance.DEAD)
+        factory_logical.DatabaseFactory(
+            databaseinfra=datainfra, used_size_in_bytes=10.0)
+        factory_logical.DatabaseFactory(
+            databaseinfra=datainfra, used_size_in_bytes=5.0)
+
+        summary = DatabaseInfra.build_summaries()[datainfra.pk]
+        self.assertEqual(2, summary['used'])
+        self.assertEqual(4, summary['capacity'])
+        self.assertEqual(15, summary['used_size_in_bytes'])
+        self.assertEqual(1, summary['alive_instances'])
+        self.assertEqual(1, summary['dead_instances'])
+        self.assertEqual(DatabaseInfra.ALERT, summary['status'])
+
+    def test_get_summaries_are_stored(self):
+        datainfras = [factory.DatabaseInfraFactory() for _ in range(3)]
+        with self.assertNumQueries(5):
+            DatabaseInfra.get_summaries(datainfras)
+        self.assertEqual(3, DatabaseInfraSummary.objects.filter(
+            databaseinfra__in=datainfras).count())
+
+        datainfras = [
+            DatabaseInfra.objects.get(pk=infra.pk) for infra in datainfras
+        ]
+        with self.assertNumQueries(1):
+            datainfras = DatabaseInfra.get_summaries(datainfras)
+        self.assertEqual(0, datainfras[0].summary['used'])
+
+    def test_database_changes_refresh_summary(self):
+        datainfra = factory.DatabaseInfraFactory()
+        DatabaseInfra.get_summaries([datainfra])
+
+        database = factory_logical.DatabaseFactory(databaseinfra=datainfra)
+        datainfra = DatabaseInfra.get_summaries([datainfra])[0]
+        self.assertEqual(1, datainfra.summary['used'])
+
+        database.is_in_quarantine = True
+        database.delete()
+        datainfra = DatabaseInfra.get_summaries([datainfra])[0]
+        self.assertEqual(0, datainfra.summary['used'])
+
+    def test_refresh_summaries_updates_stored(self):
+        datainfra = factory.DatabaseInfraFactory()
+        DatabaseInfra.get_summaries([datainfra])
+
+        factory.InstanceFactory(databaseinfra=datainfra, status=Instance.DEAD)
+        datainfra = DatabaseInfra.get_summaries([datainfra])[0]
+        self.assertEqual(0, datainfra.summary['dead_instances'])
+
+        DatabaseInfra.refresh_summaries()
+        datainfra = DatabaseInfra.get_summaries([datainfra])[0]
+        self.assertEqual(1, datainfra.summary['dead_instances'])
+        self.assertEqual(DatabaseInfra.DEAD, datainfra.summary['status'])
+
     @mock.patch.object(FakeDriver, 'info')
     def test_get_info_use_caching(self, info):
         info.return_value = 'hahaha'
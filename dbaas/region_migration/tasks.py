@@ -15,6 +15,42 @@ from dbaas_cloudstack.models import DatabaseInfraAttr
 LOG = logging.getLogger(__name__)
 
 
+def finish_region_migration(workflow_dict, task_history):
+    database_region_migration_detail = workflow_dict[
+        'database_region_migration_detail']
+    database_region_migration = database_region_migration_detail.database_region_migration
+
+    if workflow_dict['created'] == False:
+
+        if 'exceptions' in workflow_dict:
+            error = "\n".join(
+                ": ".join(err) for err in workflow_dict['exceptions']['error_codes'])
+            traceback = "\nException Traceback\n".join(
+                workflow_dict['exceptions']['traceback'])
+            error = "{}\n{}\n{}".format(error, traceback, error)
+        else:
+            error = "There is not any infra-structure to allocate this database."
+
+        database_region_migration_detail.status = database_region_migration_detail.ROLLBACK
+        database_region_migration_detail.finished_at = datetime.now()
+        database_region_migration_detail.save()
+
+        task_history.update_status_for(
+            TaskHistory.STATUS_ERROR, details=error)
+
+    else:
+        database_region_migration_detail.status = database_region_migration_detail.SUCCESS
+        database_region_migration_detail.finished_at = datetime.now()
+        database_region_migration_detail.save()
+
+        current_step = database_region_migration.current_step
+        database_region_migration.current_step = current_step + 1
+        database_region_migration.save()
+
+        task_history.update_status_for(
+            TaskHistory.STATUS_SUCCESS, details='Database region migration was succesfully')
+
+
 @app.task(bind=True)
 def execute_database_region_migration(self,
                                       database_region_migration_detail_id,
@@ -89,42 +125,14 @@ def execute_database_region_migration(self,
             source_offering=source_offering,
             target_offering=target_offering,
             source_secondary_ips=source_secondary_ips,
+            database_region_migration_detail=database_region_migration_detail,
         )
 
-        start_workflow(workflow_dict=workflow_dict, task=task_history)
-
-        if workflow_dict['created'] == False:
-
-            if 'exceptions' in workflow_dict:
-                error = "\n".join(
-                    ": ".join(err) for err in workflow_dict['exceptions']['error_codes'])
-                traceback = "\nException Traceback\n".join(
-                    workflow_dict['exceptions']['traceback'])
-                error = "{}\n{}\n{}".format(error, traceback, error)
-            else:
-                error = "There is not any infra-structure to allocate this database."
-
-            database_region_migration_detail.status = database_region_migration_detail.ROLLBACK
-            database_region_migration_detail.finished_at = datetime.now()
-            database_region_migration_detail.save()
-
-            task_history.update_status_for(
-                TaskHistory.STATUS_ERROR, details=error)
-
-            return
-
-        else:
-            database_region_migration_detail.status = database_region_migration_detail.SUCCESS
-            database_region_migration_detail.finished_at = datetime.now()
-            database_region_migration_detail.save()
-
-            current_step = database_region_migration.current_step
-            database_region_migration.current_step = current_step + 1
-            database_region_migration.save()
-
-            task_history.update_status_for(
-                TaskHistory.STATUS_SUCCESS, details='Database region migration was succesfully')
-            return
+        start_workflow(
+            workflow_dict=workflow_dict, task=task_history,
+            on_finish='region_migration.tasks.finish_region_migration')
+        finish_region_migration(workflow_dict, task_history)
+        return
 
     except Exception as e:
         traceback = full_stack()
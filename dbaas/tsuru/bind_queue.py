@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import logging
+from collections import OrderedDict
+from django.core.cache import cache
+from dbaas_aclapi import helpers
+from dbaas_aclapi.acl_base_client import get_acl_client
+from dbaas_aclapi.models import DatabaseBind, DatabaseInfraInstanceBind
+from dbaas_aclapi.models import BIND, CREATED, CREATING, DESTROYING, ERROR
+from system.models import Configuration
+
+LOG = logging.getLogger(__name__)
+
+BIND_WINDOW_DEFAULT = 5
+BIND_PENDING_KEY = "tsuru:binds:pending:%d"
+BIND_LOCK_KEY = "tsuru:binds:lock:%d"
+
+
+def queue_bind_update(database, user=None):
+    """
+    Schedules one apply_database_binds of the database after the
+    acl_bind_window, databases already waiting for it are not queued again
+    """
+    from .tasks import apply_database_binds
+
+    window = Configuration.get_by_name_as_int(
+        'acl_bind_window', default=BIND_WINDOW_DEFAULT)
+    if not cache.add(BIND_PENDING_KEY % database.id, True, window * 10):
+        return
+
+    LOG.debug("Queueing binds of database %s", database)
+    apply_database_binds.apply_async(
+        kwargs={'database_id': database.id, 'user': user}, countdown=window)
+
+
+class DatabaseBindQueue(object):
+
+    """
+    Applies the net result of the bind requests of a database.
+    Pending binds still requested are granted with one ACL call per bind
+    network, binds whose grant fails are kept as ERROR with their requests,
+    pending or failed binds released before being applied are just
+    discarded and created binds nobody requests anymore are removed.
+    """
+
+    def __init__(self, database, task=None):
+        self.database = database
+        self.databaseinfra = database.databaseinfra
+        self.task = task
+
+        self.created = []
+        self.discarded = 0
+        self.removed = []
+        self.errors = []
+
+    def log(self, msg):
+        LOG.info(msg)
+        if self.task:
+            self.task.update_details(persist=True, details=msg)
+
+    @property
+    def binds(self):
+        return DatabaseBind.objects.filter(database=self.database)
+
+    def discard_released(self):
+        released = self.binds.filter(
+            bind_status__in=[CREATING, ERROR], binds_requested=0)
+        self.discarded = released.count()
+        released.delete()
+
+    def group_by_vlan(self, binds):
+        """ Groups binds by the acl environment and vlan of
+        helpers.get_bind_env_and_vlan, which splits the bind address at
+        '/', so each group holds the binds of a single network """
+        vlans = OrderedDict()
+        for database_bind in binds:
+            acl_vlan = tuple(helpers.get_bind_env_and_vlan(database_bind))
+            vlans.setdefault(acl_vlan, []).append(database_bind)
+        return vlans
+
+    def save_instance_binds(self, instance_binds, created):
+        """ Instance binds already saved by an earlier grant are kept,
+        the ones saved now are added to created """
+        for instance_bind in instance_binds:
+            saved, is_new = DatabaseInfraInstanceBind.objects.get_or_create(
+                databaseinfra=instance_bind.databaseinfra,
+                instance=instance_bind.instance,
+                instance_port=instance_bind.instance_port,
+                bind_address=instance_bind.bind_address,
+                defaults={'bind_status': CREATED}
+            )
+            if is_new:
+                created.append(saved.pk)
+            elif saved.bind_status != CREATED:
+                saved.bind_status = CREATED
+                saved.save(update_fields=['bind_status', 'updated_at'])
+
+    def grant(self, acl_client, acl_environment, acl_vlan, binds, created):
+        from dbaas_cloudstack.models import DatabaseInfraAttr
+
+        instances = list(self.databaseinfra.instances.all())
+        infra_attr_instances = list(DatabaseInfraAttr.objects.filter(
+            databaseinfra=self.databaseinfra))
+
+        bind_data = {"kind": "object#acl", "rules": []}
+        instance_binds = []
+        for database_bind in binds:
+            _, default_options = helpers.build_data_default_options_dict(
+                helpers.PERMIT, database_bind.bind_address,
+                self.database.name, self.database.environment.name)
+
+            for rule, instance_bind in helpers.build_new_binds(
+                default_options, database_bind, self.databaseinfra,
+                instances, infra_attr_instances
+            ):
+                bind_data['rules'].append(rule)
+                instance_binds.append(instance_bind)
+
+        response = acl_client.grant_acl_for(
+            environment=acl_environment, vlan=acl_vlan, payload=bind_data)
+        if 'jobs' not in response:
+            raise Exception("ACL API did not accept the rules: {}".format(
+                response))
+
+        helpers.save_jobs(response['jobs'], BIND, self.database)
+        self.save_instance_binds(instance_binds, created)
+
+        DatabaseBind.objects.filter(
+            id__in=[database_bind.id for database_bind in binds]
+        ).update(bind_status=CREATED)
+
+    def rollback(self, binds, created):
+        """ Marks binds as ERROR keeping their requests and removes only the
+        instance binds saved by the failed attempt """
+        DatabaseInfraInstanceBind.objects.filter(id__in=created).delete()
+        DatabaseBind.objects.filter(
+            id__in=[database_bind.id for database_bind in binds]
+        ).update(bind_status=ERROR)
+
+    def grant_pending(self, acl_client):
+        pending = self.binds.filter(bind_status=CREATING, binds_requested__gt=0)
+        for (acl_environment, acl_vlan), binds in self.group_by_vlan(
+            pending
+        ).items():
+            created = []
+            try:
+                self.grant(
+                    acl_client, acl_environment, acl_vlan, binds, created)
+            except Exception as e:
+                self.errors.append(("{}/{}".format(acl_environment, acl_vlan), e))
+                self.rollback(binds, created)
+            else:
+                self.created.extend(binds)
+
+    def revoke_released(self, acl_client):
+        # binds requested again meanwhile are not touched
+        self.binds.filter(
+            bind_status=CREATED, binds_requested=0
+        ).update(bind_status=DESTROYING)
+
+        instance_binds = list(DatabaseInfraInstanceBind.objects.filter(
+            databaseinfra=self.databaseinfra))
+        for database_bind in self.binds.filter(bind_status=DESTROYING):
+            try:
+                helpers.unbind_address(
+                    database_bind, acl_client, [
+                        instance_bind for instance_bind in instance_binds
+                        if instance_bind.bind_address == database_bind.bind_address
+                    ]
+                )
+            except Exception as e:
+                self.errors.append((database_bind.bind_address, e))
+            else:
+                self.removed.append(database_bind)
+
+    def run(self):
+        self.discard_released()
+        acl_client = get_acl_client(self.database.environment)
+        self.grant_pending(acl_client)
+        self.revoke_released(acl_client)
+        self.log("\n" + self.summary)
+        return not self.errors
+
+    @property
+    def summary(self):
+        summary = "{}: {} binds created, {} removed, {} discarded".format(
+            self.database, len(self.created), len(self.removed),
+            self.discarded)
+        for bind_address, error in self.errors:
+            summary += "\n{}: {}".format(bind_address, error)
+        return summary
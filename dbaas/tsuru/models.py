@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import hashlib
 import simple_audit
 import logging
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
-from django.dispatch import receiver
+from django.db.models import Count, Max
 from util.models import BaseModel
+from logical.models import Database
 
 LOG = logging.getLogger(__name__)
 
+BIND_CACHE_KEY = "tsuru:bind:%d:%s"
+BIND_CACHE_TIMEOUT = 300
+
 
 class Bind(BaseModel):
 
@@ -24,3 +29,23 @@ class Bind(BaseModel):
         return "%s" % self.service_name
 
 simple_audit.register(Bind)
+
+
+def get_bind_cache_key(database):
+    """ The key carries a version of everything the bind payload is built
+    from: the database, its credentials and extra dns, its databaseinfra and
+    instances. Any change, seen by this process or not, moves to a new key,
+    so a per process cache never serves a stale payload """
+    version = Database.objects.filter(pk=database.pk).aggregate(
+        database=Max('updated_at'),
+        credentials=Max('credentials__updated_at'),
+        credentials_count=Count('credentials', distinct=True),
+        extra_dns=Max('extra_dns__updated_at'),
+        extra_dns_count=Count('extra_dns', distinct=True),
+        databaseinfra=Max('databaseinfra__updated_at'),
+        instances=Max('databaseinfra__instances__updated_at'),
+        instances_count=Count('databaseinfra__instances', distinct=True),
+    )
+    return BIND_CACHE_KEY % (
+        database.pk, hashlib.md5(repr(sorted(version.items()))).hexdigest()
+    )
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from celery.utils.log import get_task_logger
+from django.core.cache import cache
+from dbaas.celery import app
+from util import get_worker_name
+from util.decorators import REDIS_CLIENT
+from logical.models import Database
+from notification.models import TaskHistory
+from simple_audit.models import AuditRequest
+from .bind_queue import DatabaseBindQueue, BIND_PENDING_KEY, BIND_LOCK_KEY
+
+LOG = get_task_logger(__name__)
+
+BIND_LOCK_TIMEOUT = 600
+
+
+@app.task(bind=True)
+def apply_database_binds(self, database_id, user=None):
+    # requests arriving from now on are applied by the next run
+    cache.delete(BIND_PENDING_KEY % database_id)
+
+    AuditRequest.new_request("apply_database_binds", user, "localhost")
+    task_history = TaskHistory.register(
+        request=self.request, user=user, worker_name=get_worker_name())
+
+    lock = REDIS_CLIENT.lock(
+        BIND_LOCK_KEY % database_id, timeout=BIND_LOCK_TIMEOUT)
+    have_lock = False
+    try:
+        database = Database.objects.get(pk=database_id)
+
+        have_lock = lock.acquire(blocking=True)
+        bind_queue = DatabaseBindQueue(database, task=task_history)
+        if bind_queue.run():
+            task_history.update_status_for(
+                TaskHistory.STATUS_SUCCESS, details=bind_queue.summary)
+        else:
+            task_history.update_status_for(
+                TaskHistory.STATUS_ERROR, details=bind_queue.summary)
+    except Exception as e:
+        LOG.error("Binds of database {} not applied: {}".format(
+            database_id, e))
+        task_history.update_status_for(
+            TaskHistory.STATUS_ERROR,
+            details="Binds could not be applied: {}".format(e))
+    finally:
+        if have_lock:
+            lock.release()
+        AuditRequest.cleanup_request()
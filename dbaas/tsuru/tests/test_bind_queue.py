@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from dbaas_aclapi.models import DatabaseBind, DatabaseInfraInstanceBind
+from dbaas_aclapi.models import CREATED, CREATING, ERROR
+from logical.tests import factory as factory_logical
+from physical.tests import factory as factory_physical
+from ..bind_queue import DatabaseBindQueue
+
+
+@mock.patch('tsuru.bind_queue.helpers.save_jobs')
+@mock.patch('tsuru.bind_queue.get_acl_client')
+class DatabaseBindQueueTestCase(TestCase):
+
+    def setUp(self):
+        databaseinfra = factory_physical.DatabaseInfraFactory()
+        factory_physical.InstanceFactory(
+            databaseinfra=databaseinfra, address='10.0.0.1', port=27017)
+        self.database = factory_logical.DatabaseFactory(
+            databaseinfra=databaseinfra)
+
+    def create_bind(self, bind_address, binds_requested, bind_status=CREATING):
+        return DatabaseBind.objects.create(
+            database=self.database, bind_address=bind_address,
+            binds_requested=binds_requested, bind_status=bind_status)
+
+    def test_grants_pending_binds_once_per_network(self, get_acl_client, _):
+        acl_client = get_acl_client.return_value
+        acl_client.grant_acl_for.return_value = {'jobs': [1]}
+        self.create_bind('10.1.0.0/24', 200)
+        self.create_bind('10.2.0.0/24', 1)
+
+        self.assertTrue(DatabaseBindQueue(self.database).run())
+
+        self.assertEqual(get_acl_client.call_count, 1)
+        self.assertEqual(acl_client.grant_acl_for.call_count, 2)
+        self.assertFalse(DatabaseBind.objects.filter(
+            bind_status=CREATING).exists())
+
+    def test_discards_binds_released_before_applied(self, get_acl_client, _):
+        self.create_bind('10.1.0.0/24', 0)
+
+        bind_queue = DatabaseBindQueue(self.database)
+        self.assertTrue(bind_queue.run())
+
+        self.assertEqual(bind_queue.discarded, 1)
+        self.assertFalse(get_acl_client.return_value.grant_acl_for.called)
+        self.assertFalse(DatabaseBind.objects.exists())
+
+    def test_removes_binds_not_requested(self, get_acl_client, _):
+        get_acl_client.return_value.query_acls.return_value = {}
+        self.create_bind('10.1.0.0/24', 0, bind_status=CREATED)
+        self.create_bind('10.2.0.0/24', 1, bind_status=CREATED)
+
+        bind_queue = DatabaseBindQueue(self.database)
+        self.assertTrue(bind_queue.run())
+
+        self.assertEqual(len(bind_queue.removed), 1)
+        self.assertEqual(
+            list(DatabaseBind.objects.values_list('bind_address', flat=True)),
+            ['10.2.0.0/24'])
+
+    def create_instance_bind(self, bind_address):
+        return DatabaseInfraInstanceBind.objects.create(
+            databaseinfra=self.database.databaseinfra, instance='10.0.0.1',
+            instance_port=27017, bind_address=bind_address,
+            bind_status=CREATED)
+
+    def test_failed_grant_keeps_requests(self, get_acl_client, _):
+        get_acl_client.return_value.grant_acl_for.return_value = {}
+        self.create_bind('10.1.0.0/24', 2)
+        instance_bind = self.create_instance_bind('10.1.0.0/24')
+
+        self.assertFalse(DatabaseBindQueue(self.database).run())
+
+        database_bind = DatabaseBind.objects.get()
+        self.assertEqual(ERROR, database_bind.bind_status)
+        self.assertEqual(2, database_bind.binds_requested)
+        self.assertTrue(DatabaseInfraInstanceBind.objects.filter(
+            pk=instance_bind.pk).exists())
+
+    def test_grant_keeps_existing_instance_binds(self, get_acl_client, _):
+        get_acl_client.return_value.grant_acl_for.return_value = {'jobs': [1]}
+        self.create_bind('10.1.0.0/24', 1)
+        instance_bind = self.create_instance_bind('10.1.0.0/24')
+
+        self.assertTrue(DatabaseBindQueue(self.database).run())
+
+        self.assertEqual(CREATED, DatabaseBind.objects.get().bind_status)
+        self.assertEqual(
+            [instance_bind.pk],
+            list(DatabaseInfraInstanceBind.objects.values_list(
+                'pk', flat=True)))
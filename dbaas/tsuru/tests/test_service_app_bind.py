@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+from logical.tests import factory as factory_logical
+from physical.models import DatabaseInfra
+from physical.tests import factory as factory_physical
+from system.models import Configuration
+from ..views import ServiceAppBind
+
+ENDPOINT_DNS = "mongodb://<user>:<password>@fake.dns:27017/{}"
+
+
+@mock.patch('logical.models.Database.get_endpoint_dns')
+class ServiceAppBindTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Configuration(
+            name='dev_envs', value='dev', description='Dev environments'
+        ).save()
+        environment = factory_physical.EnvironmentFactory(name='dev')
+        databaseinfra = factory_physical.DatabaseInfraFactory(
+            environment=environment)
+        self.database = factory_logical.DatabaseFactory(
+            databaseinfra=databaseinfra)
+        self.credential = factory_logical.CredentialFactory(
+            database=self.database)
+        self.user = User.objects.create_superuser(
+            'tsuru', email='tsuru@admin.com', password='123456')
+
+    def bind(self):
+        request = APIRequestFactory().post(
+            '/dev/tsuru/resources/{}/bind-app'.format(self.database.name),
+            {'app-host': 'app.tsuru'}
+        )
+        force_authenticate(request, user=self.user)
+        return ServiceAppBind.as_view()(
+            request, database_name=self.database.name)
+
+    def test_bind_returns_credential_and_endpoint(self, get_endpoint_dns):
+        get_endpoint_dns.return_value = ENDPOINT_DNS.format(self.database.name)
+
+        response = self.bind()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        credential = self.database.credentials.all()[0]
+        self.assertEqual(response.data['DBAAS_MONGODB_USER'], credential.user)
+        self.assertIn(
+            "{}:{}@".format(credential.user, credential.password),
+            response.data['DBAAS_MONGODB_ENDPOINT'])
+
+    def test_bind_again_only_checks_database_status(self, get_endpoint_dns):
+        get_endpoint_dns.return_value = ENDPOINT_DNS.format(self.database.name)
+        self.bind()
+
+        # running tasks, the database itself and the cache version
+        with self.assertNumQueries(3):
+            response = self.bind()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(1, get_endpoint_dns.call_count)
+
+    def test_credential_change_invalidates_bind(self, get_endpoint_dns):
+        get_endpoint_dns.return_value = ENDPOINT_DNS.format(self.database.name)
+        self.bind()
+
+        credential = self.database.credentials.all()[0]
+        credential.password = 'new_password'
+        credential.save()
+
+        response = self.bind()
+        self.assertEqual(
+            response.data['DBAAS_MONGODB_PASSWORD'], 'new_password')
+
+    def test_infra_change_invalidates_bind(self, get_endpoint_dns):
+        get_endpoint_dns.return_value = ENDPOINT_DNS.format(self.database.name)
+        self.bind()
+
+        # saved by another process, no signal reaches this one's cache
+        DatabaseInfra.objects.filter(pk=self.database.databaseinfra_id).update(
+            updated_at=datetime.now() + timedelta(minutes=1))
+
+        self.bind()
+        self.assertEqual(2, get_endpoint_dns.call_count)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+from dbaas_aclapi.models import DatabaseBind, CREATING, DESTROYING, ERROR
+from logical.tests import factory as factory_logical
+from ..bind_queue import DatabaseBindQueue
+from ..views import ServiceUnitBind
+
+UNIT_NETWORK = '10.1.0.0/24'
+
+
+@mock.patch('tsuru.views.queue_bind_update')
+@mock.patch('tsuru.views.check_acl_service_and_get_unit_network',
+            return_value=UNIT_NETWORK)
+class ServiceUnitBindTestCase(TestCase):
+
+    def setUp(self):
+        self.database = factory_logical.DatabaseFactory()
+        self.user = User.objects.create_superuser(
+            'tsuru', email='tsuru@admin.com', password='123456')
+
+        patcher = mock.patch(
+            'tsuru.views.check_database_status', return_value=self.database)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_bind(self, bind_status):
+        return DatabaseBind.objects.create(
+            database=self.database, bind_address=UNIT_NETWORK,
+            binds_requested=0, bind_status=bind_status)
+
+    def bind(self):
+        request = APIRequestFactory().post(
+            '/dev/tsuru/resources/{}/bind'.format(self.database.name),
+            {'unit-host': '10.1.0.1'}
+        )
+        force_authenticate(request, user=self.user)
+        return ServiceUnitBind.as_view()(
+            request, database_name=self.database.name)
+
+    def test_released_bind_requested_again_is_kept(self, _, queue_bind_update):
+        database_bind = self.create_bind(CREATING)
+
+        response = self.bind()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(queue_bind_update.called)
+        database_bind = DatabaseBind.objects.get(pk=database_bind.pk)
+        self.assertEqual(1, database_bind.binds_requested)
+
+        DatabaseBindQueue(self.database).discard_released()
+        self.assertTrue(
+            DatabaseBind.objects.filter(pk=database_bind.pk).exists())
+
+    def test_failed_bind_is_tried_again(self, _, queue_bind_update):
+        database_bind = self.create_bind(ERROR)
+
+        response = self.bind()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(queue_bind_update.called)
+        database_bind = DatabaseBind.objects.get(pk=database_bind.pk)
+        self.assertEqual(CREATING, database_bind.bind_status)
+        self.assertEqual(1, database_bind.binds_requested)
+
+    def test_bind_under_destruction_is_refused(self, _, queue_bind_update):
+        database_bind = self.create_bind(DESTROYING)
+
+        response = self.bind()
+
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(queue_bind_update.called)
+        self.assertEqual(0, DatabaseBind.objects.get(
+            pk=database_bind.pk).binds_requested)
@@ -10,15 +10,15 @@ from physical.models import Plan, Environment
 from account.models import AccountUser, Team
 from notification.models import TaskHistory
 from notification.tasks import create_database
-from dbaas_aclapi.tasks import bind_address_on_database
-from dbaas_aclapi.tasks import unbind_address_on_database
+from tsuru.models import get_bind_cache_key, BIND_CACHE_TIMEOUT
+from tsuru.bind_queue import queue_bind_update
 from dbaas_aclapi.models import DatabaseBind
-from dbaas_aclapi.models import DESTROYING, CREATED, CREATING
+from dbaas_aclapi.models import CREATED, CREATING, ERROR
 from dbaas_credentials.models import CredentialType
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned
 from django.db import transaction
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db.models import F, Q
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
 from rest_framework.views import APIView
@@ -121,55 +121,17 @@ class ServiceAppBind(APIView):
 
         database = response
 
-        if database.databaseinfra.engine.name == 'redis':
-            redis_password = database.databaseinfra.password
-            endpoint = database.get_endpoint_dns().replace(
-                '<password>', redis_password
+        try:
+            env_vars = get_bind_env_vars(database)
+        except IndexError as e:
+            msg = "Database {} in env {} does not have credentials.".format(
+                database_name, env
             )
-
-            env_vars = {
-                "DBAAS_REDIS_PASSWORD": redis_password,
-                "DBAAS_REDIS_ENDPOINT": endpoint
-            }
-
-            if database.plan.is_ha:
-                env_vars = {
-                    "DBAAS_SENTINEL_PASSWORD": redis_password,
-                    "DBAAS_SENTINEL_ENDPOINT": endpoint,
-                    "DBAAS_SENTINEL_ENDPOINT_SIMPLE": database.get_endpoint_dns_simple(),
-                    "DBAAS_SENTINEL_SERVICE_NAME": database.databaseinfra.name
-                }
-
-        else:
-            try:
-                credential = database.credentials.all()[0]
-            except IndexError as e:
-                msg = "Database {} in env {} does not have credentials.".format(
-                    database_name, env
-                )
-                return log_and_response(
-                    msg=msg, e=e,
-                    http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            endpoint = database.get_endpoint_dns().replace(
-                '<user>:<password>', "{}:{}".format(
-                    credential.user, credential.password
-                )
+            return log_and_response(
+                msg=msg, e=e,
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            kind = ''
-            if endpoint.startswith('mysql'):
-                kind = 'MYSQL_'
-            if endpoint.startswith('mongodb'):
-                kind = 'MONGODB_'
-
-            env_vars = {
-                "DBAAS_{}USER".format(kind): credential.user,
-                "DBAAS_{}PASSWORD".format(kind): credential.password,
-                "DBAAS_{}ENDPOINT".format(kind): endpoint
-            }
-
         return Response(env_vars, status.HTTP_201_CREATED)
 
     def delete(self, request, database_name, format=None):
@@ -202,50 +164,37 @@ class ServiceUnitBind(APIView):
         if type(unit_network) == Response:
             return unit_network
 
-        created = False
-        transaction.set_autocommit(False)
-        database_bind = DatabaseBind(
-            database=database, bind_address=unit_network, binds_requested=1
-        )
-
-        try:
-            database_bind.save()
-            created = True
-        except IntegrityError as e:
-            LOG.info("IntegrityError: {}".format(e))
-
-            try:
-                db_bind = DatabaseBind.objects.get(database=database,
-                                                   bind_address=unit_network)
-
-                bind = DatabaseBind.objects.select_for_update().filter(
-                    id=db_bind.id)[0]
-                if bind.bind_status in [CREATED, CREATING]:
-                    bind.binds_requested += 1
-                    bind.save()
-                else:
-                    raise Exception("Binds are beeing destroyed!")
-            except Exception as e:
-                LOG.debug("DatabaseBind is under destruction! {}".format(e))
-                msg = "We are destroying your binds to {}. Please wait.".format(
-                    database_name
-                )
-                return log_and_response(
-                    msg=msg, e=e,
-                    http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-        finally:
-            LOG.debug("Finishing transaction!")
-            transaction.commit()
-            transaction.set_autocommit(True)
+        # the row stays locked until the request is counted, so the bind
+        # queue can not discard it as released in between
+        with transaction.atomic():
+            binds = DatabaseBind.objects.select_for_update()
+            database_bind, _ = binds.get_or_create(
+                database=database, bind_address=unit_network,
+                defaults={'binds_requested': 0}
+            )
 
-        if created:
-            bind_address_on_database.delay(
-                database_bind=database_bind,
-                user=request.user
+            requested = database_bind.bind_status in [
+                CREATED, CREATING, ERROR]
+            if requested:
+                # binds whose grant failed are tried again
+                if database_bind.bind_status == ERROR:
+                    database_bind.bind_status = CREATING
+                DatabaseBind.objects.filter(id=database_bind.id).update(
+                    binds_requested=F('binds_requested') + 1,
+                    bind_status=database_bind.bind_status)
+
+        if not requested:
+            msg = "We are destroying your binds to {}. Please wait.".format(
+                database_name
+            )
+            return log_and_response(
+                msg=msg, e="DatabaseBind is under destruction!",
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        if database_bind.bind_status == CREATING:
+            queue_bind_update(database, user=request.user)
+
         return Response(None, status.HTTP_201_CREATED)
 
     def delete(self, request, database_name, format=None):
@@ -262,52 +211,22 @@ class ServiceUnitBind(APIView):
         if type(unit_network) == Response:
             return unit_network
 
-        transaction.set_autocommit(False)
-
-        try:
-            db_bind = DatabaseBind.objects.get(
-                database=database, bind_address=unit_network
-            )
-
-            database_bind = DatabaseBind.objects.select_for_update().filter(
-                id=db_bind.id
-            )[0]
-
-            if database_bind.bind_status == CREATING:
-                raise Exception(
-                    "Bind for {} has not yet been created!".format(
-                        unit_network
-                    )
-                )
-
-            if database_bind.bind_status != DESTROYING:
-                if database_bind.binds_requested > 0:
-                    database_bind.binds_requested -= 1
-
-                if database_bind.binds_requested == 0:
-                    database_bind.bind_status = DESTROYING
-
-                database_bind.save()
-        except (IndexError, ObjectDoesNotExist) as e:
+        database_binds = DatabaseBind.objects.filter(
+            database=database, bind_address=unit_network
+        )
+        if not database_binds.exists():
             msg = "DatabaseBind does not exist"
             return log_and_response(
-                msg=msg, e=e, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        except Exception as e:
-            msg = "Bind for {} has not yet been created!".format(unit_network)
-            return log_and_response(
-                msg=msg, e=e, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        finally:
-            LOG.debug("Finishing transaction!")
-            transaction.commit()
-            transaction.set_autocommit(True)
-
-        if database_bind.binds_requested == 0:
-            unbind_address_on_database.delay(
-                database_bind=database_bind, user=request.user
+                msg=msg, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        released = database_binds.filter(
+            bind_status__in=[CREATED, CREATING, ERROR], binds_requested__gt=0
+        ).update(binds_requested=F('binds_requested') - 1)
+
+        if released and database_binds.filter(binds_requested=0).exists():
+            queue_bind_update(database, user=request.user)
+
         return Response(status.HTTP_204_NO_CONTENT)
 
 
@@ -486,11 +405,69 @@ def log_and_response(msg, http_status, e="Conditional Error."):
     return Response(msg, http_status)
 
 
+def get_bind_env_vars(database):
+    """ Environment variables tsuru sets on apps bound to database.
+    They are cached until any credential, instance, dns or the infra of
+    the database changes. Raises IndexError when the database has no
+    credentials """
+    cache_key = get_bind_cache_key(database)
+    env_vars = cache.get(cache_key)
+    if env_vars is not None:
+        return env_vars
+
+    if database.databaseinfra.engine.name == 'redis':
+        redis_password = database.databaseinfra.password
+        endpoint = database.get_endpoint_dns().replace(
+            '<password>', redis_password
+        )
+
+        env_vars = {
+            "DBAAS_REDIS_PASSWORD": redis_password,
+            "DBAAS_REDIS_ENDPOINT": endpoint
+        }
+
+        if database.plan.is_ha:
+            env_vars = {
+                "DBAAS_SENTINEL_PASSWORD": redis_password,
+                "DBAAS_SENTINEL_ENDPOINT": endpoint,
+                "DBAAS_SENTINEL_ENDPOINT_SIMPLE": database.get_endpoint_dns_simple(),
+                "DBAAS_SENTINEL_SERVICE_NAME": database.databaseinfra.name
+            }
+
+    else:
+        credential = database.credentials.all()[0]
+
+        endpoint = database.get_endpoint_dns().replace(
+            '<user>:<password>', "{}:{}".format(
+                credential.user, credential.password
+            )
+        )
+
+        kind = ''
+        if endpoint.startswith('mysql'):
+            kind = 'MYSQL_'
+        if endpoint.startswith('mongodb'):
+            kind = 'MONGODB_'
+
+        env_vars = {
+            "DBAAS_{}USER".format(kind): credential.user,
+            "DBAAS_{}PASSWORD".format(kind): credential.password,
+            "DBAAS_{}ENDPOINT".format(kind): endpoint
+        }
+
+    cache.set(cache_key, env_vars, BIND_CACHE_TIMEOUT)
+    return env_vars
+
+
 def check_database_status(database_name, env):
+    # task_status is indexed and only a few tasks are running at a time
     task = TaskHistory.objects.filter(
-        arguments__contains="Database name: {}, Environment: {}".format(
+        task_status=TaskHistory.STATUS_RUNNING,
+        task_name='notification.tasks.create_database',
+        arguments__contains="Database name: {},\nEnvironment: {},".format(
             database_name, env
-        ), task_status="RUNNING")
+        )
+    )
 
     LOG.info("Task {}".format(task))
     if task:
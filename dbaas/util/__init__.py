@@ -14,6 +14,9 @@ import signal
 import os
 import traceback
 import sys
+import hashlib
+import threading
+from collections import OrderedDict
 from billiard import current_process
 from django.utils.module_loading import import_by_path
 
@@ -25,6 +28,11 @@ LOG = logging.getLogger(__name__)
 DEFAULT_OUTPUT_BUFFER_SIZE = 16384
 PROCESS_TIMEOUT = 4 * 60 * 60  # 4 horas
 
+SCRIPT_TEMPLATE_CACHE_SIZE = 128
+SCRIPT_CARRIAGE_RETURN = re.compile(r'[\r]')
+_script_templates = OrderedDict()
+_script_templates_lock = threading.Lock()
+
 
 class AlarmException(Exception):
     pass
@@ -222,24 +230,24 @@ def exec_remote_command(server, username, password, command, output={}):
         return None
 
 
-def check_ssh(server, username, password, retries=30, wait=30, interval=40):
-    username = username
-    password = password
-    ssh = paramiko.SSHClient()
-    ssh.load_system_host_keys()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
+def check_ssh(server, username, password, retries=30, wait=30, interval=40,
+              timeout=None):
+    """ Tries to log in server, timeout is the limit of each connection in
+    seconds and the client is closed after every attempt """
     LOG.info("Waiting %s seconds to check %s ssh connection..." %
              (wait, server))
     sleep(wait)
 
     for attempt in range(retries):
+        ssh = paramiko.SSHClient()
+        ssh.load_system_host_keys()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         try:
 
             LOG.info("Login attempt number %i on %s " % (attempt + 1, server))
 
             ssh.connect(server, port=22, username=username,
-                        password=password, timeout=None, allow_agent=True,
+                        password=password, timeout=timeout, allow_agent=True,
                         look_for_keys=True, compress=False)
             return True
 
@@ -253,8 +261,11 @@ def check_ssh(server, username, password, retries=30, wait=30, interval=40):
                 return False
 
             LOG.warning("We caught an exception: %s ." % (e))
-            LOG.info("Wating %i seconds to try again..." % (interval))
-            sleep(interval)
+        finally:
+            ssh.close()
+
+        LOG.info("Wating %i seconds to try again..." % (interval))
+        sleep(interval)
 
 
 def gen_infra_names(name, qt):
@@ -326,14 +337,123 @@ def retry(ExceptionToCheck, tries=10, delay=3, backoff=2):
     return deco_retry
 
 
+def run_in_parallel(function, items, max_workers=None):
+    """
+    Calls function(item) for every item using at most max_workers threads.
+    Returns a list of (item, result, exception) in the same order of items
+    """
+    from multiprocessing.pool import ThreadPool
+    from django.db import connection
+
+    def call(item):
+        try:
+            return item, function(item), None
+        except Exception as e:
+            LOG.warning("Error running {} for {}: {}".format(
+                function.__name__, item, e))
+            return item, None, e
+
+    def threaded_call(item):
+        try:
+            return call(item)
+        finally:
+            # Each thread opens its own database connection
+            connection.close()
+
+    items = list(items)
+    if not max_workers or max_workers > len(items):
+        max_workers = len(items)
+
+    if max_workers <= 1:
+        return [call(item) for item in items]
+
+    pool = ThreadPool(max_workers)
+    try:
+        return pool.map(threaded_call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def wait_for(check, timeout=600, interval=2, backoff=2, max_interval=30):
+    """
+    Polls check() until it returns a true value or timeout seconds pass,
+    growing the interval between attempts. Errors count as not ready.
+    """
+    import time
+
+    deadline = time.time() + timeout
+    while True:
+        try:
+            result = check()
+        except Exception as e:
+            LOG.info("Check {} not ready: {}".format(check.__name__, e))
+            result = False
+
+        if result:
+            return result
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return result
+
+        sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+def get_script_template(script):
+    """
+    Compiled template of script. The last SCRIPT_TEMPLATE_CACHE_SIZE
+    scripts are kept compiled, by the hash of their content
+    """
+    from django.template import Template
+
+    script = SCRIPT_CARRIAGE_RETURN.sub('', str(script))
+    key = hashlib.sha1(script).hexdigest()
+
+    with _script_templates_lock:
+        template = _script_templates.pop(key, None)
+        if template is not None:
+            _script_templates[key] = template
+            return template
+
+    template = Template(script)
+    with _script_templates_lock:
+        _script_templates[key] = template
+        while len(_script_templates) > SCRIPT_TEMPLATE_CACHE_SIZE:
+            _script_templates.popitem(last=False)
+    return template
+
+
+def get_missing_script_variables(script, variables):
+    """
+    Names script prints ({{ NAME }}) that are not in variables and
+    would be rendered empty. Names only tested in {% if %} are optional
+    flags and are not reported
+    """
+    from django.template.base import VariableNode
+    from django.template.defaulttags import ForNode, WithNode
+
+    nodelist = get_script_template(script).nodelist
+    defined = set(variables) | set(['forloop'])
+    for node in nodelist.get_nodes_by_type(ForNode):
+        defined.update(node.loopvars)
+    for node in nodelist.get_nodes_by_type(WithNode):
+        defined.update(node.extra_context.keys())
+
+    missing = []
+    for node in nodelist.get_nodes_by_type(VariableNode):
+        lookups = getattr(node.filter_expression.var, 'lookups', None)
+        if lookups and lookups[0] not in defined \
+                and lookups[0] not in missing:
+            missing.append(lookups[0])
+    return missing
+
+
 def build_context_script(contextdict, script):
-    from django.template import Context, Template
-    import re
-    regex = re.compile(r'[\r]')
-    script = regex.sub('', str(script))
+    from django.template import Context
     context = Context(contextdict)
-    template = Template(script)
-    return template.render(context)
+    return get_script_template(script).render(context)
 
 
 def get_worker_name():
@@ -357,6 +477,32 @@ def scape_nfsaas_export_path(export_path):
     return str().join([slice + '\/' for slice in splited_path])[:-2]
 
 
+CLASS_CACHE = {}
+INSTANCE_CACHE = {}
+
+
+def get_class(class_path):
+    """
+    import_by_path cached by path, each class is imported once per process
+    """
+    try:
+        return CLASS_CACHE[class_path]
+    except KeyError:
+        CLASS_CACHE[class_path] = import_by_path(class_path)
+        return CLASS_CACHE[class_path]
+
+
+def get_instance(class_path):
+    """
+    Instance of the class shared by the process, only for classes that keep
+    no state, like workflow steps and replication topologies
+    """
+    try:
+        return INSTANCE_CACHE[class_path]
+    except KeyError:
+        INSTANCE_CACHE[class_path] = get_class(class_path)()
+        return INSTANCE_CACHE[class_path]
+
+
 def get_replication_topology_instance(class_path):
-    topology_class = import_by_path(class_path)
-    return topology_class()
+    return get_instance(class_path)
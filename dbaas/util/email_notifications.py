@@ -90,6 +90,21 @@ def database_usage(context={}):
                        fail_silently=False, attachments=None, context=context)
 
 
+def database_usage_digest(context={}):
+    LOG.info("Notifying Databases usage with context %s" % context)
+    subject = _("[DBAAS] Databases are almost full")
+    template = "database_usage_digest"
+    addr_from = Configuration.get_by_name("email_addr_from")
+    team = context.get("team")
+    addr_to = [
+        team.email, Configuration.get_by_name("new_user_notify_email")]
+
+    context['domain'] = get_domain()
+
+    send_mail_template(subject, template, addr_from, addr_to,
+                       fail_silently=False, attachments=None, context=context)
+
+
 def database_analyzing(context={}):
     LOG.info("Notifying Database alayzing with context %s" % context)
     subject = _("[DBAAS] Database overestimated")
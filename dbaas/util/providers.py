@@ -1,5 +1,6 @@
 import logging
 import re
+from django.db import transaction
 from util import build_dict
 from util import slugify
 from util import get_credentials_for
@@ -13,17 +14,42 @@ from workflow.workflow import start_workflow
 LOG = logging.getLogger(__name__)
 
 
+def provision_database(plan, environment, name):
+    """ Reserves a place for the database on the best pre provisioned
+    databaseinfra and then creates it in the engine. Only the reservation
+    holds the infra locks, the engine is called after it is committed and
+    the reservation is discarded if it fails """
+    with transaction.atomic():
+        infra = DatabaseInfra.best_for(
+            plan=plan, environment=environment, name=name
+        )
+        if not infra:
+            return None
+        database = Database.provision(
+            databaseinfra=infra, name=name, create_in_engine=False
+        )
+
+    try:
+        database.create_in_engine()
+    except Exception:
+        LOG.error("Could not create database {} on {}".format(name, infra))
+        database.discard_provision()
+        raise
+
+    return database
+
+
 def make_infra(
     plan, environment, name, team, project, description, contacts,
-    subscribe_to_email_events=True, task=None,
+    subscribe_to_email_events=True, task=None, on_finish=None,
 ):
     if not plan.provider == plan.CLOUDSTACK:
-        dbinfra = DatabaseInfra.best_for(
+        database = provision_database(
             plan=plan, environment=environment, name=name
         )
 
-        if dbinfra:
-            database = Database.provision(databaseinfra=dbinfra, name=name)
+        if database:
+            dbinfra = database.databaseinfra
             database.team = team
             database.description = description
             database.project = project
@@ -46,7 +72,8 @@ def make_infra(
         contacts=contacts,
     )
 
-    start_workflow(workflow_dict=workflow_dict, task=task)
+    start_workflow(
+        workflow_dict=workflow_dict, task=task, on_finish=on_finish)
     return workflow_dict
 
 
@@ -55,11 +82,12 @@ def clone_infra(
         subscribe_to_email_events, contacts, task=None, clone=None
 ):
     if not plan.provider == plan.CLOUDSTACK:
-        infra = DatabaseInfra.best_for(
-            plan=plan, environment=environment, name=name)
+        database = provision_database(
+            plan=plan, environment=environment, name=name
+        )
 
-        if infra:
-            database = Database.provision(databaseinfra=infra, name=name)
+        if database:
+            infra = database.databaseinfra
             database.team = team
             database.description = description
             database.project = project
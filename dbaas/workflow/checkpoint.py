@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from datetime import datetime
+from django.db.models import Model, get_model
+from django.db.models.query import QuerySet
+
+LOG = logging.getLogger(__name__)
+
+MODEL_KEY = '__model__'
+DATETIME_KEY = '__datetime__'
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+class NotCheckpointable(Exception):
+    pass
+
+
+def dump_value(value):
+    if isinstance(value, Model):
+        if value.pk is None:
+            raise NotCheckpointable("{} is not saved".format(value))
+        return {
+            MODEL_KEY: '{}.{}'.format(
+                value._meta.app_label, value._meta.object_name),
+            'pk': value.pk,
+        }
+    if isinstance(value, QuerySet):
+        return [dump_value(item) for item in value]
+    if isinstance(value, (list, tuple)):
+        return [dump_value(item) for item in value]
+    if isinstance(value, dict):
+        return dict((key, dump_value(item)) for key, item in value.items())
+    if isinstance(value, datetime):
+        return {DATETIME_KEY: value.strftime(DATETIME_FORMAT)}
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return value
+    raise NotCheckpointable("{} can not be stored".format(type(value)))
+
+
+def load_value(value):
+    if isinstance(value, list):
+        return [load_value(item) for item in value]
+    if isinstance(value, dict):
+        if MODEL_KEY in value:
+            model = get_model(*value[MODEL_KEY].split('.'))
+            try:
+                return model.objects.get(pk=value['pk'])
+            except model.DoesNotExist:
+                LOG.warning("{} {} does not exist anymore".format(
+                    value[MODEL_KEY], value['pk']))
+                return None
+        if DATETIME_KEY in value:
+            return datetime.strptime(value[DATETIME_KEY], DATETIME_FORMAT)
+        return dict((key, load_value(item)) for key, item in value.items())
+    return value
+
+
+def dump_workflow_dict(workflow_dict):
+    """
+    Serializes the workflow_dict to json, model instances are stored by pk.
+    Keys holding values that can not be stored, like clients, are left
+    out and listed in skipped
+    """
+    state, skipped = {}, []
+    for key, value in workflow_dict.items():
+        try:
+            state[key] = dump_value(value)
+        except NotCheckpointable as e:
+            LOG.debug("Key {} not checkpointed: {}".format(key, e))
+            skipped.append(key)
+    return json.dumps(state), skipped
+
+
+def load_workflow_dict(data):
+    return load_value(json.loads(data))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import logging
+from django.core.exceptions import ImproperlyConfigured
+from util import get_class, get_instance
+from . import settings
+
+LOG = logging.getLogger(__name__)
+
+
+def get_settings_step_paths():
+    paths = set()
+    for name in dir(settings):
+        value = getattr(settings, name)
+        if name.isupper() and isinstance(value, (list, tuple)):
+            paths.update(value)
+    return paths
+
+
+def get_topology_paths():
+    from physical.models import ReplicationTopology
+
+    try:
+        return set(ReplicationTopology.objects.values_list(
+            'class_path', flat=True))
+    except Exception as e:
+        LOG.warning("Replication topologies not loaded: {}".format(e))
+        return set()
+
+
+def get_topology_step_paths(topology):
+    paths = set()
+    for name in dir(topology):
+        if not (name.startswith('get_') and name.endswith('_steps')):
+            continue
+        try:
+            paths.update(getattr(topology, name)())
+        except NotImplementedError:
+            continue
+    return paths
+
+
+def load_registry():
+    """
+    Imports every workflow step of workflow.settings and of the
+    replication topologies in use, raising ImproperlyConfigured with every
+    path that does not load. Called at worker start, the engine and the
+    drivers then get the classes from the util cache.
+    """
+    errors = []
+
+    step_paths = get_settings_step_paths()
+    for topology_path in get_topology_paths():
+        try:
+            step_paths.update(
+                get_topology_step_paths(get_instance(topology_path)))
+        except Exception as e:
+            errors.append("{}: {}".format(topology_path, e))
+
+    for step_path in sorted(step_paths):
+        try:
+            get_class(step_path)
+        except Exception as e:
+            errors.append("{}: {}".format(step_path, e))
+
+    if errors:
+        raise ImproperlyConfigured(
+            "Invalid workflow classes:\n" + "\n".join(errors))
+
+    LOG.info("{} workflow classes loaded".format(len(step_paths)))
+    return step_paths
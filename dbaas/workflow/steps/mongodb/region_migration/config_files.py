@@ -13,6 +13,7 @@ from dbaas_cloudstack.models import HostAttr as CS_HostAttr
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
 from workflow.steps.util import test_bash_script_error
+from workflow.steps.util import run_hosts_script
 from workflow.steps.mongodb.util import build_permission_script
 from workflow.steps.mongodb.util import build_start_database_script
 from workflow.steps.mongodb.util import build_stop_database_script
@@ -160,16 +161,10 @@ class ConfigFiles(BaseStep):
 
             script = build_stop_database_script()
             script = build_context_script({}, script)
-            for target_instance in workflow_dict['target_instances']:
-                target_host = target_instance.hostname
-                target_cs_host_attr = CS_HostAttr.objects.get(host=target_host)
-                output = {}
-                exec_remote_command(server=target_host.address,
-                                    username=target_cs_host_attr.vm_user,
-                                    password=target_cs_host_attr.vm_password,
-                                    command=script,
-                                    output=output)
-                LOG.info(output)
+            run_hosts_script([
+                target_instance.hostname
+                for target_instance in workflow_dict['target_instances']
+            ], script)
 
             try:
                 if 'region_migration_dir_infra_name' in workflow_dict:
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
-from . import run_vm_script
+from ...util import run_vm_script, SLAVES_FIRST
 from ...util.base import BaseStep
 
 LOG = logging.getLogger(__name__)
@@ -20,6 +20,8 @@ class StartDatabase(BaseStep):
             workflow_dict=workflow_dict,
             context_dict=context_dict,
             script=workflow_dict['cloudstackpack'].script,
+            order=SLAVES_FIRST,
+            reverse=True,
             wait=10,
         )
 
@@ -34,7 +36,7 @@ class StartDatabase(BaseStep):
             workflow_dict=workflow_dict,
             context_dict=context_dict,
             script=workflow_dict['original_cloudstackpack'].script,
-            reverse=True,
+            order=SLAVES_FIRST,
         )
 
         return ret_script
@@ -11,12 +11,15 @@ from workflow.steps.mongodb.util import build_change_mongodb_conf_file_script
 from workflow.steps.mongodb.util import build_start_database_script
 from workflow.steps.mongodb.util import build_stop_database_script
 from workflow.steps.mongodb.util import build_clean_data_data_script
-from workflow.steps.mongodb.util import build_wait_admin_be_created_script
 from workflow.steps.util import td_agent_script
+from workflow.steps.mongodb.upgrade.rolling import RollingUpgrade
 
 
 LOG = logging.getLogger(__name__)
 
+# A resync copies the whole data set before the member is secondary again
+RESYNC_LAG_TIMEOUT = 100000
+
 
 class ChangeMongoDBStorageEngine(BaseStep):
 
@@ -26,26 +29,12 @@ class ChangeMongoDBStorageEngine(BaseStep):
     def do(self, workflow_dict):
         try:
 
-            databaseinfra = workflow_dict['databaseinfra']
-            driver = databaseinfra.get_driver()
-
-            secondary_instance = driver.get_slave_instances()[0]
-            LOG.info('Changing Secondary binaries {}...'.format(secondary_instance))
-            self.change_instance_binaries(instance=secondary_instance)
-
-            master_instance = driver.get_master_instance()
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=secondary_instance,
-                                                attempts=10000)
-            new_secondary = master_instance
-
-            LOG.info('Changing old master binaries {}...'.format(new_secondary))
-            self.change_instance_binaries(instance=new_secondary)
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=new_secondary,
-                                                attempts=10000)
+            RollingUpgrade(
+                databaseinfra=workflow_dict['databaseinfra'],
+                upgrade_member=self.change_instance_binaries,
+                include_arbiters=False,
+                lag_timeout=RESYNC_LAG_TIMEOUT
+            ).run()
 
             return True
 
@@ -67,7 +56,6 @@ class ChangeMongoDBStorageEngine(BaseStep):
         script += build_stop_database_script(clean_data=False)
         script += build_clean_data_data_script()
         script += build_start_database_script()
-        script += build_wait_admin_be_created_script()
         script += td_agent_script(option='restart')
 
         context_dict = {
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import logging
+from drivers import format_replication_lags
+from system.models import Configuration
+from util import run_in_parallel, wait_for
+
+LOG = logging.getLogger(__name__)
+
+ROLLING_UPGRADE_LAG_TIMEOUT_DEFAULT = 1000
+HEALTHY_MEMBER_STATES = ('SECONDARY', 'ARBITER')
+
+
+class RollingUpgrade(object):
+
+    """
+    Upgrades every member of a mongodb replica set with at most one
+    election.
+    Secondaries (and the arbiter, when include_arbiters) are upgraded
+    concurrently, as many at a time as the replica set can lose while
+    keeping mongodb_upgrade_min_healthy_members voting members up, never
+    less than a majority. Each batch is done once its members are back
+    healthy on the replica set, secondary or arbiter, and within the
+    replication lag of the driver. Then the primary steps down,
+    is upgraded as a secondary and takes its role back.
+    """
+
+    def __init__(self, databaseinfra, upgrade_member, upgrade_primary=None,
+                 include_arbiters=True, lag_timeout=None):
+        self.databaseinfra = databaseinfra
+        self.driver = databaseinfra.get_driver()
+        self.upgrade_member = upgrade_member
+        self.upgrade_primary = upgrade_primary or upgrade_member
+        self.include_arbiters = include_arbiters
+
+        if lag_timeout is None:
+            lag_timeout = Configuration.get_by_name_as_int(
+                'mongodb_upgrade_lag_timeout',
+                default=ROLLING_UPGRADE_LAG_TIMEOUT_DEFAULT)
+        self.lag_timeout = lag_timeout
+        self.min_healthy_members = Configuration.get_by_name_as_int(
+            'mongodb_upgrade_min_healthy_members', default=0)
+
+    @property
+    def voting_members(self):
+        return len(self.driver.get_database_instances()) + len(
+            self.driver.get_non_database_instances())
+
+    @property
+    def max_parallel(self):
+        voting_members = self.voting_members
+        min_healthy = max(
+            self.min_healthy_members, voting_members / 2 + 1)
+        return max(voting_members - min_healthy, 1)
+
+    def wait_replication(self, instances):
+        series = self.driver.wait_replication_lag(
+            instances=instances, timeout=self.lag_timeout)
+        LOG.info(format_replication_lags(series))
+
+    def get_unhealthy_members(self, instances):
+        with self.driver.replication_lag_client() as client:
+            states = self.driver.get_members_state(client, instances)
+
+        return [
+            instance for instance, (health, state) in states.items()
+            if health != 1 or state not in HEALTHY_MEMBER_STATES
+        ]
+
+    def wait_healthy(self, instances):
+        unhealthy = []
+
+        def members_are_healthy():
+            unhealthy[:] = self.get_unhealthy_members(instances)
+            return not unhealthy
+
+        if not wait_for(members_are_healthy, timeout=self.lag_timeout,
+                        interval=1, max_interval=10):
+            raise Exception("{} not healthy after {}s".format(
+                ', '.join(str(instance) for instance in unhealthy)
+                or 'Replica set', self.lag_timeout))
+
+    def upgrade_batch(self, instances, upgrade):
+        LOG.info('Upgrading {}...'.format(
+            ', '.join(str(instance) for instance in instances)))
+
+        errors = [
+            "{}: {}".format(instance, error)
+            for instance, _, error in run_in_parallel(
+                upgrade, instances, len(instances))
+            if error
+        ]
+        if errors:
+            raise Exception("\n".join(errors))
+
+        self.wait_healthy(instances)
+        self.wait_replication(instances)
+
+    def run(self):
+        master = self.driver.get_master_instance()
+        secondaries = self.driver.get_slave_instances()
+        members = list(secondaries)
+        if self.include_arbiters:
+            members = self.driver.get_non_database_instances() + members
+
+        self.wait_healthy(members)
+        self.wait_replication(secondaries)
+
+        max_parallel = self.max_parallel
+        for i in range(0, len(members), max_parallel):
+            self.upgrade_batch(members[i:i + max_parallel],
+                               self.upgrade_member)
+
+        LOG.info('Switching Databases')
+        self.driver.check_replication_and_switch(
+            instance=secondaries[0], attempts=self.lag_timeout / 10)
+
+        self.upgrade_batch([master], self.upgrade_primary)
+
+        LOG.info('Switching Databases')
+        self.driver.check_replication_and_switch(
+            instance=master, attempts=self.lag_timeout / 10)
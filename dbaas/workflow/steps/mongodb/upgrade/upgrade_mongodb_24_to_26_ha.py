@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
+from functools import partial
 from util import full_stack
 from util import exec_remote_command
 from util import build_context_script
@@ -13,6 +14,7 @@ from workflow.steps.mongodb.util import build_start_database_script
 from workflow.steps.mongodb.util import build_change_release_alias_script
 from workflow.steps.mongodb.util import build_authschemaupgrade_script
 from workflow.steps.mongodb.util import build_mongodb_connect_string
+from workflow.steps.mongodb.upgrade.rolling import RollingUpgrade
 
 
 LOG = logging.getLogger(__name__)
@@ -28,36 +30,17 @@ class UpgradeMongoDB_24_to_26(BaseStep):
 
             databaseinfra = workflow_dict['databaseinfra']
             instances = workflow_dict['instances']
-            driver = databaseinfra.get_driver()
 
             connect_string = build_mongodb_connect_string(instances=instances,
                                                           databaseinfra=databaseinfra)
 
-            arbiter_instance = driver.get_non_database_instances()[0]
-            LOG.info('Changing Arbiter binaries {}...'.format(arbiter_instance))
-            self.change_instance_binaries(instance=arbiter_instance,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=False)
-
-            secondary_instance = driver.get_slave_instances()[0]
-            LOG.info('Changing Secondary binaries {}...'.format(secondary_instance))
-            self.change_instance_binaries(instance=secondary_instance,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=False)
-
-            master_instance = driver.get_master_instance()
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=secondary_instance)
-            new_secondary = master_instance
-
-            LOG.info('Changing old master binaries {}...'.format(new_secondary))
-            self.change_instance_binaries(instance=new_secondary,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=True)
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=new_secondary)
+            upgrade = partial(self.change_instance_binaries,
+                              connect_string=connect_string)
+            RollingUpgrade(
+                databaseinfra=databaseinfra,
+                upgrade_member=partial(upgrade, run_authschemaupgrade=False),
+                upgrade_primary=partial(upgrade, run_authschemaupgrade=True)
+            ).run()
 
             return True
 
@@ -87,7 +70,7 @@ class UpgradeMongoDB_24_to_26(BaseStep):
         script += build_cp_mongodb_binary_file()
         script += build_stop_database_script(clean_data=False)
         script += build_change_release_alias_script()
-        script += build_start_database_script(wait_time=30)
+        script += build_start_database_script()
         if run_authschemaupgrade:
             script += build_authschemaupgrade_script()
 
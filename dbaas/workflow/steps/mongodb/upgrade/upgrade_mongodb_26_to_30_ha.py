@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
+from functools import partial
 from util import full_stack
 from util import exec_remote_command
 from util import build_context_script
@@ -8,6 +9,7 @@ from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0023
 from workflow.steps.util import test_bash_script_error
 from workflow.steps.mongodb import util
+from workflow.steps.mongodb.upgrade.rolling import RollingUpgrade
 
 LOG = logging.getLogger(__name__)
 
@@ -22,36 +24,17 @@ class UpgradeMongoDB_26_to_30(BaseStep):
 
             databaseinfra = workflow_dict['databaseinfra']
             instances = workflow_dict['instances']
-            driver = databaseinfra.get_driver()
 
             connect_string = util.build_mongodb_connect_string(instances=instances,
                                                                databaseinfra=databaseinfra)
 
-            arbiter_instance = driver.get_non_database_instances()[0]
-            LOG.info('Changing Arbiter binaries {}...'.format(arbiter_instance))
-            self.change_instance_binaries(instance=arbiter_instance,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=False)
-
-            secondary_instance = driver.get_slave_instances()[0]
-            LOG.info('Changing Secondary binaries {}...'.format(secondary_instance))
-            self.change_instance_binaries(instance=secondary_instance,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=False)
-
-            master_instance = driver.get_master_instance()
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=secondary_instance)
-            new_secondary = master_instance
-
-            LOG.info('Changing old master binaries {}...'.format(new_secondary))
-            self.change_instance_binaries(instance=new_secondary,
-                                          connect_string=connect_string,
-                                          run_authschemaupgrade=True)
-
-            LOG.info('Switching Databases')
-            driver.check_replication_and_switch(instance=new_secondary)
+            upgrade = partial(self.change_instance_binaries,
+                              connect_string=connect_string)
+            RollingUpgrade(
+                databaseinfra=databaseinfra,
+                upgrade_member=partial(upgrade, run_authschemaupgrade=False),
+                upgrade_primary=partial(upgrade, run_authschemaupgrade=True)
+            ).run()
 
             return True
 
@@ -81,7 +64,7 @@ class UpgradeMongoDB_26_to_30(BaseStep):
         script += util.build_cp_mongodb_binary_file()
         script += util.build_stop_database_script(clean_data=False)
         script += util.build_change_release_alias_script()
-        script += util.build_start_database_script(wait_time=30)
+        script += util.build_start_database_script()
         script += util.build_change_limits_script()
         script += util.build_remove_reprecated_index_counter_metrics()
 
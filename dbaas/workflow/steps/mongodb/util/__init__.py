@@ -262,19 +262,6 @@ def build_enable_authentication_single_instance_script():
     """
 
 
-def build_wait_admin_be_created_script():
-    return """
-        while true
-        do
-           if [ -d "/data/data/admin" ]; then
-              break
-           fi
-           sleep 10
-        done
-        sleep 60
-    """
-
-
 def build_restart_database_script():
     return """
         echo ""; echo $(date "+%Y-%m-%d %T") "- Starting the database"
@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
-from dbaas_cloudstack.models import HostAttr as CsHostAttr
-from util import exec_remote_command
 from util import full_stack
 from time import sleep
+from workflow.steps.util import run_hosts_script
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0013
 
@@ -19,41 +18,39 @@ class CheckPuppetIsRunning(BaseStep):
         try:
 
             script = "ps -ef | grep bootstrap-puppet3-loop.sh | grep -v grep | wc -l"
-            for host in workflow_dict['hosts']:
-
-                LOG.info("Getting vm credentials...")
-                host_csattr = CsHostAttr.objects.get(host=host)
-
-                attempt = 1
-                retries = 60
-                interval = 20
-                sleep(interval)
-                while True:
-                    LOG.info("Check if puppet-setup is runnig on {} - attempt {} of {}"
-                             .format(host, attempt, retries))
-                    output = {}
-                    return_code = exec_remote_command(server=host.address,
-                                                      username=host_csattr.vm_user,
-                                                      password=host_csattr.vm_password,
-                                                      command=script,
-                                                      output=output)
+            hosts = list(workflow_dict['hosts'])
+
+            attempt = 1
+            retries = 60
+            interval = 20
+            sleep(interval)
+            while True:
+                LOG.info("Check if puppet-setup is runnig on {} - attempt {} of {}"
+                         .format(", ".join(map(str, hosts)), attempt, retries))
+
+                running = []
+                for host, return_code, output in run_hosts_script(hosts, script):
                     if return_code != 0:
-                        raise Exception(str(output))
+                        raise Exception("{}: {}".format(host, output))
 
-                    ret_value = int(output['stdout'][0])
-                    if ret_value == 0:
+                    if int(output['stdout'][0]) == 0:
                         LOG.info("Puppet-setup is not runnig on {}".format(host))
-                        break
+                    else:
+                        LOG.info("Puppet-setup is runnig on {}".format(host))
+                        running.append(host)
 
-                    LOG.info("Puppet-setup is runnig on {}".format(host))
+                hosts = running
+                if not hosts:
+                    break
 
-                    attempt += 1
-                    if attempt == retries:
-                        error = "Maximum number of attempts check is puppet is running on {}.".format(host)
-                        LOG.error(error)
-                        raise Exception(error)
+                attempt += 1
+                if attempt == retries:
+                    error = "Maximum number of attempts check is puppet is running on {}.".format(
+                        ", ".join(map(str, hosts)))
+                    LOG.error(error)
+                    raise Exception(error)
 
-                    sleep(interval)
+                sleep(interval)
 
             return True
         except Exception:
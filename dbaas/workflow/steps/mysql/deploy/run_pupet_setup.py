@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
-from dbaas_cloudstack.models import HostAttr as CsHostAttr
-from util import exec_remote_command
 from util import full_stack
+from workflow.steps.util import run_hosts_script
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0013
 
@@ -17,21 +16,9 @@ class RunPuppetSetup(BaseStep):
     def do(self, workflow_dict):
         try:
 
-            script = "puppet-setup"
-            for host in workflow_dict['hosts']:
-
-                LOG.info("Getting vm credentials...")
-                host_csattr = CsHostAttr.objects.get(host=host)
-
-                LOG.info("Run puppet-setup on host {}".format(host))
-                output = {}
-                return_code = exec_remote_command(server=host.address,
-                                                  username=host_csattr.vm_user,
-                                                  password=host_csattr.vm_password,
-                                                  command=script,
-                                                  output=output)
-                #if return_code != 0:
-                #    raise Exception(str(output))
+            # the exit code of puppet-setup is not checked, CheckPuppetIsRunning
+            # waits for it to finish on every host
+            run_hosts_script(workflow_dict['hosts'], "puppet-setup")
 
             return True
         except Exception:
@@ -3,8 +3,7 @@ import logging
 from util import full_stack
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
-from workflow.steps.mysql.util import get_replication_info
-from workflow.steps.mysql.util import change_master_to
+from workflow.steps.mysql.util.replication import ReplicationCoordinator
 
 LOG = logging.getLogger(__name__)
 
@@ -24,19 +23,20 @@ class ChangeMaster(BaseStep):
 
             source_instance_zero = workflow_dict['source_instances'][0]
 
-            master_log_file, master_log_pos = get_replication_info(
-                target_instance_one)
-            change_master_to(instance=target_instance_zero,
-                             master_host=target_instance_one.address,
-                             bin_log_file=master_log_file,
-                             bin_log_position=master_log_pos)
-
-            master_log_file, master_log_pos = get_replication_info(
-                target_instance_zero)
-            change_master_to(instance=source_instance_zero,
-                             master_host=target_instance_zero.address,
-                             bin_log_file=master_log_file,
-                             bin_log_position=master_log_pos)
+            with ReplicationCoordinator() as replication:
+                master_log_file, master_log_pos = replication.get_master_status(
+                    target_instance_one)
+                replication.change_master_to(
+                    instance=target_instance_zero, master_host=target_instance_one.address,
+                    bin_log_file=master_log_file,
+                    bin_log_position=master_log_pos)
+
+                master_log_file, master_log_pos = replication.get_master_status(
+                    target_instance_zero)
+                replication.change_master_to(
+                    instance=source_instance_zero, master_host=target_instance_zero.address,
+                    bin_log_file=master_log_file,
+                    bin_log_position=master_log_pos)
 
             return True
         except Exception:
@@ -58,19 +58,20 @@ class ChangeMaster(BaseStep):
             source_instance_zero = workflow_dict['source_instances'][0]
             source_instance_one = workflow_dict['source_instances'][1]
 
-            master_log_file, master_log_pos = get_replication_info(
-                source_instance_one)
-            change_master_to(instance=source_instance_zero,
-                             master_host=source_instance_one.address,
-                             bin_log_file=master_log_file,
-                             bin_log_position=master_log_pos)
-
-            master_log_file, master_log_pos = get_replication_info(
-                source_instance_zero)
-            change_master_to(instance=target_instance_zero,
-                             master_host=source_instance_zero.address,
-                             bin_log_file=master_log_file,
-                             bin_log_position=master_log_pos)
+            with ReplicationCoordinator() as replication:
+                master_log_file, master_log_pos = replication.get_master_status(
+                    source_instance_one)
+                replication.change_master_to(
+                    instance=source_instance_zero, master_host=source_instance_one.address,
+                    bin_log_file=master_log_file,
+                    bin_log_position=master_log_pos)
+
+                master_log_file, master_log_pos = replication.get_master_status(
+                    source_instance_zero)
+                replication.change_master_to(
+                    instance=target_instance_zero, master_host=source_instance_zero.address,
+                    bin_log_file=master_log_file,
+                    bin_log_position=master_log_pos)
             return True
         except Exception:
             traceback = full_stack()
@@ -3,7 +3,7 @@ import logging
 from util import full_stack
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
-from workflow.steps.mysql.util import check_seconds_behind
+from workflow.steps.mysql.util.replication import ReplicationCoordinator
 
 LOG = logging.getLogger(__name__)
 
@@ -16,15 +16,16 @@ class CheckReplication(BaseStep):
     def do(self, workflow_dict):
         try:
 
-            msg = "Replication check maximum attempts for instance {}"
-            for source_instance in workflow_dict['source_instances']:
+            msg = "Replication of instance {} did not catch up"
+            with ReplicationCoordinator() as replication:
+                for source_instance in workflow_dict['source_instances']:
 
-                if not check_seconds_behind(source_instance):
-                    raise Exception(msg.format(source_instance))
+                    if not replication.wait_caught_up(source_instance):
+                        raise Exception(msg.format(source_instance))
 
-                target_instance = source_instance.future_instance
-                if not check_seconds_behind(target_instance):
-                    raise Exception(msg.format(target_instance))
+                    target_instance = source_instance.future_instance
+                    if not replication.wait_caught_up(target_instance):
+                        raise Exception(msg.format(target_instance))
 
             return True
         except Exception:
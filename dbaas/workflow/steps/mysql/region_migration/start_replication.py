@@ -3,8 +3,7 @@ import logging
 from util import full_stack
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
-from workflow.steps.mysql.util import get_replication_info
-from workflow.steps.mysql.util import change_master_to
+from workflow.steps.mysql.util.replication import ReplicationCoordinator
 
 LOG = logging.getLogger(__name__)
 
@@ -23,18 +22,21 @@ class StartReplication(BaseStep):
             slave_target_instance = workflow_dict[
                 'source_instances'][1].future_instance
 
-            master_log_file, master_log_pos = get_replication_info(
-                master_target_instance)
-
-            change_master_to(instance=master_target_instance,
-                             master_host=master_source_instance.address,
-                             bin_log_file=workflow_dict['binlog_file'],
-                             bin_log_position=workflow_dict['binlog_pos'])
-
-            change_master_to(instance=slave_target_instance,
-                             master_host=master_target_instance.address,
-                             bin_log_file=master_log_file,
-                             bin_log_position=master_log_pos)
+            with ReplicationCoordinator() as replication:
+                master_log_file, master_log_pos = replication.get_master_status(
+                    master_target_instance)
+
+                replication.change_master_to(
+                    instance=master_target_instance,
+                    master_host=master_source_instance.address,
+                    bin_log_file=workflow_dict['binlog_file'],
+                    bin_log_position=workflow_dict['binlog_pos'])
+
+                replication.change_master_to(
+                    instance=slave_target_instance,
+                    master_host=master_target_instance.address,
+                    bin_log_file=master_log_file,
+                    bin_log_position=master_log_pos)
 
             return True
         except Exception:
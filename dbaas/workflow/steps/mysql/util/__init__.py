@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
-from time import sleep
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from util import exec_remote_command
+from .replication import ReplicationCoordinator
 
 LOG = logging.getLogger(__name__)
 
@@ -81,48 +81,19 @@ def get_client_for_infra(databaseinfra):
 
 
 def get_replication_info(instance):
-    client = get_client(instance)
+    with ReplicationCoordinator() as replication:
+        return replication.get_master_status(instance)
 
-    client.query('show master status')
-    r = client.store_result()
-    row = r.fetch_row(maxrows=0, how=1)
-    return row[0]['File'], row[0]['Position']
 
-
-def check_seconds_behind(instance, retries=50):
-    client = get_client(instance)
-
-    for attempt in range(retries):
-        LOG.info("Checking replication %i on %s " % (attempt + 1, instance))
-
-        client.query("show slave status")
-        r = client.store_result()
-        row = r.fetch_row(maxrows=0, how=1)
-        seconds_behind = row[0]['Seconds_Behind_Master']
-
-        if seconds_behind is None:
-            raise Exception("Replication is not running")
-
-        if seconds_behind == '0':
-            return True
-
-        if attempt == retries - 1:
-            LOG.warning("Seconds behind: {}".format(seconds_behind))
-            return False
-
-        sleep(10)
+def check_seconds_behind(instance):
+    with ReplicationCoordinator() as replication:
+        return replication.wait_caught_up(instance)
 
 
 def change_master_to(instance, master_host, bin_log_file, bin_log_position):
-    client = get_client(instance)
-    client.query('stop slave')
-
-    sql_command = "change master to master_host='{}', master_log_file='{}', master_log_pos={}"
-    sql_command = sql_command.format(
-        master_host, bin_log_file, bin_log_position)
-    client.query(sql_command)
-
-    client.query('start slave')
+    with ReplicationCoordinator() as replication:
+        replication.change_master_to(
+            instance, master_host, bin_log_file, bin_log_position)
 
 
 def build_flipper_script():
@@ -207,5 +178,5 @@ def split_var_and_value(info):
 
 
 def start_slave(instance):
-    client = get_client(instance)
-    client.query("start slave")
+    with ReplicationCoordinator() as replication:
+        replication.start_slave(instance)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import logging
+from django.db.models import Q
+from system.models import Configuration
+from util import wait_for
+
+LOG = logging.getLogger(__name__)
+
+REPLICATION_TIMEOUT_DEFAULT = 500
+
+
+class ReplicationCoordinator(object):
+
+    """
+    Runs the replication commands of a set of mysql instances over one
+    connection per instance.
+    A replica is caught up when the position it executed reaches the
+    binlog position its master had when the check started. The wait is
+    done by MASTER_POS_WAIT, which returns as soon as the position is
+    applied, or by polling the slave status with a growing interval when
+    mysql_replication_pos_wait is 0.
+    """
+
+    def __init__(self, timeout=None, use_pos_wait=None):
+        if timeout is None:
+            timeout = Configuration.get_by_name_as_int(
+                'mysql_replication_timeout',
+                default=REPLICATION_TIMEOUT_DEFAULT)
+        self.timeout = timeout
+
+        if use_pos_wait is None:
+            use_pos_wait = Configuration.get_by_name_as_int(
+                'mysql_replication_pos_wait', default=1)
+        self.use_pos_wait = bool(use_pos_wait)
+
+        self.clients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_client(self, instance):
+        if instance.pk not in self.clients:
+            driver = instance.databaseinfra.get_driver()
+            self.clients[instance.pk] = driver.get_client(instance)
+        return self.clients[instance.pk]
+
+    def close(self):
+        for client in self.clients.values():
+            try:
+                client.close()
+            except Exception:
+                LOG.warn("Error closing mysql connection. Ignoring...",
+                         exc_info=True)
+        self.clients = {}
+
+    def query(self, instance, sql):
+        client = self.get_client(instance)
+        client.query(sql)
+        result = client.store_result()
+        if result is None:
+            return []
+        return result.fetch_row(maxrows=0, how=1)
+
+    def get_master_status(self, instance):
+        row = self.query(instance, "show master status")[0]
+        return row['File'], row['Position']
+
+    def get_slave_status(self, instance):
+        rows = self.query(instance, "show slave status")
+        if not rows or rows[0]['Seconds_Behind_Master'] is None:
+            raise Exception("Replication is not running on {}".format(
+                instance))
+        return rows[0]
+
+    def change_master_to(self, instance, master_host, bin_log_file,
+                         bin_log_position):
+        self.query(instance, "stop slave")
+        self.query(
+            instance,
+            "change master to master_host='{}', master_log_file='{}', "
+            "master_log_pos={}".format(
+                master_host, bin_log_file, bin_log_position))
+        self.query(instance, "start slave")
+
+    def start_slave(self, instance):
+        self.query(instance, "start slave")
+
+    def get_master(self, instance, slave_status):
+        """ Master_Host is whatever change master was given: the address,
+        the dns or the hostname of the master """
+        master_host = slave_status['Master_Host']
+        masters = instance.databaseinfra.instances.filter(
+            Q(address=master_host) | Q(dns=master_host) |
+            Q(hostname__hostname=master_host)
+        )
+        if slave_status.get('Master_Port'):
+            masters = masters.filter(port=slave_status['Master_Port'])
+
+        masters = list(masters)
+        if len(masters) != 1:
+            raise Exception("Master {} of {} is not an instance of {}".format(
+                master_host, instance, instance.databaseinfra))
+        return masters[0]
+
+    def executed_position(self, instance):
+        slave_status = self.get_slave_status(instance)
+        return (slave_status['Relay_Master_Log_File'],
+                int(slave_status['Exec_Master_Log_Pos']))
+
+    def pos_wait(self, instance, bin_log_file, bin_log_position):
+        row = self.query(
+            instance,
+            "select master_pos_wait('{}', {}, {}) as events".format(
+                bin_log_file, bin_log_position, self.timeout))[0]
+        if row['events'] is None:
+            raise Exception("Replication is not running on {}".format(
+                instance))
+        return int(row['events']) >= 0
+
+    def poll(self, instance, bin_log_file, bin_log_position):
+        target = (bin_log_file, int(bin_log_position))
+
+        def replica_reached_position():
+            # binlog names share the prefix and have a zero padded sequence
+            return self.executed_position(instance) >= target
+
+        return bool(wait_for(
+            replica_reached_position, timeout=self.timeout, interval=1,
+            backoff=2, max_interval=10))
+
+    def wait_caught_up(self, instance):
+        master = self.get_master(instance, self.get_slave_status(instance))
+        bin_log_file, bin_log_position = self.get_master_status(master)
+        LOG.info("Waiting {} to reach {}:{} of {}".format(
+            instance, bin_log_file, bin_log_position, master))
+
+        if self.use_pos_wait:
+            caught_up = self.pos_wait(
+                instance, bin_log_file, bin_log_position)
+        else:
+            caught_up = self.poll(instance, bin_log_file, bin_log_position)
+
+        if not caught_up:
+            LOG.warning("{} did not reach {}:{} in {}s".format(
+                instance, bin_log_file, bin_log_position, self.timeout))
+        return caught_up
@@ -12,6 +12,7 @@ from physical.models import Instance
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
 from workflow.steps.util import test_bash_script_error
+from workflow.steps.util import run_hosts_script
 from workflow.steps.redis.util import build_permission_script
 from workflow.steps.redis.util import build_clean_database_dir_script
 from workflow.steps.redis.util import change_slave_priority_file
@@ -149,16 +150,10 @@ class ConfigFiles(BaseStep):
 
             script = build_clean_database_dir_script()
             script = build_context_script({}, script)
-            for source_host in workflow_dict['source_hosts']:
-                target_host = source_host.future_host
-                target_cs_host_attr = CS_HostAttr.objects.get(host=target_host)
-                output = {}
-                exec_remote_command(server=target_host.address,
-                                    username=target_cs_host_attr.vm_user,
-                                    password=target_cs_host_attr.vm_password,
-                                    command=script,
-                                    output=output)
-                LOG.info(output)
+            run_hosts_script([
+                source_host.future_host
+                for source_host in workflow_dict['source_hosts']
+            ], script)
 
             return True
         except Exception:
@@ -52,3 +52,21 @@ class TestStep4(BaseStep):
     def undo(self, workflow_dict):
         raise Exception
         return False
+
+
+class TestStep5(BaseStep):
+
+    def __unicode__(self):
+        return "TestStep5"
+
+    def do(self, workflow_dict):
+        workflow_dict.setdefault('executed', []).append('TestStep5')
+        return True
+
+    def undo(self, workflow_dict):
+        return True
+
+
+def finish_test_workflow(workflow_dict, task):
+    task.update_details(persist=True, details="Finished {} steps".format(
+        len(workflow_dict['executed'])))
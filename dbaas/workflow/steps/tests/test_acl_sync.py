@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import itertools
+import mock
+from django.test import TestCase
+from dbaas_aclapi.models import DatabaseBind, DatabaseInfraInstanceBind
+from dbaas_aclapi.models import AclApiJob, CREATED, ERROR
+from logical.tests import factory as factory_logical
+from physical.tests import factory as factory_physical
+from ..util.region_migration.acl_sync import BulkAclSync
+
+
+@mock.patch(
+    'workflow.steps.util.region_migration.acl_sync.ACL_SYNC_RETRY_DELAY', 0)
+class BulkAclSyncTestCase(TestCase):
+
+    def setUp(self):
+        databaseinfra = factory_physical.DatabaseInfraFactory()
+        self.instances = [
+            factory_physical.InstanceFactory(
+                databaseinfra=databaseinfra, address='10.0.0.{}'.format(i),
+                port=27017)
+            for i in range(3)
+        ]
+        self.database = factory_logical.DatabaseFactory(
+            databaseinfra=databaseinfra)
+        for i in range(4):
+            DatabaseBind.objects.create(
+                database=self.database,
+                bind_address='10.{}.0.0/24'.format(i + 1), binds_requested=1)
+
+        # AclApiJob.job_id is unique, every response gets a new job
+        self.jobs = itertools.count(1)
+        self.acl_client = mock.Mock()
+        self.acl_client.grant_acl_for.side_effect = self.grant_acl_for
+
+    def grant_acl_for(self, environment, vlan, payload):
+        return {'jobs': [next(self.jobs)]}
+
+    def acl_sync(self):
+        return BulkAclSync(
+            self.database, self.acl_client, self.instances, [])
+
+    def test_grants_every_bind_to_every_instance(self):
+        acl_sync = self.acl_sync()
+        self.assertTrue(acl_sync.grant())
+
+        self.assertEqual(self.acl_client.grant_acl_for.call_count, 4)
+        self.assertEqual(len(acl_sync.granted), 12)
+        self.assertEqual(DatabaseInfraInstanceBind.objects.filter(
+            bind_status=CREATED).count(), 12)
+        self.assertFalse(
+            DatabaseBind.objects.exclude(bind_status=CREATED).exists())
+        self.assertEqual(AclApiJob.objects.count(), 4)
+
+    def test_splits_rules_in_batches(self):
+        acl_sync = self.acl_sync()
+        acl_sync.batch_size = 2
+        self.assertTrue(acl_sync.grant())
+
+        self.assertEqual(self.acl_client.grant_acl_for.call_count, 8)
+        self.assertEqual(DatabaseInfraInstanceBind.objects.count(), 12)
+
+    def test_retries_failed_requests(self):
+        rejected = []
+
+        def grant_acl_for(environment, vlan, payload):
+            if not rejected:
+                rejected.append(payload)
+                return {}
+            return self.grant_acl_for(environment, vlan, payload)
+        self.acl_client.grant_acl_for.side_effect = grant_acl_for
+        self.assertTrue(self.acl_sync().grant())
+        self.assertEqual(self.acl_client.grant_acl_for.call_count, 5)
+
+    def test_failed_requests_mark_binds_as_error(self):
+        def grant_acl_for(environment, vlan, payload):
+            if environment == '10.1.0.0':
+                raise Exception("ACL API is down")
+            return self.grant_acl_for(environment, vlan, payload)
+        self.acl_client.grant_acl_for.side_effect = grant_acl_for
+
+        acl_sync = self.acl_sync()
+        self.assertFalse(acl_sync.grant())
+
+        self.assertEqual(len(acl_sync.errors), 1)
+        self.assertEqual(
+            DatabaseBind.objects.get(bind_status=ERROR).bind_address,
+            '10.1.0.0/24')
+        self.assertEqual(DatabaseInfraInstanceBind.objects.count(), 9)
+
+    def test_concurrently_saved_instance_bind_is_kept(self):
+        instance_bind = DatabaseInfraInstanceBind.objects.create(
+            databaseinfra=self.database.databaseinfra,
+            instance=self.instances[0].address,
+            instance_port=self.instances[0].port,
+            bind_address='10.1.0.0/24', bind_status=ERROR)
+
+        acl_sync = self.acl_sync()
+        with mock.patch.object(
+            acl_sync, 'get_existing_binds', return_value={}
+        ):
+            self.assertTrue(acl_sync.grant())
+
+        self.assertEqual(DatabaseInfraInstanceBind.objects.count(), 12)
+        self.assertEqual(
+            DatabaseInfraInstanceBind.objects.get(
+                pk=instance_bind.pk).bind_status,
+            CREATED)
+
+    def test_revokes_instance_binds(self):
+        self.acl_sync().grant()
+        self.acl_client.query_acls.return_value = {'envs': [{'vlans': [{
+            'environment': 1, 'num_vlan': 2, 'rules': [{'id': 3}]
+        }]}]}
+        self.acl_client.delete_acl.side_effect = (
+            lambda *args: {'job': next(self.jobs)})
+
+        acl_sync = self.acl_sync()
+        self.assertTrue(acl_sync.revoke())
+
+        self.assertEqual(len(acl_sync.revoked), 12)
+        self.assertEqual(self.acl_client.delete_acl.call_count, 12)
+        self.assertFalse(DatabaseInfraInstanceBind.objects.exists())
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from physical.tests import factory as factory_physical
+from ..mysql.deploy import check_pupet
+from ..mysql.deploy.check_pupet import CheckPuppetIsRunning
+
+
+@mock.patch.object(check_pupet, 'sleep')
+@mock.patch.object(check_pupet, 'run_hosts_script')
+class CheckPuppetIsRunningTestCase(TestCase):
+
+    def setUp(self):
+        self.hosts = [factory_physical.HostFactory() for _ in range(2)]
+        self.workflow_dict = {
+            'hosts': self.hosts,
+            'exceptions': {'error_codes': [], 'traceback': []},
+        }
+
+    def test_checks_every_host_at_once(self, run_hosts_script, sleep):
+        first, second = self.hosts
+        run_hosts_script.side_effect = [
+            [(first, 0, {'stdout': ['0']}), (second, 0, {'stdout': ['1']})],
+            [(second, 0, {'stdout': ['0']})],
+        ]
+
+        self.assertTrue(CheckPuppetIsRunning().do(self.workflow_dict))
+        self.assertEqual(2, run_hosts_script.call_count)
+        self.assertEqual([second], run_hosts_script.call_args[0][0])
+        self.assertEqual(2, sleep.call_count)
+
+    def test_unreachable_host_fails(self, run_hosts_script, _):
+        run_hosts_script.return_value = [
+            (self.hosts[0], 0, {'stdout': ['0']}),
+            (self.hosts[1], None, {'exception': 'timed out'}),
+        ]
+
+        self.assertFalse(CheckPuppetIsRunning().do(self.workflow_dict))
+        self.assertTrue(self.workflow_dict['exceptions']['error_codes'])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from physical.tests import factory as factory_physical
+from ..mysql.util.replication import ReplicationCoordinator
+
+
+class FakeClient(object):
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def query(self, sql):
+        self.queries.append(sql)
+        self.last_query = sql
+
+    def store_result(self):
+        for prefix, rows in self.results.items():
+            if self.last_query.startswith(prefix):
+                result = mock.Mock()
+                result.fetch_row.return_value = rows() if callable(
+                    rows) else rows
+                return result
+
+    def close(self):
+        pass
+
+
+class ReplicationCoordinatorTestCase(TestCase):
+
+    def setUp(self):
+        self.master_client = FakeClient({
+            'show master status': [
+                {'File': 'mysql-bin.000002', 'Position': '120'}],
+        })
+        self.slave_positions = iter(['4', '80', '120'])
+        self.slave_client = FakeClient({
+            'show slave status': lambda: [{
+                'Seconds_Behind_Master': '0', 'Master_Host': '10.0.0.1',
+                'Relay_Master_Log_File': 'mysql-bin.000002',
+                'Exec_Master_Log_Pos': next(self.slave_positions, '120'),
+            }],
+            'select master_pos_wait': [{'events': '3'}],
+        })
+
+        self.master = mock.Mock(pk=1)
+        self.slave = mock.Mock(pk=2)
+        for instance in (self.master, self.slave):
+            instance.databaseinfra.instances.filter.return_value = [
+                self.master]
+            instance.databaseinfra.get_driver.return_value.get_client = (
+                lambda instance: {
+                    1: self.master_client, 2: self.slave_client
+                }[instance.pk])
+
+    def test_waits_master_position(self):
+        replication = ReplicationCoordinator(timeout=30, use_pos_wait=True)
+        self.assertTrue(replication.wait_caught_up(self.slave))
+        self.assertIn(
+            "select master_pos_wait('mysql-bin.000002', 120, 30) as events",
+            self.slave_client.queries)
+
+    def test_pos_wait_timeout(self):
+        self.slave_client.results['select master_pos_wait'] = [
+            {'events': '-1'}]
+        replication = ReplicationCoordinator(timeout=30, use_pos_wait=True)
+        self.assertFalse(replication.wait_caught_up(self.slave))
+
+    def test_pos_wait_without_replication(self):
+        self.slave_client.results['select master_pos_wait'] = [
+            {'events': None}]
+        replication = ReplicationCoordinator(timeout=30, use_pos_wait=True)
+        self.assertRaises(Exception, replication.wait_caught_up, self.slave)
+
+    @mock.patch('util.sleep')
+    def test_polls_executed_position(self, sleep):
+        replication = ReplicationCoordinator(timeout=30, use_pos_wait=False)
+        self.assertTrue(replication.wait_caught_up(self.slave))
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_reuses_one_connection_per_instance(self):
+        get_client = mock.Mock(return_value=self.slave_client)
+        self.slave.databaseinfra.get_driver.return_value.get_client = (
+            get_client)
+
+        with ReplicationCoordinator(timeout=30) as replication:
+            replication.change_master_to(
+                self.slave, '10.0.0.1', 'mysql-bin.000002', 120)
+            replication.start_slave(self.slave)
+
+        get_client.assert_called_once_with(self.slave)
+        self.assertEqual(len(self.slave_client.queries), 4)
+
+
+class GetMasterTestCase(TestCase):
+
+    def setUp(self):
+        self.master = factory_physical.InstanceFactory(
+            address='10.0.0.1', port=3306, dns='master.mydomain.com')
+        self.slave = factory_physical.InstanceFactory(
+            address='10.0.0.2', port=3306,
+            databaseinfra=self.master.databaseinfra)
+        self.replication = ReplicationCoordinator(timeout=30)
+
+    def get_master(self, master_host):
+        return self.replication.get_master(self.slave, {
+            'Master_Host': master_host, 'Master_Port': '3306'})
+
+    def test_master_by_address_dns_or_hostname(self):
+        for master_host in (self.master.address, self.master.dns,
+                            self.master.hostname.hostname):
+            self.assertEqual(self.master, self.get_master(master_host))
+
+    def test_master_outside_the_infra(self):
+        self.assertRaises(Exception, self.get_master, '10.9.9.9')
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from physical.models import ReplicationTopology
+import util
+from ... import settings
+from ...registry import load_registry
+from .factory import TestStep1
+
+
+class WorkflowRegistryTestCase(TestCase):
+
+    def test_loads_every_configured_step(self):
+        ReplicationTopology.objects.create(
+            name='MySQL Single',
+            class_path='drivers.replication_topologies.mysql.MySQLSingle')
+
+        step_paths = load_registry()
+
+        self.assertIn(settings.MYSQL_REGION_MIGRATION_1[0], step_paths)
+        self.assertIn(
+            'workflow.steps.mysql.deploy.init_database.InitDatabase',
+            step_paths)
+
+    @mock.patch.object(settings, 'BROKEN_STEPS', (
+        'workflow.steps.tests.factory.TestStep1',
+        'workflow.steps.tests.factory.TestStepTypo',
+    ), create=True)
+    def test_fails_on_invalid_path(self):
+        with self.assertRaises(ImproperlyConfigured) as context:
+            load_registry()
+        self.assertIn('TestStepTypo', str(context.exception))
+
+    @mock.patch.dict(util.CLASS_CACHE, clear=True)
+    @mock.patch.dict(util.INSTANCE_CACHE, clear=True)
+    @mock.patch('util.import_by_path', return_value=TestStep1)
+    def test_classes_are_imported_once(self, import_by_path):
+        step = util.get_instance('workflow.steps.tests.factory.TestStep1')
+        self.assertIs(
+            step, util.get_instance('workflow.steps.tests.factory.TestStep1'))
+        import_by_path.assert_called_once_with(
+            'workflow.steps.tests.factory.TestStep1')
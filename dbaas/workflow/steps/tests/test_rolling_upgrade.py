@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from ..mongodb.upgrade.rolling import RollingUpgrade
+
+
+class RollingUpgradeTestCase(TestCase):
+
+    def setUp(self):
+        self.primary = 'primary'
+        self.secondaries = ['secondary1', 'secondary2', 'secondary3']
+        self.arbiter = 'arbiter'
+
+        self.databaseinfra = mock.MagicMock()
+        self.driver = self.databaseinfra.get_driver.return_value
+        self.driver.get_master_instance.return_value = self.primary
+        self.driver.get_slave_instances.return_value = self.secondaries
+        self.driver.get_database_instances.return_value = [
+            self.primary] + self.secondaries
+        self.driver.get_non_database_instances.return_value = [self.arbiter]
+        self.driver.wait_replication_lag.return_value = []
+        self.driver.get_members_state.side_effect = self.get_members_state
+
+        self.upgraded = []
+        self.down = {}
+
+    def get_members_state(self, client, instances):
+        states = {}
+        for instance in instances:
+            if self.down.get(instance):
+                self.down[instance] -= 1
+                states[instance] = (0, '(not reachable/healthy)')
+            else:
+                states[instance] = (1, 'ARBITER' if instance == self.arbiter
+                                    else 'SECONDARY')
+        return states
+
+    def upgrade(self, instance):
+        self.upgraded.append(instance)
+
+    def build(self, **kwargs):
+        return RollingUpgrade(
+            self.databaseinfra, self.upgrade, lag_timeout=100, **kwargs)
+
+    def test_keeps_a_majority_of_voting_members_up(self):
+        self.assertEqual(2, self.build().max_parallel)
+
+        self.driver.get_database_instances.return_value = [
+            self.primary, self.secondaries[0]]
+        self.assertEqual(1, self.build().max_parallel)
+
+    def test_configured_healthy_members_limits_batches(self):
+        rolling_upgrade = self.build()
+        rolling_upgrade.min_healthy_members = 4
+        self.assertEqual(1, rolling_upgrade.max_parallel)
+
+    def test_upgrades_secondaries_before_primary(self):
+        upgrade_primary = mock.Mock()
+        self.build(upgrade_primary=upgrade_primary).run()
+
+        self.assertEqual(
+            sorted([self.arbiter] + self.secondaries), sorted(self.upgraded))
+        upgrade_primary.assert_called_once_with(self.primary)
+        self.assertEqual([
+            mock.call(instance=self.secondaries[0], attempts=10),
+            mock.call(instance=self.primary, attempts=10),
+        ], self.driver.check_replication_and_switch.call_args_list)
+
+    def test_waits_replication_of_each_batch(self):
+        self.build().run()
+
+        self.assertEqual([
+            mock.call(instances=self.secondaries, timeout=100),
+            mock.call(instances=[self.arbiter, 'secondary1'], timeout=100),
+            mock.call(instances=['secondary2', 'secondary3'], timeout=100),
+            mock.call(instances=[self.primary], timeout=100),
+        ], self.driver.wait_replication_lag.call_args_list)
+
+    def test_skips_arbiters(self):
+        self.build(include_arbiters=False).run()
+        self.assertNotIn(self.arbiter, self.upgraded)
+
+    def test_failed_member_stops_upgrade(self):
+        def upgrade(instance):
+            if instance == 'secondary1':
+                raise Exception("mongod did not start")
+
+        rolling_upgrade = RollingUpgrade(
+            self.databaseinfra, upgrade, lag_timeout=100)
+        self.assertRaises(Exception, rolling_upgrade.run)
+        self.assertFalse(self.driver.check_replication_and_switch.called)
+
+    @mock.patch('util.sleep')
+    def test_arbiter_down_blocks_next_batch(self, sleep):
+        self.driver.get_slave_instances.return_value = ['secondary1']
+        self.driver.get_database_instances.return_value = [
+            self.primary, 'secondary1']
+
+        def upgrade(instance):
+            if instance == self.arbiter:
+                self.assertEqual([], self.upgraded)
+                self.down[self.arbiter] = 2
+            else:
+                self.assertEqual(0, self.down[self.arbiter])
+            self.upgraded.append(instance)
+
+        RollingUpgrade(self.databaseinfra, upgrade, lag_timeout=100).run()
+
+        self.assertEqual(
+            [self.arbiter, 'secondary1', self.primary], self.upgraded)
+        self.assertEqual(2, sleep.call_count)
+
+    def test_member_not_back_stops_upgrade(self):
+        def upgrade(instance):
+            self.down[instance] = 1
+            self.upgraded.append(instance)
+
+        rolling_upgrade = RollingUpgrade(
+            self.databaseinfra, upgrade, lag_timeout=0)
+        self.assertRaises(Exception, rolling_upgrade.run)
+        self.assertEqual([self.arbiter, 'secondary1'], self.upgraded)
+        self.assertFalse(self.driver.wait_replication_lag.call_args_list[1:])
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from ..util import get_script_phases, run_scripts, run_vm_script
+from ..util import SERIAL, SLAVES_FIRST, ALL_AT_ONCE
+
+
+class GetScriptPhasesTestCase(TestCase):
+
+    def setUp(self):
+        self.master = {'instance': 'master', 'is_master': True}
+        self.slave1 = {'instance': 'slave1', 'is_master': False}
+        self.slave2 = {'instance': 'slave2', 'is_master': False}
+        self.instances_detail = [self.master, self.slave1, self.slave2]
+
+    def test_serial(self):
+        self.assertEqual(
+            get_script_phases(self.instances_detail, SERIAL),
+            [[self.master], [self.slave1], [self.slave2]])
+
+    def test_serial_reverse(self):
+        self.assertEqual(
+            get_script_phases(self.instances_detail, SERIAL, reverse=True),
+            [[self.slave2], [self.slave1], [self.master]])
+
+    def test_slaves_first(self):
+        self.assertEqual(
+            get_script_phases(self.instances_detail, SLAVES_FIRST),
+            [[self.slave1, self.slave2], [self.master]])
+
+    def test_slaves_first_reverse_runs_masters_first(self):
+        self.assertEqual(
+            get_script_phases(
+                self.instances_detail, SLAVES_FIRST, reverse=True),
+            [[self.master], [self.slave2, self.slave1]])
+
+    def test_slaves_first_without_slaves(self):
+        self.assertEqual(
+            get_script_phases([self.master], SLAVES_FIRST), [[self.master]])
+
+    def test_all_at_once(self):
+        self.assertEqual(
+            get_script_phases(self.instances_detail, ALL_AT_ONCE),
+            [self.instances_detail])
+
+
+@mock.patch('workflow.steps.util.HostAttr.objects.filter')
+@mock.patch('workflow.steps.util.exec_remote_command')
+class RunScriptsTestCase(TestCase):
+
+    def setUp(self):
+        self.instances_detail = [
+            self.instance_detail(1, is_master=True),
+            self.instance_detail(2, is_master=False),
+            self.instance_detail(3, is_master=False),
+        ]
+        self.workflow_dict = {
+            'instances_detail': self.instances_detail,
+            'initial_context_dict': {},
+            'exceptions': {'error_codes': [], 'traceback': []},
+        }
+
+    def instance_detail(self, host_id, is_master):
+        host = mock.Mock(id=host_id, address='10.0.0.{}'.format(host_id))
+        instance = mock.Mock(hostname=host, hostname_id=host_id)
+        return {'instance': instance, 'is_master': is_master}
+
+    def host_attrs(self):
+        return [
+            mock.Mock(host_id=detail['instance'].hostname_id)
+            for detail in self.instances_detail
+        ]
+
+    def test_collects_every_host_result(self, exec_remote_command, filter):
+        filter.return_value = self.host_attrs()
+
+        def execute(server, output, **kwargs):
+            output['stdout'] = [server]
+            return 0
+        exec_remote_command.side_effect = execute
+
+        results = run_scripts(
+            self.workflow_dict, {}, 'echo {{ IS_MASTER }}',
+            order=SLAVES_FIRST)
+
+        self.assertEqual([
+            (self.instances_detail[1], 0, {'stdout': ['10.0.0.2']}),
+            (self.instances_detail[2], 0, {'stdout': ['10.0.0.3']}),
+            (self.instances_detail[0], 0, {'stdout': ['10.0.0.1']}),
+        ], results)
+        commands = dict(
+            (kwargs['server'], kwargs['command'].strip())
+            for _, kwargs in exec_remote_command.call_args_list
+        )
+        self.assertEqual('True', commands['10.0.0.1'])
+        self.assertEqual('False', commands['10.0.0.2'])
+
+    def test_unreachable_host_fails(self, exec_remote_command, filter):
+        filter.return_value = self.host_attrs()
+
+        def execute(server, **kwargs):
+            return None if server == '10.0.0.2' else 0
+        exec_remote_command.side_effect = execute
+
+        results = run_scripts(
+            self.workflow_dict, {}, 'echo', order=SLAVES_FIRST)
+        self.assertEqual(
+            [(detail, return_code) for detail, return_code, _ in results], [
+                (self.instances_detail[1], None),
+                (self.instances_detail[2], 0),
+            ])
+
+        self.assertFalse(run_vm_script(
+            self.workflow_dict, {}, 'echo', order=SLAVES_FIRST))
+        self.assertTrue(self.workflow_dict['exceptions']['error_codes'])
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+import socket
+from django.test import TestCase
+from physical.tests import factory as factory_physical
+from .. import util
+from ..util import resize
+from ..util import start_vm, stop_vm
+from util import check_ssh
+
+
+@mock.patch.object(util, 'get_credentials_for')
+@mock.patch.object(util, 'CloudStackProvider')
+@mock.patch.object(util, 'get_hosts_attrs')
+class StartStopVMTestCase(TestCase):
+
+    def setUp(self):
+        self.instances = [
+            factory_physical.InstanceFactory(address='10.0.0.{}'.format(i))
+            for i in range(3)
+        ]
+        self.task = mock.Mock()
+        self.workflow_dict = {
+            'environment': None,
+            'instances_detail': [],
+            'task_history': self.task,
+            'exceptions': {'error_codes': [], 'traceback': []},
+        }
+
+    def hosts_attrs(self):
+        return [
+            (instance.hostname, mock.Mock(vm_id=instance.pk), [instance])
+            for instance in self.instances
+        ]
+
+    @mock.patch.object(util, 'is_port_open', return_value=True)
+    @mock.patch.object(util, 'check_ssh', return_value=True)
+    def test_start_every_host(self, check_ssh, _, get_hosts_attrs,
+                              cs_provider, __):
+        get_hosts_attrs.return_value = self.hosts_attrs()
+
+        self.assertTrue(start_vm(self.workflow_dict))
+        self.assertEqual(
+            cs_provider.return_value.start_virtual_machine.call_count, 3)
+        self.assertEqual(check_ssh.call_count, 3)
+        self.assertEqual(self.task.update_details.call_count, 3)
+        for _, kwargs in check_ssh.call_args_list:
+            self.assertTrue(
+                0 < kwargs['timeout'] <= util.VM_READY_TIMEOUT_DEFAULT)
+
+    @mock.patch.object(util, 'is_port_open', return_value=True)
+    @mock.patch.object(util, 'check_ssh', return_value=True)
+    def test_start_fails_when_a_host_does_not_start(
+        self, _, __, get_hosts_attrs, cs_provider, ___
+    ):
+        get_hosts_attrs.return_value = self.hosts_attrs()
+        cs_provider.return_value.start_virtual_machine.side_effect = [
+            True, False, True
+        ]
+
+        self.assertFalse(start_vm(self.workflow_dict))
+        self.assertEqual(
+            cs_provider.return_value.start_virtual_machine.call_count, 3)
+        self.assertTrue(self.workflow_dict['exceptions']['error_codes'])
+
+    def test_stop_every_host(self, get_hosts_attrs, cs_provider, _):
+        get_hosts_attrs.return_value = self.hosts_attrs()
+
+        self.assertTrue(stop_vm(self.workflow_dict))
+        self.assertEqual(
+            cs_provider.return_value.stop_virtual_machine.call_count, 3)
+
+
+@mock.patch.object(resize, 'get_credentials_for')
+@mock.patch.object(resize, 'CloudStackProvider')
+@mock.patch.object(resize, 'HostAttr')
+class ResizeStartStopVMTestCase(TestCase):
+
+    def setUp(self):
+        self.instance = factory_physical.InstanceFactory()
+        self.workflow_dict = {
+            'environment': None,
+            'host': self.instance.hostname,
+            'exceptions': {'error_codes': [], 'traceback': []},
+        }
+
+    @mock.patch.object(util, 'is_port_open')
+    @mock.patch.object(util, 'check_ssh', return_value=True)
+    def test_start_waits_for_ssh_within_deadline(
+        self, check_ssh, is_port_open, _, cs_provider, __
+    ):
+        self.assertTrue(resize.start_vm(self.workflow_dict))
+        self.assertTrue(
+            cs_provider.return_value.start_virtual_machine.called)
+        _, kwargs = check_ssh.call_args
+        self.assertEqual(1, kwargs['retries'])
+        self.assertTrue(
+            0 < kwargs['timeout'] <= util.VM_READY_TIMEOUT_DEFAULT)
+        self.assertFalse(is_port_open.called)
+
+    @mock.patch.object(util, 'wait_for', return_value=False)
+    def test_start_fails_when_ssh_is_not_ready(self, _, __, cs_provider, ___):
+        self.assertFalse(resize.start_vm(self.workflow_dict))
+        self.assertTrue(self.workflow_dict['exceptions']['error_codes'])
+
+    def test_stop(self, _, cs_provider, __):
+        self.assertTrue(resize.stop_vm(self.workflow_dict))
+        self.assertTrue(cs_provider.return_value.stop_virtual_machine.called)
+
+
+@mock.patch('util.sleep')
+@mock.patch('util.paramiko.SSHClient')
+class CheckSSHTestCase(TestCase):
+
+    def test_closes_client_after_each_attempt(self, ssh_client, _):
+        ssh = ssh_client.return_value
+        ssh.connect.side_effect = [socket.error('refused'), None]
+
+        self.assertTrue(check_ssh(
+            '10.0.0.1', 'user', 'password', retries=2, wait=0, timeout=5))
+
+        self.assertEqual(2, ssh.close.call_count)
+        for _, kwargs in ssh.connect.call_args_list:
+            self.assertEqual(5, kwargs['timeout'])
+
+    def test_gives_up_after_retries(self, ssh_client, _):
+        ssh = ssh_client.return_value
+        ssh.connect.side_effect = socket.timeout('timed out')
+
+        self.assertFalse(check_ssh(
+            '10.0.0.1', 'user', 'password', retries=2, wait=0, timeout=5))
+        self.assertEqual(2, ssh.close.call_count)
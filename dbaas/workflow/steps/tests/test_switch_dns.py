@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import mock
+from django.test import TestCase
+from .. import util
+from ..util import build_dns_changes, apply_dns_changes
+
+
+class FakeHost(object):
+
+    def __init__(self, address, hostname, future_host=None):
+        self.address = address
+        self.hostname = hostname
+        self.future_host = future_host
+        self.save = mock.Mock()
+
+
+@mock.patch.object(util, 'DNSAPIProvider')
+class SwitchDNSTestCase(TestCase):
+
+    def setUp(self):
+        self.sources = [
+            FakeHost('10.0.0.{}'.format(i), 'host{}.dns'.format(i),
+                     FakeHost('10.1.0.{}'.format(i), '10.1.0.{}'.format(i)))
+            for i in range(3)
+        ]
+        self.changes = build_dns_changes(
+            self.sources, 'address', 'hostname', 'future_host')
+
+    def test_build_changes(self, _):
+        change = self.changes[0]
+        self.assertEqual(change['dns'], 'host0.dns')
+        self.assertEqual(change['old_ip'], '10.0.0.0')
+        self.assertEqual(change['new_ip'], '10.1.0.0')
+
+    def test_apply_changes(self, dns_provider):
+        apply_dns_changes(None, self.changes)
+
+        self.assertEqual(
+            dns_provider.update_database_dns_content.call_count, 3)
+        for source in self.sources:
+            self.assertEqual(source.hostname, source.address)
+            self.assertTrue(source.future_host.hostname.endswith('.dns'))
+            source.save.assert_called_once_with()
+
+    def test_failure_restores_every_record(self, dns_provider):
+        def update(databaseinfra, dns, old_ip, new_ip):
+            if dns == 'host1.dns':
+                raise Exception("DNS API is down")
+        dns_provider.update_database_dns_content.side_effect = update
+
+        self.assertRaises(Exception, apply_dns_changes, None, self.changes)
+
+        restored = [
+            call[1] for call in
+            dns_provider.update_database_dns_content.call_args_list
+            if call[1]['old_ip'].startswith('10.1.')
+        ]
+        self.assertEqual(
+            sorted(call['dns'] for call in restored),
+            ['host0.dns', 'host1.dns', 'host2.dns'])
+        for source in self.sources:
+            self.assertFalse(source.save.called)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+from django.test import TestCase
+from ..util.volume_migration import parse_rsync_stats
+from ..util.volume_migration import build_sync_progress
+
+RSYNC_STATS_OUTPUT = [
+    "\n",
+    "Number of files: 1,042 (reg: 1,020, dir: 22)\n",
+    "Number of created files: 3 (reg: 3)\n",
+    "Number of regular files transferred: 12\n",
+    "Total file size: 2,147,483,648 bytes\n",
+    "Total transferred file size: 104,857,600 bytes\n",
+    "Literal data: 104,857,600 bytes\n",
+]
+
+
+class ParseRsyncStatsTestCase(TestCase):
+
+    def test_parse_stats(self):
+        stats = parse_rsync_stats(RSYNC_STATS_OUTPUT)
+        self.assertEqual(stats['total_bytes'], 2147483648)
+        self.assertEqual(stats['transferred_bytes'], 104857600)
+        self.assertEqual(stats['transferred_files'], 12)
+
+    def test_parse_stats_old_rsync(self):
+        stats = parse_rsync_stats([
+            "Number of files transferred: 7\n",
+            "Total file size: 2048 bytes\n",
+            "Total transferred file size: 1024 bytes\n",
+        ])
+        self.assertEqual(stats['total_bytes'], 2048)
+        self.assertEqual(stats['transferred_bytes'], 1024)
+        self.assertEqual(stats['transferred_files'], 7)
+
+    def test_parse_empty_output(self):
+        stats = parse_rsync_stats([])
+        self.assertEqual(stats['total_bytes'], 0)
+        self.assertEqual(stats['transferred_bytes'], 0)
+
+
+class BuildSyncProgressTestCase(TestCase):
+
+    def setUp(self):
+        self.stats = {
+            'total_bytes': 1000,
+            'transferred_bytes': 100,
+            'transferred_files': 1,
+        }
+
+    def test_progress(self):
+        progress = build_sync_progress(self.stats, 10)
+        self.assertEqual(progress['percent_synced'], 90.0)
+        self.assertEqual(progress['bytes_per_second'], 10)
+        self.assertIsNone(progress['estimated_seconds'])
+
+    def test_estimate_from_previous_pass(self):
+        previous = {'transferred_bytes': 1000}
+        progress = build_sync_progress(self.stats, 10, previous)
+        self.assertEqual(progress['estimated_seconds'], 1)
+
+    def test_nothing_to_sync(self):
+        self.stats['transferred_bytes'] = 0
+        progress = build_sync_progress(self.stats, 0)
+        self.assertEqual(progress['percent_synced'], 100.0)
+        self.assertEqual(progress['bytes_per_second'], 0)
@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 import logging
+import mock
+from datetime import datetime, timedelta
 from django.test import TestCase
 from workflow.workflow import start_workflow
 from workflow.workflow import stop_workflow
+from workflow.workflow import resume_workflow
+from workflow.workflow import claim_workflow_resume
+from workflow.workflow import WorkflowNotResumable
+from notification.models import StepExecution, WorkflowCheckpoint
+from notification.tests.factory import NotificationHistoryFactory
 
 LOG = logging.getLogger(__name__)
 
+ON_FINISH = 'workflow.steps.tests.factory.finish_test_workflow'
+
 
 class StartWorkflowTestCase(TestCase):
 
@@ -76,3 +85,129 @@ class StopWorkflowTestCase(TestCase):
                          ('DBAAS_0001', 'Workflow error')])
         self.assertEqual(self.workflow_dict['steps'], ('workflow.steps.tests.factory.TestStep4',
                                                        'workflow.steps.tests.factory.TestStep3'))
+
+
+class StepExecutionLedgerTestCase(TestCase):
+
+    def test_records_every_step(self):
+        start_workflow({'steps': ('workflow.steps.tests.factory.TestStep1',
+                                  'workflow.steps.tests.factory.TestStep2')})
+
+        executions = StepExecution.objects.order_by('step_index')
+        self.assertEqual(
+            [(execution.step_index, execution.direction, execution.status)
+             for execution in executions],
+            [(1, StepExecution.DO, StepExecution.SUCCESS),
+             (2, StepExecution.DO, StepExecution.SUCCESS)])
+        self.assertIsNotNone(executions[0].duration)
+
+    def test_records_failed_step_and_rollback(self):
+        start_workflow({'steps': ('workflow.steps.tests.factory.TestStep1',
+                                  'workflow.steps.tests.factory.TestStep3')})
+
+        self.assertEqual(
+            list(StepExecution.objects.order_by('pk').values_list(
+                'step', 'direction', 'status')),
+            [('workflow.steps.tests.factory.TestStep1', 'do', 'SUCCESS'),
+             ('workflow.steps.tests.factory.TestStep3', 'do', 'ERROR'),
+             ('workflow.steps.tests.factory.TestStep3', 'undo', 'SUCCESS'),
+             ('workflow.steps.tests.factory.TestStep1', 'undo', 'SUCCESS')])
+
+
+@mock.patch('notification.models.get_active_task_ids', return_value=set())
+class WorkflowCheckpointTestCase(TestCase):
+
+    def setUp(self):
+        self.task = NotificationHistoryFactory()
+        self.steps = ('workflow.steps.tests.factory.TestStep5',
+                      'workflow.steps.tests.factory.TestStep5')
+
+    def test_checkpoint_after_every_step(self, _):
+        workflow_dict = {'steps': self.steps, 'task_history': self.task,
+                         'client': object()}
+        self.assertTrue(start_workflow(workflow_dict, task=self.task))
+
+        checkpoint = WorkflowCheckpoint.objects.get(task=self.task)
+        self.assertEqual(checkpoint.status, WorkflowCheckpoint.SUCCESS)
+        self.assertEqual(checkpoint.step_counter, 2)
+        self.assertEqual(checkpoint.skipped_keys, 'client')
+
+    def start_checkpoint(self, on_finish=ON_FINISH, **extra):
+        workflow_dict = {
+            'steps': self.steps, 'step_counter': 1,
+            'task_history': self.task, 'executed': ['TestStep5'],
+        }
+        workflow_dict.update(extra)
+        checkpoint = WorkflowCheckpoint.start(
+            self.task, workflow_dict, on_finish)
+
+        # its worker is gone for longer than the resume lease
+        WorkflowCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            updated_at=datetime.now() - timedelta(hours=1))
+        return WorkflowCheckpoint.objects.get(pk=checkpoint.pk)
+
+    def resume(self):
+        claim_workflow_resume(self.task)
+        return resume_workflow(self.task)
+
+    def test_checkpoint_keeps_completion_hook(self, _):
+        start_workflow({'steps': self.steps}, task=self.task,
+                       on_finish=ON_FINISH)
+        checkpoint = WorkflowCheckpoint.objects.get(task=self.task)
+        self.assertEqual(checkpoint.on_finish, ON_FINISH)
+
+    def test_resume_from_first_unfinished_step(self, _):
+        self.start_checkpoint()
+
+        workflow_dict = self.resume()
+
+        self.assertTrue(workflow_dict['created'])
+        self.assertEqual(workflow_dict['task_history'], self.task)
+        self.assertEqual(workflow_dict['executed'], ['TestStep5'] * 2)
+        self.assertEqual(
+            StepExecution.objects.filter(task=self.task).count(), 1)
+        self.assertIsNone(resume_workflow(self.task))
+
+    def test_resume_runs_completion_hook(self, _):
+        self.start_checkpoint()
+        self.resume()
+        self.assertIn("Finished 2 steps", self.task.details)
+
+    def test_resume_refused_without_completion_hook(self, _):
+        self.start_checkpoint(on_finish=None)
+        self.assertRaises(
+            WorkflowNotResumable, claim_workflow_resume, self.task)
+
+    def test_resume_refused_with_keys_not_saved(self, _):
+        self.start_checkpoint(client=object())
+        self.assertRaises(WorkflowNotResumable, self.resume)
+        self.assertFalse(StepExecution.objects.filter(task=self.task).exists())
+
+    def test_resume_refused_without_claim(self, _):
+        self.start_checkpoint()
+        self.assertRaises(WorkflowNotResumable, resume_workflow, self.task)
+
+    def test_resume_claimed_once(self, _):
+        self.start_checkpoint()
+        claim_workflow_resume(self.task)
+        self.assertRaises(
+            WorkflowNotResumable, claim_workflow_resume, self.task)
+
+    def test_concurrent_claim_loses(self, _):
+        checkpoint = self.start_checkpoint()
+        other = WorkflowCheckpoint.objects.get(pk=checkpoint.pk)
+
+        self.assertTrue(checkpoint.claim())
+        self.assertFalse(other.claim())
+
+    def test_resume_refused_while_worker_saves_steps(self, _):
+        checkpoint = self.start_checkpoint()
+        checkpoint.save()
+        self.assertRaises(
+            WorkflowNotResumable, claim_workflow_resume, self.task)
+
+    def test_resume_refused_while_task_is_active(self, get_active_task_ids):
+        self.start_checkpoint()
+        get_active_task_ids.return_value = set([self.task.task_id])
+        self.assertRaises(
+            WorkflowNotResumable, claim_workflow_resume, self.task)
@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 import logging
+import socket
+from collections import OrderedDict
 from util import exec_remote_command
 from util import check_ssh
 from util import get_credentials_for
 from util import full_stack
 from util import build_context_script
-from time import sleep
+from util import run_in_parallel
+from util import wait_for
+from time import sleep, time
+from django.db import transaction
+from system.models import Configuration
 from dbaas_cloudstack.models import HostAttr
 from dbaas_cloudstack.provider import CloudStackProvider
 from dbaas_credentials.models import CredentialType
@@ -14,36 +20,134 @@ from workflow.exceptions.error_codes import DBAAS_0015
 
 LOG = logging.getLogger(__name__)
 
+VM_READY_TIMEOUT_DEFAULT = 600
+VM_SERVICE_TIMEOUT_DEFAULT = 60
+DNS_SWITCH_MAX_PARALLEL_DEFAULT = 8
 
-def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0):
-    try:
-        instances_detail = workflow_dict['instances_detail']
+# run_vm_script orders
+SERIAL = 'serial'
+SLAVES_FIRST = 'slaves_first'
+ALL_AT_ONCE = 'all_at_once'
 
-        final_context_dict = dict(
-            context_dict.items() + workflow_dict['initial_context_dict'].items())
 
-        if reverse:
-            instances_detail_final = instances_detail[::-1]
-        else:
-            instances_detail_final = instances_detail
-
-        for instance_detail in instances_detail_final:
-            host = instance_detail['instance'].hostname
-            host_csattr = HostAttr.objects.get(host=host)
-            final_context_dict['IS_MASTER'] = instance_detail['is_master']
-            command = build_context_script(final_context_dict, script)
-            output = {}
-            return_code = exec_remote_command(server=host.address,
-                                              username=host_csattr.vm_user,
-                                              password=host_csattr.vm_password,
-                                              command=command,
-                                              output=output)
-            if return_code:
-                raise Exception(
-                    "Could not run script. Output: {}".format(output))
+def get_script_phases(instances_detail, order=SERIAL, reverse=False):
+    """ Splits instances_detail in the groups run_vm_script runs one
+    after the other, the instances of a group run at the same time.
+    With reverse, SLAVES_FIRST runs the masters first """
+    if reverse:
+        instances_detail = instances_detail[::-1]
+
+    if order == ALL_AT_ONCE:
+        return [instances_detail]
 
+    if order == SLAVES_FIRST:
+        phases = [
+            [detail for detail in instances_detail if not detail['is_master']],
+            [detail for detail in instances_detail if detail['is_master']],
+        ]
+        if reverse:
+            phases.reverse()
+        return [phase for phase in phases if phase]
+
+    return [[instance_detail] for instance_detail in instances_detail]
+
+
+def exec_host_command(host, host_attr, command):
+    output = {}
+    return_code = exec_remote_command(
+        server=host.address, username=host_attr.vm_user,
+        password=host_attr.vm_password, command=command, output=output)
+    return return_code, output
+
+
+def run_hosts_script(hosts, script):
+    """ Runs script on every host at the same time, for scripts that do not
+    depend on the role of the host. Returns (host, return_code, output) of
+    every host, return_code is None when the host could not be reached """
+    host_attrs = dict(
+        (host_attr.host_id, host_attr)
+        for host_attr in HostAttr.objects.filter(host__in=hosts)
+    )
+
+    def run(host):
+        return exec_host_command(host, host_attrs[host.id], script)
+
+    results = []
+    for host, result, error in run_in_parallel(run, hosts):
+        if error:
+            result = (None, {'exception': str(error)})
+        return_code, output = result
+        LOG.info("{}: {} {}".format(host, return_code, output))
+        results.append((host, return_code, output))
+    return results
+
+
+def run_scripts(workflow_dict, context_dict, script, order=SERIAL,
+                reverse=False, wait=0):
+    """ Runs script on the host of every instance of instances_detail,
+    following order. Returns (instance_detail, return_code, output) of
+    every instance reached, stops after the first group with errors """
+    instances_detail = workflow_dict['instances_detail']
+    final_context_dict = dict(
+        context_dict.items() + workflow_dict['initial_context_dict'].items())
+
+    host_attrs = dict(
+        (host_attr.host_id, host_attr)
+        for host_attr in HostAttr.objects.filter(host__in=[
+            instance_detail['instance'].hostname_id
+            for instance_detail in instances_detail
+        ])
+    )
+
+    # IS_MASTER is the only per host variable, render once for each value
+    commands = {}
+    for instance_detail in instances_detail:
+        is_master = instance_detail['is_master']
+        if is_master not in commands:
+            final_context_dict['IS_MASTER'] = is_master
+            commands[is_master] = build_context_script(
+                final_context_dict, script)
+
+    def run(instance_detail):
+        host = instance_detail['instance'].hostname
+        return exec_host_command(
+            host, host_attrs[host.id], commands[instance_detail['is_master']])
+
+    results = []
+    phases = get_script_phases(instances_detail, order, reverse)
+    for i, phase in enumerate(phases):
+        failed = False
+        for instance_detail, result, error in run_in_parallel(run, phase):
+            if error:
+                result = (None, {'exception': str(error)})
+            return_code, output = result
+            results.append((instance_detail, return_code, output))
+            failed = failed or return_code != 0
+
+        if failed:
+            break
+        if wait and i < len(phases) - 1:
             sleep(wait)
 
+    return results
+
+
+def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0,
+                  order=SERIAL):
+    try:
+        results = run_scripts(
+            workflow_dict, context_dict, script, order=order,
+            reverse=reverse, wait=wait)
+
+        errors = [
+            "{}: {}".format(instance_detail['instance'].hostname, output)
+            for instance_detail, return_code, output in results
+            if return_code != 0
+        ]
+        if errors:
+            raise Exception(
+                "Could not run script. Output: {}".format("\n".join(errors)))
+
         return True
 
     except Exception:
@@ -55,37 +159,122 @@ def run_vm_script(workflow_dict, context_dict, script, reverse=False, wait=0):
         return False
 
 
-def start_vm(workflow_dict):
+def log_step(workflow_dict, msg):
+    LOG.info(msg)
+    task = workflow_dict.get('task_history')
+    if task:
+        task.update_details(persist=True, details=msg)
+
+
+def get_hosts_attrs(instances_detail):
+    """ (host, HostAttr, instances) of every host of instances_detail,
+    HostAttrs are loaded in a single query """
+    hosts = OrderedDict()
+    for instance_detail in instances_detail:
+        instance = instance_detail['instance']
+        hosts.setdefault(
+            instance.hostname_id, (instance.hostname, [])
+        )[1].append(instance)
+
+    host_attrs = dict(
+        (host_attr.host_id, host_attr)
+        for host_attr in HostAttr.objects.filter(host__in=hosts.keys())
+    )
+    return [
+        (host, host_attrs[host_id], instances)
+        for host_id, (host, instances) in hosts.items()
+    ]
+
+
+def is_port_open(address, port, timeout=5):
     try:
-        environment = workflow_dict['environment']
-        cs_credentials = get_credentials_for(
-            environment=environment, credential_type=CredentialType.CLOUDSTACK)
+        socket.create_connection((address, port), timeout=timeout).close()
+        return True
+    except (socket.error, socket.timeout):
+        return False
+
+
+def power_vms(workflow_dict, action):
+    """ Runs action(cs_provider, host, host_csattr, instances) on every
+    host at the same time, action returns a message with its timings.
+    Raises an Exception listing every host that failed """
+    environment = workflow_dict['environment']
+    cs_credentials = get_credentials_for(
+        environment=environment, credential_type=CredentialType.CLOUDSTACK)
+
+    def run(host_attrs):
+        host, host_csattr, instances = host_attrs
         cs_provider = CloudStackProvider(credentials=cs_credentials)
-        instances_detail = workflow_dict['instances_detail']
-
-        for instance_detail in instances_detail:
-            instance = instance_detail['instance']
-            host = instance.hostname
-            host_csattr = HostAttr.objects.get(host=host)
-            started = cs_provider.start_virtual_machine(
-                vm_id=host_csattr.vm_id)
-            if not started:
-                raise Exception("Could not start host {}".format(host))
-
-        for instance_detail in instances_detail:
-            instance = instance_detail['instance']
-            host = instance.hostname
-            host_csattr = HostAttr.objects.get(host=host)
-            host_ready = check_ssh(
-                server=host.address, username=host_csattr.vm_user, password=host_csattr.vm_password, wait=5, interval=10)
-            if not host_ready:
-                error = "Host %s is not ready..." % host
-                LOG.warn(error)
-                raise Exception(error)
-
-        from time import sleep
-        sleep(60)
+        return action(cs_provider, host, host_csattr, instances)
+
+    errors = []
+    for (host, _, _), msg, error in run_in_parallel(
+        run, get_hosts_attrs(workflow_dict['instances_detail'])
+    ):
+        if error:
+            errors.append("{}: {}".format(host, error))
+        else:
+            log_step(workflow_dict, msg)
+
+    if errors:
+        raise Exception("\n".join(errors))
+
+
+def start_host(cs_provider, host, host_csattr, instances):
+    """ Starts the vm of host and waits, up to vm_ready_timeout, for its
+    ssh and then, up to vm_service_timeout, for the ports of instances.
+    Returns a message with the timings """
+    ready_timeout = Configuration.get_by_name_as_int(
+        'vm_ready_timeout', default=VM_READY_TIMEOUT_DEFAULT)
+    service_timeout = Configuration.get_by_name_as_int(
+        'vm_service_timeout', default=VM_SERVICE_TIMEOUT_DEFAULT)
+
+    started_at = time()
+    started = cs_provider.start_virtual_machine(vm_id=host_csattr.vm_id)
+    if not started:
+        raise Exception("Could not start host {}".format(host))
+
+    ready_deadline = time() + ready_timeout
+
+    def ssh_ready():
+        return check_ssh(
+            server=host.address, username=host_csattr.vm_user,
+            password=host_csattr.vm_password, retries=1, wait=0,
+            timeout=max(ready_deadline - time(), 1))
+
+    if not wait_for(ssh_ready, timeout=ready_timeout, interval=5):
+        raise Exception("Host {} is not ready...".format(host))
+    msg = "\nHost {} ssh ready in {}s".format(
+        host, int(time() - started_at))
+    if not instances:
+        return msg
+
+    def database_ready():
+        return all(
+            is_port_open(instance.address, instance.port)
+            for instance in instances
+        )
+
+    # services may only be started by a later step, so not fatal
+    services_ready = wait_for(
+        database_ready, timeout=service_timeout, interval=2)
+    return "{}, database port {} in {}s".format(
+        msg, "ready" if services_ready else "not ready",
+        int(time() - started_at))
+
+
+def stop_host(cs_provider, host, host_csattr, instances):
+    started_at = time()
+    stoped = cs_provider.stop_virtual_machine(vm_id=host_csattr.vm_id)
+    if not stoped:
+        raise Exception("Could not stop host {}".format(host))
+    return "\nHost {} stopped in {}s".format(
+        host, int(time() - started_at))
 
+
+def start_vm(workflow_dict):
+    try:
+        power_vms(workflow_dict, start_host)
         return True
     except Exception:
         traceback = full_stack()
@@ -98,20 +287,7 @@ def start_vm(workflow_dict):
 
 def stop_vm(workflow_dict):
     try:
-        environment = workflow_dict['environment']
-        cs_credentials = get_credentials_for(
-            environment=environment, credential_type=CredentialType.CLOUDSTACK)
-        cs_provider = CloudStackProvider(credentials=cs_credentials)
-        instances_detail = workflow_dict['instances_detail']
-
-        for instance_detail in instances_detail:
-            instance = instance_detail['instance']
-            host = instance.hostname
-            host_csattr = HostAttr.objects.get(host=host)
-            stoped = cs_provider.stop_virtual_machine(vm_id=host_csattr.vm_id)
-            if not stoped:
-                raise Exception("Could not stop host {}".format(host))
-
+        power_vms(workflow_dict, stop_host)
         return True
 
     except Exception:
@@ -162,32 +338,102 @@ def monit_script(option='start'):
         """.format(option)
 
 
-def switch_dns_forward(databaseinfra, source_object_list, ip_attribute_name,
-                       dns_attribute_name, equivalent_atribute_name,
-                       workflow_dict):
-
+def build_dns_changes(source_object_list, ip_attribute_name,
+                      dns_attribute_name, equivalent_atribute_name,
+                      forward=True):
+    """ DNS moves from the source objects to their equivalent objects
+    (forward) or back. Nothing is changed yet """
+    changes = []
     for source_object in source_object_list:
-        old_ip = source_object.__getattribute__(ip_attribute_name)
-        dns = source_object.__getattribute__(dns_attribute_name)
-        source_object.__setattr__(dns_attribute_name, old_ip)
+        target_object = getattr(source_object, equivalent_atribute_name)
+        if forward:
+            from_object, to_object = source_object, target_object
+        else:
+            from_object, to_object = target_object, source_object
 
-        target_object = source_object.__getattribute__(
-            equivalent_atribute_name)
-        new_ip = target_object.__getattribute__(ip_attribute_name)
-        target_object.__setattr__(dns_attribute_name, dns)
+        changes.append({
+            'source_object': source_object,
+            'from_object': from_object,
+            'to_object': to_object,
+            'dns': getattr(from_object, dns_attribute_name),
+            'previous_dns': getattr(to_object, dns_attribute_name),
+            'old_ip': getattr(from_object, ip_attribute_name),
+            'new_ip': getattr(to_object, ip_attribute_name),
+            'ip_attribute_name': ip_attribute_name,
+            'dns_attribute_name': dns_attribute_name,
+            'equivalent_atribute_name': equivalent_atribute_name,
+        })
+    return changes
+
+
+def apply_dns_changes(databaseinfra, changes):
+    """ Updates every dns record at the same time, then saves the new
+    dns of all objects in one transaction. When anything fails every
+    record is restored and an Exception is raised """
+    max_parallel = Configuration.get_by_name_as_int(
+        'dns_switch_max_parallel', default=DNS_SWITCH_MAX_PARALLEL_DEFAULT)
+
+    def update_record(change, rollback=False):
+        old_ip, new_ip = change['old_ip'], change['new_ip']
+        if rollback:
+            old_ip, new_ip = new_ip, old_ip
+        LOG.info("Changing {}: from {} to {}".format(
+            change['dns'], old_ip, new_ip))
+        DNSAPIProvider.update_database_dns_content(
+            databaseinfra=databaseinfra, dns=change['dns'],
+            old_ip=old_ip, new_ip=new_ip)
+
+    def rollback_records(applied):
+        for change, _, error in run_in_parallel(
+            lambda change: update_record(change, rollback=True),
+            applied, max_parallel
+        ):
+            if error:
+                LOG.error("Could not restore {} to {}: {}".format(
+                    change['dns'], change['old_ip'], error))
+
+    results = run_in_parallel(update_record, changes, max_parallel)
+    errors = [
+        "{}: {}".format(change['dns'], error)
+        for change, _, error in results if error
+    ]
+    if errors:
+        # a failed update may have saved the new ip in DatabaseInfraDNSList
+        # before the api call, restoring an untouched record is harmless
+        rollback_records(changes)
+        raise Exception("Could not switch dns:\n{}".format("\n".join(errors)))
+
+    try:
+        with transaction.atomic():
+            for change in changes:
+                dns_attribute_name = change['dns_attribute_name']
+                setattr(change['from_object'], dns_attribute_name,
+                        change['old_ip'])
+                setattr(change['to_object'], dns_attribute_name,
+                        change['dns'])
+                change['from_object'].save()
+                change['to_object'].save()
+    except Exception:
+        for change in changes:
+            setattr(change['from_object'], change['dns_attribute_name'],
+                    change['dns'])
+            setattr(change['to_object'], change['dns_attribute_name'],
+                    change['previous_dns'])
+        rollback_records(changes)
+        raise
 
-        LOG.info("Changing {}: from {} to {}".format(dns, old_ip, new_ip))
 
-        DNSAPIProvider.update_database_dns_content(
-            databaseinfra=databaseinfra,
-            dns=dns,
-            old_ip=old_ip,
-            new_ip=new_ip)
+def switch_dns_forward(databaseinfra, source_object_list, ip_attribute_name,
+                       dns_attribute_name, equivalent_atribute_name,
+                       workflow_dict):
+    changes = build_dns_changes(
+        source_object_list, ip_attribute_name, dns_attribute_name,
+        equivalent_atribute_name)
+    apply_dns_changes(databaseinfra, changes)
 
-        source_object.save()
-        target_object.save()
+    for change in changes:
         workflow_dict['objects_changed'].append({
-            'source_object': source_object,
+            'source_object': change['source_object'],
             'ip_attribute_name': ip_attribute_name,
             'dns_attribute_name': dns_attribute_name,
             'equivalent_atribute_name': equivalent_atribute_name,
@@ -196,27 +442,9 @@ def switch_dns_forward(databaseinfra, source_object_list, ip_attribute_name,
 
 def switch_dns_backward(databaseinfra, source_object_list, ip_attribute_name,
                         dns_attribute_name, equivalent_atribute_name):
-
-    for source_object in source_object_list:
-        target_object = source_object.__getattribute__(
-            equivalent_atribute_name)
-        old_ip = target_object.__getattribute__(ip_attribute_name)
-        dns = target_object.__getattribute__(dns_attribute_name)
-        target_object.__setattr__(dns_attribute_name, old_ip)
-
-        new_ip = source_object.__getattribute__(ip_attribute_name)
-        source_object.__setattr__(dns_attribute_name, dns)
-
-        LOG.info("Changing {}: from {} to {}".format(dns, old_ip, new_ip))
-
-        DNSAPIProvider.update_database_dns_content(
-            databaseinfra=databaseinfra,
-            dns=dns,
-            old_ip=old_ip,
-            new_ip=new_ip)
-
-        target_object.save()
-        source_object.save()
+    apply_dns_changes(databaseinfra, build_dns_changes(
+        source_object_list, ip_attribute_name, dns_attribute_name,
+        equivalent_atribute_name, forward=False))
 
 
 def get_backup_log_configuration_dict(environment, databaseinfra):
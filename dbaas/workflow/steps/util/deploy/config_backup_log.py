@@ -7,6 +7,7 @@ from util import build_context_script
 from workflow.steps.util import test_bash_script_error
 from workflow.steps.util import get_backup_log_configuration_dict
 from workflow.steps.util import build_backup_log_script
+from workflow.steps.util import run_hosts_script
 from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0014
 
@@ -27,34 +28,23 @@ class ConfigBackupLog(BaseStep):
                 LOG.info("There is not any backup log configuration for this database...")
                 return True
 
-            for index, instance in enumerate(workflow_dict['instances']):
-
-                if instance.instance_type == instance.MONGODB_ARBITER:
-                    continue
-
-                if instance.instance_type == instance.REDIS_SENTINEL:
-                    continue
-
-                host = instance.hostname
-
-                LOG.info("Getting vm credentials...")
-                host_csattr = CsHostAttr.objects.get(host=host)
-
-                script = test_bash_script_error()
-                script += build_backup_log_script()
-
-                contextdict = backup_log_dict
-
-                script = build_context_script(contextdict, script)
-                output = {}
-                return_code = exec_remote_command(server=host.address,
-                                                  username=host_csattr.vm_user,
-                                                  password=host_csattr.vm_password,
-                                                  command=script,
-                                                  output=output)
-
-                if return_code != 0:
-                    raise Exception(str(output))
+            hosts = [
+                instance.hostname for instance in workflow_dict['instances']
+                if instance.instance_type not in (
+                    instance.MONGODB_ARBITER, instance.REDIS_SENTINEL)
+            ]
+
+            script = test_bash_script_error()
+            script += build_backup_log_script()
+            script = build_context_script(backup_log_dict, script)
+
+            errors = [
+                "{}: {}".format(host, output)
+                for host, return_code, output in run_hosts_script(hosts, script)
+                if return_code != 0
+            ]
+            if errors:
+                raise Exception("\n".join(errors))
 
             return True
         except Exception:
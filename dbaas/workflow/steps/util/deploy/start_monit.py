@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
 import logging
 from util import full_stack
-from util import exec_remote_command
-from dbaas_cloudstack.models import HostAttr as CS_HostAttr
 from workflow.steps.util.base import BaseStep
 from workflow.steps.util import test_bash_script_error
 from workflow.steps.util import monit_script
+from workflow.steps.util import run_hosts_script
 from workflow.exceptions.error_codes import DBAAS_0002
 
 LOG = logging.getLogger(__name__)
@@ -19,23 +18,14 @@ class StartMonit(BaseStep):
     def do(self, workflow_dict):
         try:
             option = 'start'
-            for host in workflow_dict['hosts']:
-                LOG.info("{} monit on host {}".format(option, host))
-                cs_host_attr = CS_HostAttr.objects.get(host=host)
-
-                script = test_bash_script_error()
-                script += monit_script(option)
-
-                LOG.info(script)
-                output = {}
-                return_code = exec_remote_command(server=host.address,
-                                                  username=cs_host_attr.vm_user,
-                                                  password=cs_host_attr.vm_password,
-                                                  command=script,
-                                                  output=output)
-                LOG.info(output)
+            script = test_bash_script_error()
+            script += monit_script(option)
+            LOG.info(script)
+
+            hosts = workflow_dict['hosts']
+            for host, return_code, output in run_hosts_script(hosts, script):
                 if return_code != 0:
-                    LOG.error("Error monit")
+                    LOG.error("Error monit on host {}".format(host))
                     LOG.error(str(output))
 
             return True
@@ -6,15 +6,35 @@ from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0020
 from dbaas_credentials.models import CredentialType
 from dbaas_cloudstack.models import DatabaseInfraAttr
-from dbaas_aclapi.models import DatabaseInfraInstanceBind
 from dbaas_aclapi.acl_base_client import AclClient
-from dbaas_aclapi import helpers
-from dbaas_aclapi.models import ERROR
+from .acl_sync import BulkAclSync
 
 
 LOG = logging.getLogger(__name__)
 
 
+def get_acl_sync(workflow_dict, old_instances):
+    database = workflow_dict['database']
+    databaseinfra = workflow_dict['databaseinfra']
+
+    acl_credential = get_credentials_for(environment=database.environment,
+                                         credential_type=CredentialType.ACLAPI)
+    acl_client = AclClient(acl_credential.endpoint,
+                           acl_credential.user,
+                           acl_credential.password,
+                           database.environment)
+
+    instances = databaseinfra.instances.filter(
+        future_instance__isnull=not old_instances)
+    databaseinfraattr_instances = DatabaseInfraAttr.objects.filter(
+        databaseinfra=databaseinfra,
+        equivalent_dbinfraattr__isnull=not old_instances)
+
+    return BulkAclSync(database, acl_client, instances,
+                       databaseinfraattr_instances,
+                       task=workflow_dict.get('task_history'))
+
+
 class BindNewInstances(BaseStep):
 
     def __unicode__(self):
@@ -23,40 +43,8 @@ class BindNewInstances(BaseStep):
     def do(self, workflow_dict):
 
         try:
-            database = workflow_dict['database']
-            databaseinfra = workflow_dict['databaseinfra']
-
-            acl_credential = get_credentials_for(environment=database.environment,
-                                                 credential_type=CredentialType.ACLAPI)
-            acl_client = AclClient(acl_credential.endpoint,
-                                   acl_credential.user,
-                                   acl_credential.password,
-                                   database.environment)
-
-            instances = databaseinfra.instances.filter(
-                future_instance__isnull=True)
-
-            databaseinfraattr_instances = DatabaseInfraAttr.objects.filter(databaseinfra=databaseinfra,
-                                                                           equivalent_dbinfraattr__isnull=True)
-            instance_address_list = []
-            for instance in instances:
-                instance_address_list.append(instance.address)
-            for instance in databaseinfraattr_instances:
-                instance_address_list.append(instance.ip)
-
-            for database_bind in database.acl_binds.all():
-                if helpers.bind_address(
-                        database_bind, acl_client, instances=instances,
-                        infra_attr_instances=databaseinfraattr_instances):
-                    continue
-                else:
-                    LOG.error("The AclApi is not working properly.")
-                    database_bind.bind_status = ERROR
-                    database_bind.save()
-                    DatabaseInfraInstanceBind.objects.filter(databaseinfra=databaseinfra,
-                                                             bind_address=database_bind.bind_address,
-                                                             instance__in=instance_address_list
-                                                             ).update(bind_status=ERROR)
+            # binds the api could not create are left with ERROR status
+            get_acl_sync(workflow_dict, old_instances=False).grant()
             return True
 
         except Exception:
@@ -71,37 +59,9 @@ class BindNewInstances(BaseStep):
 
         LOG.info("Running undo...")
         try:
-            database = workflow_dict['database']
-            databaseinfra = workflow_dict['databaseinfra']
-
-            acl_credential = get_credentials_for(environment=database.environment,
-                                                 credential_type=CredentialType.ACLAPI)
-            acl_client = AclClient(acl_credential.endpoint,
-                                   acl_credential.user,
-                                   acl_credential.password,
-                                   database.environment)
-
-            instances = databaseinfra.instances.filter(
-                future_instance__isnull=True)
-            databaseinfraattr_instances = DatabaseInfraAttr.objects.filter(databaseinfra=databaseinfra,
-                                                                           equivalent_dbinfraattr__isnull=True)
-
-            instance_address_list = []
-            for instance in instances:
-                instance_address_list.append(instance.address)
-            for instance in databaseinfraattr_instances:
-                instance_address_list.append(instance.ip)
-
-            for database_bind in database.acl_binds.all():
-                infra_instances_binds = DatabaseInfraInstanceBind.objects.filter(
-                    databaseinfra=databaseinfra,
-                    instance__in=instance_address_list,
-                    bind_address=database_bind.bind_address)
-                if helpers.unbind_address(
-                    database_bind, acl_client, infra_instances_binds, False
-                ):
-                    continue
-
+            acl_sync = get_acl_sync(workflow_dict, old_instances=False)
+            if not acl_sync.revoke():
+                raise Exception(acl_sync.summary)
             return True
 
         except Exception:
@@ -121,37 +81,9 @@ class UnbindOldInstances(BaseStep):
     def do(self, workflow_dict):
 
         try:
-            database = workflow_dict['database']
-            databaseinfra = workflow_dict['databaseinfra']
-
-            acl_credential = get_credentials_for(environment=database.environment,
-                                                 credential_type=CredentialType.ACLAPI)
-            acl_client = AclClient(acl_credential.endpoint,
-                                   acl_credential.user,
-                                   acl_credential.password,
-                                   database.environment)
-
-            instances = databaseinfra.instances.filter(
-                future_instance__isnull=False)
-            databaseinfraattr_instances = DatabaseInfraAttr.objects.filter(databaseinfra=databaseinfra,
-                                                                           equivalent_dbinfraattr__isnull=False)
-
-            instance_address_list = []
-            for instance in instances:
-                instance_address_list.append(instance.address)
-            for instance in databaseinfraattr_instances:
-                instance_address_list.append(instance.ip)
-
-            for database_bind in database.acl_binds.all():
-                infra_instances_binds = DatabaseInfraInstanceBind.objects.filter(
-                    databaseinfra=databaseinfra,
-                    instance__in=instance_address_list,
-                    bind_address=database_bind.bind_address)
-                if helpers.unbind_address(
-                    database_bind, acl_client, infra_instances_binds, False
-                ):
-                    continue
-
+            acl_sync = get_acl_sync(workflow_dict, old_instances=True)
+            if not acl_sync.revoke():
+                raise Exception(acl_sync.summary)
             return True
 
         except Exception:
@@ -166,40 +98,7 @@ class UnbindOldInstances(BaseStep):
 
         LOG.info("Running undo...")
         try:
-            database = workflow_dict['database']
-            databaseinfra = workflow_dict['databaseinfra']
-
-            acl_credential = get_credentials_for(environment=database.environment,
-                                                 credential_type=CredentialType.ACLAPI)
-            acl_client = AclClient(acl_credential.endpoint,
-                                   acl_credential.user,
-                                   acl_credential.password,
-                                   database.environment)
-
-            instances = databaseinfra.instances.filter(
-                future_instance__isnull=False)
-
-            databaseinfraattr_instances = DatabaseInfraAttr.objects.filter(databaseinfra=databaseinfra,
-                                                                           equivalent_dbinfraattr__isnull=False)
-            instance_address_list = []
-            for instance in instances:
-                instance_address_list.append(instance.address)
-            for instance in databaseinfraattr_instances:
-                instance_address_list.append(instance.ip)
-
-            for database_bind in database.acl_binds.all():
-                if helpers.bind_address(
-                        database_bind, acl_client, instances=instances,
-                        infra_attr_instances=databaseinfraattr_instances):
-                    continue
-                else:
-                    LOG.error("The AclApi is not working properly.")
-                    database_bind.bind_status = ERROR
-                    database_bind.save()
-                    DatabaseInfraInstanceBind.objects.filter(databaseinfra=databaseinfra,
-                                                             bind_address=database_bind.bind_address,
-                                                             instance__in=instance_address_list
-                                                             ).update(bind_status=ERROR)
+            get_acl_sync(workflow_dict, old_instances=True).grant()
             return True
 
         except Exception:
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+import copy
+import logging
+from collections import OrderedDict
+from django.db import IntegrityError, transaction
+from dbaas_aclapi import helpers
+from dbaas_aclapi.models import DatabaseBind, DatabaseInfraInstanceBind
+from dbaas_aclapi.models import BIND, UNBIND, CREATED, ERROR
+from system.models import Configuration
+from util import retry, run_in_parallel
+
+LOG = logging.getLogger(__name__)
+
+ACL_SYNC_MAX_PARALLEL_DEFAULT = 8
+ACL_SYNC_BATCH_SIZE_DEFAULT = 100
+ACL_SYNC_RETRIES_DEFAULT = 3
+ACL_SYNC_RETRY_DELAY = 2
+
+
+class BulkAclSync(object):
+
+    """
+    Replicates the acl binds of a database to a set of instances.
+    Every (bind address x instance) rule is built up front and sent grouped
+    by acl environment and vlan, in batches of acl_sync_batch_size rules and
+    up to acl_sync_max_parallel requests at a time. Failed requests are
+    retried acl_sync_retries times and the resulting instance binds are
+    recorded with bulk writes.
+    """
+
+    def __init__(self, database, acl_client, instances, infra_attr_instances,
+                 task=None):
+        self.database = database
+        self.databaseinfra = database.databaseinfra
+        self.acl_client = acl_client
+        self.instances = list(instances)
+        self.infra_attr_instances = list(infra_attr_instances)
+        self.task = task
+
+        self.max_parallel = Configuration.get_by_name_as_int(
+            'acl_sync_max_parallel', default=ACL_SYNC_MAX_PARALLEL_DEFAULT)
+        self.batch_size = max(Configuration.get_by_name_as_int(
+            'acl_sync_batch_size', default=ACL_SYNC_BATCH_SIZE_DEFAULT), 1)
+        self.retries = max(Configuration.get_by_name_as_int(
+            'acl_sync_retries', default=ACL_SYNC_RETRIES_DEFAULT), 1)
+
+        self.granted = []
+        self.revoked = []
+        self.errors = []
+
+    def log(self, msg):
+        LOG.info(msg)
+        if self.task:
+            self.task.update_details(persist=True, details=msg)
+
+    def with_retry(self, function):
+        return retry(
+            Exception, tries=self.retries, delay=ACL_SYNC_RETRY_DELAY
+        )(function)
+
+    @property
+    def database_binds(self):
+        return list(self.database.acl_binds.all())
+
+    @property
+    def instance_addresses(self):
+        return [instance.address for instance in self.instances] + [
+            instance.ip for instance in self.infra_attr_instances]
+
+    def build_rules(self):
+        rules = []
+        if not self.instances:
+            return rules
+
+        for database_bind in self.database_binds:
+            _, default_options = helpers.build_data_default_options_dict(
+                helpers.PERMIT, database_bind.bind_address,
+                self.database.name, self.database.environment.name)
+
+            for rule, instance_bind in helpers.build_new_binds(
+                default_options, database_bind, self.databaseinfra,
+                self.instances, self.infra_attr_instances
+            ):
+                rules.append((database_bind, rule, instance_bind))
+        return rules
+
+    def build_batches(self, rules):
+        vlans = OrderedDict()
+        for database_bind, rule, instance_bind in rules:
+            acl_vlan = tuple(helpers.get_bind_env_and_vlan(database_bind))
+            vlans.setdefault(acl_vlan, []).append(
+                (database_bind, rule, instance_bind))
+
+        batches = []
+        for (acl_environment, acl_vlan), vlan_rules in vlans.items():
+            for i in range(0, len(vlan_rules), self.batch_size):
+                batches.append((
+                    acl_environment, acl_vlan,
+                    vlan_rules[i:i + self.batch_size]))
+        return batches
+
+    def grant_batch(self, batch):
+        acl_environment, acl_vlan, rules = batch
+        payload = {
+            "kind": "object#acl",
+            "rules": [rule for _, rule, _ in rules]
+        }
+        response = self.acl_client.grant_acl_for(
+            environment=acl_environment, vlan=acl_vlan, payload=payload)
+        if 'jobs' not in response:
+            raise Exception("ACL API did not accept the rules: {}".format(
+                response))
+        return response['jobs']
+
+    def get_existing_binds(self, bind_addresses):
+        existing = DatabaseInfraInstanceBind.objects.filter(
+            databaseinfra=self.databaseinfra,
+            bind_address__in=bind_addresses,
+            instance__in=self.instance_addresses
+        ).values_list('pk', 'instance', 'instance_port', 'bind_address')
+        return {
+            (instance, instance_port, bind_address): pk
+            for pk, instance, instance_port, bind_address in existing
+        }
+
+    def save_instance_binds(self, granted, failed):
+        bind_addresses = set(
+            instance_bind.bind_address for instance_bind in granted + failed)
+        existing = self.get_existing_binds(bind_addresses)
+
+        def key(instance_bind):
+            return (instance_bind.instance, instance_bind.instance_port,
+                    instance_bind.bind_address)
+
+        new_binds = []
+        for instance_bind in granted:
+            if key(instance_bind) not in existing:
+                instance_bind.bind_status = CREATED
+                new_binds.append(instance_bind)
+        try:
+            with transaction.atomic():
+                DatabaseInfraInstanceBind.objects.bulk_create(new_binds)
+        except IntegrityError:
+            # saved by a concurrent bind after get_existing_binds, the acls
+            # are already granted so every row must still be recorded
+            LOG.warning("Instance binds saved concurrently, saving one by one")
+            self.save_instance_binds_one_by_one(new_binds)
+
+        DatabaseInfraInstanceBind.objects.filter(pk__in=[
+            existing[key(instance_bind)] for instance_bind in granted
+            if key(instance_bind) in existing
+        ]).update(bind_status=CREATED)
+        DatabaseInfraInstanceBind.objects.filter(pk__in=[
+            existing[key(instance_bind)] for instance_bind in failed
+            if key(instance_bind) in existing
+        ]).update(bind_status=ERROR)
+
+    def save_instance_binds_one_by_one(self, instance_binds):
+        for instance_bind in instance_binds:
+            saved, created = DatabaseInfraInstanceBind.objects.get_or_create(
+                databaseinfra=instance_bind.databaseinfra,
+                instance=instance_bind.instance,
+                instance_port=instance_bind.instance_port,
+                bind_address=instance_bind.bind_address,
+                defaults={'bind_status': CREATED}
+            )
+            if not created and saved.bind_status != CREATED:
+                saved.bind_status = CREATED
+                saved.save(update_fields=['bind_status', 'updated_at'])
+
+    def grant(self):
+        rules = self.build_rules()
+        batches = self.build_batches(rules)
+        self.log("\nGranting {} acl batches for {} instances".format(
+            len(batches), len(self.instance_addresses)))
+
+        jobs, failed, failed_binds = [], [], set()
+        for batch, batch_jobs, error in run_in_parallel(
+            self.with_retry(self.grant_batch), batches, self.max_parallel
+        ):
+            acl_environment, acl_vlan, batch_rules = batch
+            instance_binds = [
+                instance_bind for _, _, instance_bind in batch_rules]
+            if error:
+                LOG.error("The AclApi is not working properly.")
+                self.errors.append(
+                    ("{}/{}".format(acl_environment, acl_vlan), error))
+                failed.extend(instance_binds)
+                failed_binds.update(
+                    database_bind.id for database_bind, _, _ in batch_rules)
+            else:
+                jobs.extend(batch_jobs)
+                self.granted.extend(instance_binds)
+
+        helpers.save_jobs(jobs, BIND, self.database)
+        self.save_instance_binds(self.granted, failed)
+
+        bind_ids = set(database_bind.id for database_bind, _, _ in rules)
+        DatabaseBind.objects.filter(
+            id__in=bind_ids - failed_binds).update(bind_status=CREATED)
+        DatabaseBind.objects.filter(
+            id__in=failed_binds).update(bind_status=ERROR)
+
+        self.log("\n" + self.summary)
+        return not self.errors
+
+    def revoke_instance_bind(self, instance_bind):
+        _, default_options = helpers.build_data_default_options_dict(
+            helpers.PERMIT, instance_bind.bind_address, self.database.name,
+            self.database.environment.name)
+        rule = copy.deepcopy(default_options)
+        rule['source'] = instance_bind.bind_address
+        rule['destination'] = instance_bind.instance + '/32'
+        rule['l4-options']['dest-port-start'] = instance_bind.instance_port
+
+        jobs = []
+        for environment_id, vlan_id, rule_id in helpers.iter_on_acl_query_results(
+            self.acl_client, rule
+        ):
+            try:
+                response = self.acl_client.delete_acl(
+                    environment_id, vlan_id, rule_id)
+            except Exception as e:
+                LOG.info("Access {} could not be deleted! Error: {}".format(
+                    instance_bind, e))
+            else:
+                if 'job' in response:
+                    jobs.append(response['job'])
+        return jobs
+
+    def revoke(self):
+        instance_binds = DatabaseInfraInstanceBind.objects.filter(
+            databaseinfra=self.databaseinfra,
+            instance__in=self.instance_addresses,
+            bind_address__in=[
+                database_bind.bind_address
+                for database_bind in self.database_binds
+            ]
+        )
+        self.log("\nRevoking {} acl rules".format(instance_binds.count()))
+
+        jobs = []
+        for instance_bind, rule_jobs, error in run_in_parallel(
+            self.with_retry(self.revoke_instance_bind), instance_binds,
+            self.max_parallel
+        ):
+            if error:
+                self.errors.append((instance_bind, error))
+            else:
+                jobs.extend(rule_jobs)
+                self.revoked.append(instance_bind)
+
+        DatabaseInfraInstanceBind.objects.filter(pk__in=[
+            instance_bind.pk for instance_bind in self.revoked
+        ]).delete()
+        helpers.save_jobs(jobs, UNBIND, self.database)
+
+        self.log("\n" + self.summary)
+        return not self.errors
+
+    @property
+    def summary(self):
+        summary = "{}: {} acl rules granted, {} revoked".format(
+            self.database, len(self.granted), len(self.revoked))
+        for rule, error in self.errors:
+            summary += "\n{}: {}".format(rule, error)
+        return summary
@@ -2,8 +2,8 @@
 import logging
 from util import full_stack
 from workflow.steps.util.base import BaseStep
-from workflow.steps.util import switch_dns_forward
-from workflow.steps.util import switch_dns_backward
+from workflow.steps.util import build_dns_changes
+from workflow.steps.util import apply_dns_changes
 from workflow.exceptions.error_codes import DBAAS_0020
 
 LOG = logging.getLogger(__name__)
@@ -14,35 +14,40 @@ class SwitchDNS(BaseStep):
     def __unicode__(self):
         return "Switching DNS..."
 
+    def get_dns_changes(self, workflow_dict, forward=True):
+        changes = []
+        for source_objects, ip_attribute_name, dns_attribute_name, \
+                equivalent_atribute_name in (
+                    ('source_hosts', 'address', 'hostname', 'future_host'),
+                    ('source_instances', 'address', 'dns', 'future_instance'),
+                    ('source_secondary_ips', 'ip', 'dns',
+                     'equivalent_dbinfraattr'),
+                ):
+            changes += build_dns_changes(
+                source_object_list=workflow_dict[source_objects],
+                ip_attribute_name=ip_attribute_name,
+                dns_attribute_name=dns_attribute_name,
+                equivalent_atribute_name=equivalent_atribute_name,
+                forward=forward)
+        return changes
+
     def do(self, workflow_dict):
         try:
             databaseinfra = workflow_dict['databaseinfra']
 
             workflow_dict['objects_changed'] = []
 
-            switch_dns_forward(databaseinfra=databaseinfra,
-                               source_object_list=workflow_dict[
-                                   'source_hosts'],
-                               ip_attribute_name='address',
-                               dns_attribute_name='hostname',
-                               equivalent_atribute_name='future_host',
-                               workflow_dict=workflow_dict)
-
-            switch_dns_forward(databaseinfra=databaseinfra,
-                               source_object_list=workflow_dict[
-                                   'source_instances'],
-                               ip_attribute_name='address',
-                               dns_attribute_name='dns',
-                               equivalent_atribute_name='future_instance',
-                               workflow_dict=workflow_dict)
-
-            switch_dns_forward(databaseinfra=databaseinfra,
-                               source_object_list=workflow_dict[
-                                   'source_secondary_ips'],
-                               ip_attribute_name='ip',
-                               dns_attribute_name='dns',
-                               equivalent_atribute_name='equivalent_dbinfraattr',
-                               workflow_dict=workflow_dict)
+            changes = self.get_dns_changes(workflow_dict)
+            apply_dns_changes(databaseinfra, changes)
+
+            for change in changes:
+                workflow_dict['objects_changed'].append({
+                    'source_object': change['source_object'],
+                    'ip_attribute_name': change['ip_attribute_name'],
+                    'dns_attribute_name': change['dns_attribute_name'],
+                    'equivalent_atribute_name': change[
+                        'equivalent_atribute_name'],
+                })
 
             return True
         except Exception:
@@ -59,37 +64,20 @@ class SwitchDNS(BaseStep):
             databaseinfra = workflow_dict['databaseinfra']
 
             if 'objects_changed' in workflow_dict:
+                changes = []
                 for object_changed in workflow_dict['objects_changed']:
-                    switch_dns_backward(
-                        databaseinfra=databaseinfra,
+                    changes += build_dns_changes(
                         source_object_list=[object_changed['source_object'], ],
                         ip_attribute_name=object_changed['ip_attribute_name'],
                         dns_attribute_name=object_changed[
                             'dns_attribute_name'],
-                        equivalent_atribute_name=object_changed['equivalent_atribute_name'])
-                return True
-
-            switch_dns_backward(databaseinfra=databaseinfra,
-                                source_object_list=workflow_dict[
-                                    'source_hosts'],
-                                ip_attribute_name='address',
-                                dns_attribute_name='hostname',
-                                equivalent_atribute_name='future_host')
-
-            switch_dns_backward(databaseinfra=databaseinfra,
-                                source_object_list=workflow_dict[
-                                    'source_instances'],
-                                ip_attribute_name='address',
-                                dns_attribute_name='dns',
-                                equivalent_atribute_name='future_instance')
-
-            switch_dns_backward(databaseinfra=databaseinfra,
-                                source_object_list=workflow_dict[
-                                    'source_secondary_ips'],
-                                ip_attribute_name='ip',
-                                dns_attribute_name='dns',
-                                equivalent_atribute_name='equivalent_dbinfraattr')
+                        equivalent_atribute_name=object_changed[
+                            'equivalent_atribute_name'],
+                        forward=False)
+            else:
+                changes = self.get_dns_changes(workflow_dict, forward=False)
 
+            apply_dns_changes(databaseinfra, changes)
             return True
         except Exception:
             traceback = full_stack()
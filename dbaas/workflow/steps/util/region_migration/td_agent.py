@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 import logging
 from util import full_stack
-from util import exec_remote_command
-from dbaas_cloudstack.models import HostAttr as CS_HostAttr
 from workflow.steps.util.base import BaseStep
 from workflow.steps.util import test_bash_script_error
 from workflow.steps.util import td_agent_script
 from workflow.steps.util import monit_script
+from workflow.steps.util import run_hosts_script
 from workflow.exceptions.error_codes import DBAAS_0020
 
 LOG = logging.getLogger(__name__)
 
 
+def td_agent(hosts, option):
+    """ Runs option on monit and td_agent of every host at the same time """
+    script = test_bash_script_error()
+    script += monit_script(option)
+    script += td_agent_script(option)
+    LOG.info(script)
+
+    for host, return_code, output in run_hosts_script(hosts, script):
+        if return_code != 0:
+            LOG.error("Error on {} td_agent on host {}".format(option, host))
+            LOG.error(str(output))
+
+
 class StartTDAgent(BaseStep):
 
     def __unicode__(self):
@@ -19,28 +31,12 @@ class StartTDAgent(BaseStep):
 
     def do(self, workflow_dict):
         try:
-            for source_host in workflow_dict['source_hosts']:
-                future_host = source_host.future_host
-                hosts_option = [(source_host, 'stop'), (future_host, 'start')]
-                for host, option in hosts_option:
-                    LOG.info("{} td_agent on host {}".format(option, host))
-                    cs_host_attr = CS_HostAttr.objects.get(host=host)
-
-                    script = test_bash_script_error()
-                    script += monit_script(option)
-                    script += td_agent_script(option)
-
-                    LOG.info(script)
-                    output = {}
-                    return_code = exec_remote_command(server=host.address,
-                                                      username=cs_host_attr.vm_user,
-                                                      password=cs_host_attr.vm_password,
-                                                      command=script,
-                                                      output=output)
-                    LOG.info(output)
-                    if return_code != 0:
-                        LOG.error("Error starting td_agent")
-                        LOG.error(str(output))
+            source_hosts = workflow_dict['source_hosts']
+            future_hosts = [
+                source_host.future_host for source_host in source_hosts
+            ]
+            td_agent(source_hosts, 'stop')
+            td_agent(future_hosts, 'start')
 
             return True
         except Exception:
@@ -54,28 +50,12 @@ class StartTDAgent(BaseStep):
     def undo(self, workflow_dict):
         LOG.info("Running undo...")
         try:
-            for source_host in workflow_dict['source_hosts']:
-                future_host = source_host.future_host
-                hosts_option = [(future_host, 'stop'), (source_host, 'start')]
-                for host, option in hosts_option:
-                    LOG.info("{} td_agent on host {}".format(option, host))
-                    cs_host_attr = CS_HostAttr.objects.get(host=host)
-
-                    script = test_bash_script_error()
-                    script += monit_script(option)
-                    script += td_agent_script(option)
-
-                    LOG.info(script)
-                    output = {}
-                    return_code = exec_remote_command(server=host.address,
-                                                      username=cs_host_attr.vm_user,
-                                                      password=cs_host_attr.vm_password,
-                                                      command=script,
-                                                      output=output)
-                    LOG.info(output)
-                    if return_code != 0:
-                        LOG.error("Error starting td_agent")
-                        LOG.error(str(output))
+            source_hosts = workflow_dict['source_hosts']
+            future_hosts = [
+                source_host.future_host for source_host in source_hosts
+            ]
+            td_agent(future_hosts, 'stop')
+            td_agent(source_hosts, 'start')
 
             return True
         except Exception:
@@ -94,28 +74,10 @@ class StopTDAgent(BaseStep):
 
     def do(self, workflow_dict):
         try:
-            for source_host in workflow_dict['source_hosts']:
-                future_host = source_host.future_host
-                hosts_option = [(future_host, 'stop')]
-                for host, option in hosts_option:
-                    LOG.info("{} td_agent on host {}".format(option, host))
-                    cs_host_attr = CS_HostAttr.objects.get(host=host)
-
-                    script = test_bash_script_error()
-                    script += monit_script(option)
-                    script += td_agent_script(option)
-
-                    LOG.info(script)
-                    output = {}
-                    return_code = exec_remote_command(server=host.address,
-                                                      username=cs_host_attr.vm_user,
-                                                      password=cs_host_attr.vm_password,
-                                                      command=script,
-                                                      output=output)
-                    LOG.info(output)
-                    if return_code != 0:
-                        LOG.error("Error stopping td_agent")
-                        LOG.error(str(output))
+            td_agent([
+                source_host.future_host
+                for source_host in workflow_dict['source_hosts']
+            ], 'stop')
 
             return True
         except Exception:
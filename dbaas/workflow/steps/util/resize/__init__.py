@@ -1,9 +1,10 @@
-
 # -*- coding: utf-8 -*-
 import logging
 from dbaas_cloudstack.models import HostAttr
-from util import check_ssh
 from workflow.exceptions.error_codes import DBAAS_0015
+from workflow.steps.util import log_step
+from workflow.steps.util import start_host
+from workflow.steps.util import stop_host
 from util import full_stack
 from dbaas_cloudstack.provider import CloudStackProvider
 from dbaas_credentials.models import CredentialType
@@ -12,31 +13,21 @@ from util import get_credentials_for
 LOG = logging.getLogger(__name__)
 
 
-def start_vm(workflow_dict):
-    try:
-        environment = workflow_dict['environment']
-        cs_credentials = get_credentials_for(
-            environment=environment, credential_type=CredentialType.CLOUDSTACK)
-        cs_provider = CloudStackProvider(credentials=cs_credentials)
-
-        host = workflow_dict['host']
-        host_csattr = HostAttr.objects.get(host=host)
-        started = cs_provider.start_virtual_machine(vm_id=host_csattr.vm_id)
-        if not started:
-            raise Exception("Could not start host {}".format(host))
+def power_host(workflow_dict, action):
+    environment = workflow_dict['environment']
+    cs_credentials = get_credentials_for(
+        environment=environment, credential_type=CredentialType.CLOUDSTACK)
+    cs_provider = CloudStackProvider(credentials=cs_credentials)
 
-        host_ready = check_ssh(server=host.address,
-                               username=host_csattr.vm_user,
-                               password=host_csattr.vm_password,
-                               retries=50,
-                               wait=20,
-                               interval=30)
+    host = workflow_dict['host']
+    host_csattr = HostAttr.objects.get(host=host)
+    # the database is only started by StartDatabase, after this step
+    log_step(workflow_dict, action(cs_provider, host, host_csattr, []))
 
-        if not host_ready:
-            error = "Host %s is not ready..." % host
-            LOG.warn(error)
-            raise Exception(error)
 
+def start_vm(workflow_dict):
+    try:
+        power_host(workflow_dict, start_host)
         return True
     except Exception:
         traceback = full_stack()
@@ -49,16 +40,7 @@ def start_vm(workflow_dict):
 
 def stop_vm(workflow_dict):
     try:
-        environment = workflow_dict['environment']
-        cs_credentials = get_credentials_for(
-            environment=environment, credential_type=CredentialType.CLOUDSTACK)
-        cs_provider = CloudStackProvider(credentials=cs_credentials)
-        host = workflow_dict['host']
-        host_csattr = HostAttr.objects.get(host=host)
-        stoped = cs_provider.stop_virtual_machine(vm_id=host_csattr.vm_id)
-        if not stoped:
-            raise Exception("Could not stop host {}".format(host))
-
+        power_host(workflow_dict, stop_host)
         return True
 
     except Exception:
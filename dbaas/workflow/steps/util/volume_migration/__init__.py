@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+from dbaas_cloudstack.models import HostAttr as CsHostAttr
+from util import exec_remote_command
+
+LOG = logging.getLogger(__name__)
+
+SYNC_DATA_COMMAND = "rsync -a --delete --stats /data/ /data2/"
+
+RSYNC_STATS = {
+    'total_bytes': r'^Total file size: ([\d,]+)',
+    'transferred_bytes': r'^Total transferred file size: ([\d,]+)',
+    'transferred_files': r'^Number of (?:regular )?files transferred: ([\d,]+)',
+}
+
+
+def parse_rsync_stats(lines):
+    stats = dict((key, 0) for key in RSYNC_STATS)
+    for line in lines:
+        line = line.strip()
+        for key, regex in RSYNC_STATS.items():
+            match = re.match(regex, line)
+            if match:
+                stats[key] = int(match.group(1).replace(',', ''))
+
+    return stats
+
+
+def sync_data(host, command=SYNC_DATA_COMMAND):
+    cs_host_attr = CsHostAttr.objects.get(host=host)
+
+    output = {}
+    return_code = exec_remote_command(server=host.address,
+                                      username=cs_host_attr.vm_user,
+                                      password=cs_host_attr.vm_password,
+                                      command=command,
+                                      output=output)
+
+    return return_code, output
+
+
+def build_sync_progress(stats, elapsed_seconds, previous=None):
+    total = stats['total_bytes']
+    transferred = stats['transferred_bytes']
+
+    rate = 0
+    if elapsed_seconds > 0:
+        rate = transferred / float(elapsed_seconds)
+
+    percent = 100.0
+    if total:
+        percent = (total - transferred) * 100.0 / total
+
+    # Data written while a pass runs is what the next pass must copy, so
+    # the shrink ratio between two passes estimates the next delta.
+    estimated_seconds = None
+    if previous and previous['transferred_bytes'] and rate:
+        ratio = transferred / float(previous['transferred_bytes'])
+        estimated_seconds = int(transferred * ratio / rate)
+
+    return {
+        'total_bytes': total,
+        'transferred_bytes': transferred,
+        'transferred_files': stats['transferred_files'],
+        'elapsed_seconds': int(elapsed_seconds),
+        'bytes_per_second': int(rate),
+        'percent_synced': round(percent, 2),
+        'estimated_seconds': estimated_seconds,
+    }
+
+
+def format_sync_progress(progress):
+    return ("{percent_synced}% already synced, {transferred_bytes} of "
+            "{total_bytes} bytes ({transferred_files} files) copied in "
+            "{elapsed_seconds}s at {bytes_per_second} B/s, "
+            "estimated remaining time {estimated}").format(
+        estimated='unknown' if progress['estimated_seconds'] is None
+        else '{}s'.format(progress['estimated_seconds']),
+        **progress
+    )
@@ -5,7 +5,12 @@ from workflow.steps.util.base import BaseStep
 from workflow.exceptions.error_codes import DBAAS_0022
 from dbaas_cloudstack.models import HostAttr as CsHostAttr
 from util import exec_remote_command
-from time import sleep
+from time import time
+from workflow.steps.util.volume_migration import SYNC_DATA_COMMAND
+from workflow.steps.util.volume_migration import sync_data
+from workflow.steps.util.volume_migration import parse_rsync_stats
+from workflow.steps.util.volume_migration import build_sync_progress
+from workflow.steps.util.volume_migration import format_sync_progress
 
 LOG = logging.getLogger(__name__)
 
@@ -13,29 +18,26 @@ LOG = logging.getLogger(__name__)
 class CopyData(BaseStep):
 
     def __unicode__(self):
-        return "Copying data..."
+        return "Syncing remaining data..."
 
     def do(self, workflow_dict):
         try:
-            sleep(60)
             databaseinfra = workflow_dict['databaseinfra']
             driver = databaseinfra.get_driver()
             files_to_remove = driver.remove_deprectaed_files()
-            command = files_to_remove + " && cp -rp /data/* /data2"
+            command = files_to_remove + " && " + SYNC_DATA_COMMAND
 
             host = workflow_dict['host']
-            cs_host_attr = CsHostAttr.objects.get(host=host)
-
-            output = {}
-            return_code = exec_remote_command(server=host.address,
-                                              username=cs_host_attr.vm_user,
-                                              password=cs_host_attr.vm_password,
-                                              command=command,
-                                              output=output)
 
+            started_at = time()
+            return_code, output = sync_data(host=host, command=command)
             if return_code != 0:
                 raise Exception(str(output))
 
+            stats = parse_rsync_stats(output.get('stdout', []))
+            progress = build_sync_progress(stats, time() - started_at)
+            LOG.info("Final sync: {}".format(format_sync_progress(progress)))
+
             return True
         except Exception:
             traceback = full_stack()
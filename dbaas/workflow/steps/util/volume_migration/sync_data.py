@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import logging
+from time import time
+from util import full_stack
+from system.models import Configuration
+from workflow.steps.util.base import BaseStep
+from workflow.exceptions.error_codes import DBAAS_0022
+from workflow.steps.util.volume_migration import sync_data
+from workflow.steps.util.volume_migration import parse_rsync_stats
+from workflow.steps.util.volume_migration import build_sync_progress
+from workflow.steps.util.volume_migration import format_sync_progress
+
+LOG = logging.getLogger(__name__)
+
+SYNC_MAX_PASSES_DEFAULT = 5
+SYNC_DELTA_MB_DEFAULT = 100
+
+
+class SyncData(BaseStep):
+
+    def __unicode__(self):
+        return "Pre-seeding data while database is running..."
+
+    def do(self, workflow_dict):
+        try:
+            host = workflow_dict['host']
+            task = workflow_dict.get('task_history')
+
+            max_passes = Configuration.get_by_name_as_int(
+                'volume_migration_sync_max_passes',
+                default=SYNC_MAX_PASSES_DEFAULT)
+            delta_bytes = Configuration.get_by_name_as_int(
+                'volume_migration_sync_delta_mb',
+                default=SYNC_DELTA_MB_DEFAULT) * 1024 * 1024
+
+            workflow_dict['sync_progress'] = []
+            progress = None
+            for sync_pass in range(1, max_passes + 1):
+                started_at = time()
+                return_code, output = sync_data(host=host)
+                elapsed = time() - started_at
+
+                # rsync 24: files vanished while copying, expected with the
+                # database running. The final sync will catch them.
+                if return_code not in (0, 24):
+                    raise Exception(str(output))
+
+                stats = parse_rsync_stats(output.get('stdout', []))
+                progress = build_sync_progress(stats, elapsed, progress)
+                workflow_dict['sync_progress'].append(progress)
+
+                msg = "\nPass {} of {}: {}".format(
+                    sync_pass, max_passes, format_sync_progress(progress))
+                LOG.info(msg)
+                if task:
+                    task.update_details(persist=True, details=msg)
+
+                if progress['transferred_bytes'] <= delta_bytes:
+                    break
+
+            return True
+        except Exception:
+            traceback = full_stack()
+
+            workflow_dict['exceptions']['error_codes'].append(DBAAS_0022)
+            workflow_dict['exceptions']['traceback'].append(traceback)
+
+            return False
+
+    def undo(self, workflow_dict):
+        LOG.info("Running undo...")
+        return True
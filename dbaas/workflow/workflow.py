@@ -1,18 +1,82 @@
 # -*- coding: utf-8 -*-
 import logging
+import socket
 import time
 from util import full_stack
-from django.utils.module_loading import import_by_path
+from util import get_class
+from util import get_instance
 from exceptions.error_codes import DBAAS_0001
+from notification.models import StepExecution, WorkflowCheckpoint
 
 LOG = logging.getLogger(__name__)
 
 
-def start_workflow(workflow_dict, task=None):
+def get_workflow_engine(workflow_dict):
+    databaseinfra = workflow_dict.get('databaseinfra')
+    if not databaseinfra and workflow_dict.get('database'):
+        databaseinfra = workflow_dict['database'].databaseinfra
+    if databaseinfra:
+        return databaseinfra.engine_name
+
+
+def start_step_execution(workflow_dict, step, direction, task=None):
+    try:
+        return StepExecution.start(
+            step=step, step_index=workflow_dict['step_counter'],
+            direction=direction, task=task,
+            engine=get_workflow_engine(workflow_dict),
+            host=socket.gethostname())
+    except Exception as e:
+        LOG.warn("Execution of step {} not recorded: {}".format(step, e))
+
+
+def finish_step_execution(step_execution, status):
+    if not step_execution:
+        return
+    try:
+        step_execution.finish(status)
+    except Exception as e:
+        LOG.warn("Execution of step {} not recorded: {}".format(
+            step_execution.step, e))
+
+
+def save_checkpoint(workflow_dict, task=None, checkpoint=None,
+                    on_finish=None):
+    if not task:
+        return None
+    try:
+        if checkpoint:
+            checkpoint.update(workflow_dict)
+            return checkpoint
+        return WorkflowCheckpoint.start(task, workflow_dict, on_finish)
+    except Exception as e:
+        LOG.warn("Workflow checkpoint not saved: {}".format(e))
+        return checkpoint
+
+
+def finish_checkpoint(checkpoint, status):
+    if not checkpoint:
+        return
+    try:
+        checkpoint.finish(status)
+    except Exception as e:
+        LOG.warn("Workflow checkpoint not finished: {}".format(e))
+
+
+def start_workflow(workflow_dict, task=None, checkpoint=None, on_finish=None):
+    """
+    Runs the steps of workflow_dict, rolling back the ones done if any
+    fails. The state is checkpointed after every step when there is a
+    task, a checkpoint given goes on from its first unfinished step.
+    on_finish is the path of the function the caller runs with
+    workflow_dict and task once the workflow is over, only workflows
+    with it can be resumed.
+    """
     try:
         if 'steps' not in workflow_dict:
             return False
-        workflow_dict['step_counter'] = 0
+        first_step = checkpoint.step_counter if checkpoint else 0
+        workflow_dict['step_counter'] = first_step
 
         workflow_dict['msgs'] = []
         workflow_dict['status'] = 0
@@ -20,12 +84,13 @@ def start_workflow(workflow_dict, task=None):
         workflow_dict['exceptions'] = {}
         workflow_dict['exceptions']['traceback'] = []
         workflow_dict['exceptions']['error_codes'] = []
+        checkpoint = save_checkpoint(
+            workflow_dict, task, checkpoint, on_finish)
 
-        for step in workflow_dict['steps']:
+        for step in workflow_dict['steps'][first_step:]:
             workflow_dict['step_counter'] += 1
 
-            my_class = import_by_path(step)
-            my_instance = my_class()
+            my_instance = get_instance(step)
 
             time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
 
@@ -38,7 +103,16 @@ def start_workflow(workflow_dict, task=None):
                 workflow_dict['msgs'].append(msg)
                 task.update_details(persist=True, details=msg)
 
-            if my_instance.do(workflow_dict) != True:
+            step_execution = start_step_execution(
+                workflow_dict, step, StepExecution.DO, task)
+            step_status = StepExecution.ERROR
+            try:
+                if my_instance.do(workflow_dict) == True:
+                    step_status = StepExecution.SUCCESS
+            finally:
+                finish_step_execution(step_execution, step_status)
+
+            if step_status != StepExecution.SUCCESS:
                 workflow_dict['status'] = 0
                 raise Exception(
                     "We caught an error while executing the steps...")
@@ -46,8 +120,10 @@ def start_workflow(workflow_dict, task=None):
             workflow_dict['status'] = 1
             if task:
                 task.update_details(persist=True, details="DONE!")
+            save_checkpoint(workflow_dict, task, checkpoint)
 
         workflow_dict['created'] = True
+        finish_checkpoint(checkpoint, WorkflowCheckpoint.SUCCESS)
 
         return True
 
@@ -66,12 +142,60 @@ def start_workflow(workflow_dict, task=None):
         workflow_dict['steps'] = workflow_dict[
             'steps'][:workflow_dict['step_counter']]
         stop_workflow(workflow_dict, task)
+        finish_checkpoint(checkpoint, WorkflowCheckpoint.ROLLBACK)
 
         workflow_dict['created'] = False
 
         return False
 
 
+class WorkflowNotResumable(Exception):
+    pass
+
+
+def claim_workflow_resume(task):
+    """
+    Claims the last unfinished workflow of task for a resume_workflow.
+    Raises WorkflowNotResumable when it can not be resumed, when a worker
+    may still be running it or when another resume claimed it first
+    """
+    checkpoint = WorkflowCheckpoint.last_running_for(task)
+    if not checkpoint:
+        raise WorkflowNotResumable("There is no unfinished workflow to resume")
+    if checkpoint.resume_error:
+        raise WorkflowNotResumable(checkpoint.resume_error)
+    if checkpoint.is_running():
+        raise WorkflowNotResumable("Workflow may still be running")
+    if not checkpoint.claim():
+        raise WorkflowNotResumable("Workflow is already being resumed")
+    return checkpoint
+
+
+def resume_workflow(task):
+    """
+    Goes on with the last unfinished workflow of task, claimed by
+    claim_workflow_resume, from the first step it had not completed, the
+    step running when its worker died runs again, and then runs the
+    completion hook of the task that started it.
+    Returns the rebuilt workflow_dict or None when there is nothing to resume
+    """
+    checkpoint = WorkflowCheckpoint.last_running_for(task)
+    if not checkpoint:
+        return None
+    if checkpoint.status != WorkflowCheckpoint.RESUMING:
+        raise WorkflowNotResumable("Workflow was not claimed for a resume")
+    if checkpoint.resume_error:
+        raise WorkflowNotResumable(checkpoint.resume_error)
+
+    on_finish = get_class(checkpoint.on_finish)
+    workflow_dict = checkpoint.load()
+    LOG.info("Resuming workflow of {} after step {}".format(
+        task, checkpoint.step_counter))
+    start_workflow(workflow_dict, task=task, checkpoint=checkpoint)
+    on_finish(workflow_dict, task)
+    return workflow_dict
+
+
 def stop_workflow(workflow_dict, task=None):
     LOG.info("Running undo...")
 
@@ -93,8 +217,7 @@ def stop_workflow(workflow_dict, task=None):
 
         for step in workflow_dict['steps'][::-1]:
 
-            my_class = import_by_path(step)
-            my_instance = my_class()
+            my_instance = get_instance(step)
 
             time_now = str(time.strftime("%m/%d/%Y %H:%M:%S"))
 
@@ -103,13 +226,20 @@ def stop_workflow(workflow_dict, task=None):
 
             LOG.info(msg)
 
+            step_execution = start_step_execution(
+                workflow_dict, step, StepExecution.UNDO, task)
             workflow_dict['step_counter'] -= 1
 
             if task:
                 workflow_dict['msgs'].append(msg)
                 task.update_details(persist=True, details=msg)
 
-            my_instance.undo(workflow_dict)
+            step_status = StepExecution.ERROR
+            try:
+                if my_instance.undo(workflow_dict) != False:
+                    step_status = StepExecution.SUCCESS
+            finally:
+                finish_step_execution(step_execution, step_status)
 
             if task:
                 task.update_details(persist=True, details="DONE!")